@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from plagiarism.spans import trace
+
+# dynamic micro-batching for the detection service.
+# requests submit one item each and get a future back. a worker thread takes the first waiting item, collects
+# whatever else arrives within max_wait_ms of it (up to max_batch_size), and runs the batch function once for all
+# of them. under load items pile up while a batch runs, so the next batch is taken right away and is bigger:
+# throughput grows with the batch size instead of with the number of processes.
+
+LATENCY_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+SIZE_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class Histogram:
+    # cumulative counts per upper bound (+ one overflow bucket), percentiles are estimated as the bound of
+    # the bucket the rank falls in
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        pos = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        with self._lock:
+            self.counts[pos] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+
+        rank = q / 100 * self.count
+        seen = 0
+        for pos, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[pos] if pos < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={bound}" for bound in self.bounds] + ["+inf"]
+            return {
+                "count": self.count,
+                "mean": self.sum / self.count if self.count else None,
+                "max": self.max if self.count else None,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "p99": self.percentile(99),
+                "buckets": dict(zip(labels, self.counts))
+            }
+
+
+class BatchMetrics:
+    def __init__(self):
+        self.batch_size = Histogram(SIZE_BOUNDS)
+        self.queue_depth = Histogram(SIZE_BOUNDS) # items still waiting when a batch was taken
+        self.queue_ms = Histogram(LATENCY_BOUNDS_MS) # submit -> batch start, per item
+        self.batch_ms = Histogram(LATENCY_BOUNDS_MS) # batch function, per batch
+        self.stages = {} # span name -> Histogram of ms per batch
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe_stages(self, stages):
+        for stage, ms in stages.items():
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram(LATENCY_BOUNDS_MS))
+            histogram.observe(ms)
+
+    def snapshot(self):
+        with self._lock:
+            stages = dict(self.stages)
+        return {
+            "batch_size": self.batch_size.snapshot(),
+            "queue_depth": self.queue_depth.snapshot(),
+            "queue_ms": self.queue_ms.snapshot(),
+            "batch_ms": self.batch_ms.snapshot(),
+            "stages_ms": {stage: histogram.snapshot() for stage, histogram in stages.items()},
+            "errors": self.errors
+        }
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size = 64, max_wait_ms = 5.0, name = "batcher"):
+        # batch_fn: list of items -> list of results in the same order
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.metrics = BatchMetrics()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target = self._run, name = name, daemon = True)
+        self._thread.start()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item, timeout = None):
+        return self.submit(item).result(timeout = timeout)
+
+    def close(self, wait = True):
+        # items queued before still run, wait = False returns without waiting for them
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # past the deadline only what's already queued is taken
+                entry = self._queue.get(timeout = remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry is None: # close() while collecting, run this batch first
+                self._queue.put(None)
+                break
+            batch.append(entry)
+
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            started = time.perf_counter()
+
+            self.metrics.batch_size.observe(len(batch))
+            self.metrics.queue_depth.observe(self._queue.qsize())
+            for _, _, submitted in batch:
+                self.metrics.queue_ms.observe((started - submitted) * 1000)
+
+            try:
+                with trace() as t:
+                    results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self.metrics.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.metrics.batch_ms.observe((time.perf_counter() - started) * 1000)
+
+            self.metrics.observe_stages(t.stages)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
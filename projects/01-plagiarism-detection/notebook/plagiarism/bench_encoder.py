@@ -0,0 +1,192 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from plagiarism.chunk_store import ChunkStore
+from plagiarism.encoders import ONNX_INT8_FILE, export_onnx, load_encoder
+
+# benchmark and parity check of the ONNX int8 encoder against the fp32 sentence-transformers model.
+# run from the notebook folder after 02_indexing:
+#   python -m plagiarism.bench_encoder --export --threads 1 2 4
+# for every intra-op thread count it measures single query latency and batch throughput, the cosine drift of
+# the int8 vectors (queries and a sample of chunks) from fp32, and what the drift does to detection: neighbour
+# overlap and pure_embedding precision / recall / F1 on data/test_dataset.json, with the corpus sample encoded
+# by the same encoder. results go to indexes/encoder_benchmark.json. with --select the fastest thread count that
+# stays within --max-f1-drop and --min-cosine is saved to indexes/encoder.json, which 02_indexing picks up
+# (and re-embeds the corpus with) on its next run.
+
+DEFAULT_ONNX_DIR = "indexes/encoder_onnx"
+
+
+def cosines(a, b):
+    a = a / np.maximum(np.linalg.norm(a, axis = 1, keepdims = True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis = 1, keepdims = True), 1e-12)
+    return (a * b).sum(axis = 1)
+
+
+def drift_summary(reference, candidate):
+    sims = cosines(reference, candidate)
+    return {"mean_cosine": float(sims.mean()), "min_cosine": float(sims.min()), "p1_cosine": float(np.percentile(sims, 1))}
+
+
+def measure_latency(encode_fn, texts, batch_size = 64):
+    # one query at a time like embed_code, then the whole list like the indexer
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        encode_fn([text])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        encode_fn(texts[start:start + batch_size])
+    seconds = time.perf_counter() - started
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "texts_per_s": len(texts) / max(seconds, 1e-9)
+    }
+
+
+def detection_metrics(query_vecs, corpus_vecs, labels, k = 10, similarity_threshold = 0.65):
+    # pure_embedding verdicts: plagiarized if any of the k nearest chunks has 1 / (1 + L2) >= threshold
+    index = faiss.IndexFlatL2(corpus_vecs.shape[1])
+    index.add(np.ascontiguousarray(corpus_vecs, dtype = np.float32))
+    distances, ids = index.search(np.ascontiguousarray(query_vecs, dtype = np.float32), k)
+
+    predicted = (1.0 / (1.0 + distances) >= similarity_threshold).any(axis = 1)
+    labels = np.asarray(labels, dtype = bool)
+
+    tp = int((predicted & labels).sum())
+    fp = int((predicted & ~labels).sum())
+    fn = int((~predicted & labels).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {"precision": precision, "recall": recall, "f1": f1}, ids
+
+
+def neighbour_overlap(ids_a, ids_b):
+    return float(np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(ids_a, ids_b)]))
+
+
+def choose_best(results, reference, max_f1_drop, min_cosine):
+    passing = [
+        r for r in results
+        if reference["metrics"]["f1"] - r["metrics"]["f1"] <= max_f1_drop and r["query_drift"]["mean_cosine"] >= min_cosine
+    ]
+    if not passing:
+        return None
+    return min(passing, key = lambda r: r["latency"]["p50_ms"])
+
+
+def load_texts(dataset_path, indexes_dir, num_chunks, seed = 0):
+    with open(dataset_path, "r", encoding = "utf-8") as f:
+        dataset = json.load(f)
+
+    # the positives' source chunks (every chunk of their source_hint file) are always in the sample, the rest is
+    # random. without them a small sample leaves most positives with nothing to match and the F1 says little
+    source_paths = {item["source_hint"] for item in dataset if item["is_positive"] and item.get("source_hint")}
+
+    with ChunkStore(Path(indexes_dir) / "chunk_store") as store:
+        path_pos = store.fields.index("source_path")
+        rows = list(store.live_rows())
+        sources = [row for row in rows if store.field(row, path_pos) in source_paths]
+        others = [row for row in rows if store.field(row, path_pos) not in source_paths]
+
+        rng = np.random.default_rng(seed)
+        extra = rng.choice(others, size = min(max(num_chunks - len(sources), 0), len(others)), replace = False)
+        picked = sorted(sources + [int(row) for row in extra])
+        text_pos = store.fields.index("text")
+        chunks = [store.field(int(row), text_pos) for row in picked]
+
+    return [item["query_code"] for item in dataset], [item["is_positive"] for item in dataset], chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "benchmark the ONNX int8 encoder against the fp32 model")
+    parser.add_argument("--indexes", default = "indexes")
+    parser.add_argument("--dataset", default = "data/test_dataset.json")
+    parser.add_argument("--onnx-dir", default = DEFAULT_ONNX_DIR)
+    parser.add_argument("--export", action = "store_true", help = "export (or re-export) the ONNX model first")
+    parser.add_argument("--threads", type = int, nargs = "+", default = [1, 2, 4])
+    parser.add_argument("--chunks", type = int, default = 2000, help = "corpus sample for drift and detection metrics (the positives' source chunks are always in it)")
+    parser.add_argument("--k", type = int, default = 10)
+    parser.add_argument("--select", action = "store_true", help = "save the best passing config to indexes/encoder.json")
+    parser.add_argument("--max-f1-drop", type = float, default = 0.01)
+    parser.add_argument("--min-cosine", type = float, default = 0.99)
+    args = parser.parse_args()
+
+    indexes_dir = Path(args.indexes)
+    with open(indexes_dir / "meta.json", "r", encoding = "utf-8") as f:
+        meta = json.load(f)
+    model_name = meta["embedding_model"]
+
+    onnx_dir = Path(args.onnx_dir)
+    if args.export or not (onnx_dir / ONNX_INT8_FILE).exists():
+        print(f"exporting {model_name} to {onnx_dir}")
+        export_onnx(model_name, onnx_dir)
+
+    queries, labels, chunks = load_texts(args.dataset, indexes_dir, args.chunks)
+
+    reference_encoder = load_encoder({"type": "sentence_transformers"}, model_name)
+    reference_queries = reference_encoder(queries)
+    reference_chunks = reference_encoder(chunks)
+    reference_metrics, reference_ids = detection_metrics(reference_queries, reference_chunks, labels, k = args.k)
+    reference = {
+        "config": {"type": "sentence_transformers"},
+        "latency": measure_latency(reference_encoder, queries),
+        "metrics": reference_metrics
+    }
+
+    results = []
+    for threads in args.threads:
+        config = {"type": "onnx_int8", "path": str(onnx_dir), "intra_op_threads": threads, "max_length": 256}
+        encoder = load_encoder(config, model_name)
+
+        query_vecs = encoder(queries)
+        chunk_vecs = encoder(chunks)
+        metrics, ids = detection_metrics(query_vecs, chunk_vecs, labels, k = args.k)
+
+        results.append({
+            "config": config,
+            "latency": measure_latency(encoder, queries),
+            "query_drift": drift_summary(reference_queries, query_vecs),
+            "chunk_drift": drift_summary(reference_chunks, chunk_vecs),
+            "metrics": metrics,
+            f"neighbour_overlap@{args.k}": neighbour_overlap(reference_ids, ids)
+        })
+
+    best = choose_best(results, reference, args.max_f1_drop, args.min_cosine)
+
+    for r in [reference] + results:
+        drift = r.get("query_drift", {}).get("mean_cosine", 1.0)
+        print(
+            f"{json.dumps(r['config']):100s} p50 {r['latency']['p50_ms']:.2f} ms  p95 {r['latency']['p95_ms']:.2f} ms  "
+            f"{r['latency']['texts_per_s']:.1f} texts/s  cosine {drift:.4f}  F1 {r['metrics']['f1']:.3f}"
+        )
+
+    with open(indexes_dir / "encoder_benchmark.json", "w", encoding = "utf-8") as f:
+        json.dump({"reference": reference, "results": results, "best": best}, f, indent = 2)
+
+    if not args.select:
+        return
+
+    if best is None:
+        print(f"no int8 config stayed within F1 drop {args.max_f1_drop} and cosine {args.min_cosine}, keeping the fp32 encoder")
+        return
+
+    with open(indexes_dir / "encoder.json", "w", encoding = "utf-8") as f:
+        json.dump(best["config"], f, indent = 2)
+
+    print(f"best: {best['config']} saved to {indexes_dir / 'encoder.json'}, re-run 02_indexing to re-embed the corpus with it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import json
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# BM25 over a term-major CSR postings matrix.
+# scores follow rank_bm25.BM25Okapi (same idf with epsilon floor, same k1 / b), so results match the old index,
+# but a query only touches the postings of its own terms instead of scoring every chunk in python.
+#
+# on disk it's a directory of .npy arrays plus bm25.json, loaded with mmap so opening it doesn't read postings:
+# - terms.npy: sorted vocabulary, term id = position
+# - indptr.npy: postings of term t are [indptr[t], indptr[t + 1])
+# - doc_ids.npy / tfs.npy: chunk index and term frequency of every posting
+# - weights.npy: precomputed idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) of every posting
+# - idf.npy / doc_len.npy: per term idf and per chunk length
+# - live.npy: False for removed chunks, they keep their row but have no postings and don't count in N or avgdl
+
+BM25_META_FILE = "bm25.json"
+BM25_ARRAYS = ["terms", "indptr", "doc_ids", "tfs", "weights", "idf", "doc_len", "live"]
+
+
+def count_terms(toks):
+    counts = {}
+    for t in toks:
+        counts[t] = counts.get(t, 0) + 1
+    return counts
+
+
+class PostingsBuffer:
+    # postings of new chunks collected before they are merged into a BM25Index.
+    # terms are interned once and postings go into int arrays, so a big batch of chunks costs ~12 bytes per posting.
+    def __init__(self):
+        self.terms = []
+        self.term_pos = {}
+        self.term_ids = array("i")
+        self.doc_ids = array("i")
+        self.tfs = array("i")
+        self.doc_lens = {}
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    def add(self, doc_id, toks):
+        self.add_counts(doc_id, count_terms(toks), len(toks))
+
+    def add_counts(self, doc_id, counts, length):
+        self.doc_lens[doc_id] = length
+
+        for t, tf in counts.items():
+            term = self.term_pos.get(t)
+            if term is None:
+                term = len(self.terms)
+                self.term_pos[t] = term
+                self.terms.append(t)
+
+            self.term_ids.append(term)
+            self.doc_ids.append(doc_id)
+            self.tfs.append(tf)
+
+    def save(self, buffer_dir):
+        # a spilled segment of postings (IncrementalIndexer), merged into the index later
+        buffer_dir = Path(buffer_dir)
+        buffer_dir.mkdir(parents = True, exist_ok = True)
+
+        np.save(buffer_dir / "terms.npy", np.asarray(self.terms, dtype = str))
+        np.save(buffer_dir / "term_ids.npy", np.frombuffer(self.term_ids, dtype = np.int32))
+        np.save(buffer_dir / "doc_ids.npy", np.frombuffer(self.doc_ids, dtype = np.int32))
+        np.save(buffer_dir / "tfs.npy", np.frombuffer(self.tfs, dtype = np.int32))
+        np.save(buffer_dir / "doc_rows.npy", np.fromiter(self.doc_lens.keys(), dtype = np.int64, count = len(self.doc_lens)))
+        np.save(buffer_dir / "doc_lens.npy", np.fromiter(self.doc_lens.values(), dtype = np.int64, count = len(self.doc_lens)))
+
+    @classmethod
+    def load(cls, buffer_dir):
+        buffer_dir = Path(buffer_dir)
+        postings = cls()
+
+        postings.terms = np.load(buffer_dir / "terms.npy").tolist()
+        postings.term_pos = {t: pos for pos, t in enumerate(postings.terms)}
+        for name in ["term_ids", "doc_ids", "tfs"]:
+            setattr(postings, name, array("i", np.load(buffer_dir / f"{name}.npy").astype(np.int32).tobytes()))
+        postings.doc_lens = dict(zip(np.load(buffer_dir / "doc_rows.npy").tolist(), np.load(buffer_dir / "doc_lens.npy").tolist()))
+
+        return postings
+
+
+class BM25Index:
+    def __init__(self, terms, indptr, doc_ids, tfs, weights, idf, doc_len, live = None, k1 = 1.5, b = 0.75, epsilon = 0.25):
+        self.terms = terms
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.weights = weights
+        self.idf = idf
+        self.doc_len = doc_len
+        self.live = live if live is not None else np.ones(len(doc_len), dtype = bool)
+
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+    @property
+    def corpus_size(self):
+        return len(self.doc_len)
+
+    @property
+    def num_live(self):
+        return int(np.count_nonzero(self.live))
+
+    @classmethod
+    def build(cls, tokenized_corpus, k1 = 1.5, b = 0.75, epsilon = 0.25):
+        index = cls(
+            np.zeros(0, dtype = str),
+            np.zeros(1, dtype = np.int64),
+            np.zeros(0, dtype = np.int32),
+            np.zeros(0, dtype = np.int32),
+            np.zeros(0, dtype = np.float32),
+            np.zeros(0, dtype = np.float32),
+            np.zeros(0, dtype = np.int32),
+            k1 = k1,
+            b = b,
+            epsilon = epsilon
+        )
+        index.update(added_docs = enumerate(tokenized_corpus))
+        return index
+
+    def update(self, removed_docs = (), added_docs = ()):
+        # removed_docs: chunk rows to drop, added_docs: (row, tokens) pairs for new chunks
+        postings = PostingsBuffer()
+        for doc_id, toks in added_docs:
+            postings.add(doc_id, toks)
+
+        self.merge(postings, removed_docs = removed_docs)
+
+    def merge(self, *postings, removed_docs = ()):
+        # postings of the rest of the corpus are merged as arrays, nothing is re-tokenized,
+        # then N, avgdl, idf and weights are recomputed from the merged postings.
+        # several buffers (e.g. the spilled segments of an indexing run) are merged in one pass, so the postings
+        # are sorted once and not once per buffer
+        new_lens = {doc_id: length for buffer in postings for doc_id, length in buffer.doc_lens.items()}
+        new_terms = [np.asarray(buffer.terms, dtype = str) for buffer in postings]
+
+        num_docs = max([len(self.doc_len)] + [doc_id + 1 for doc_id in new_lens])
+        doc_len = np.zeros(num_docs, dtype = np.int32)
+        doc_len[:len(self.doc_len)] = self.doc_len
+        live = np.zeros(num_docs, dtype = bool)
+        live[:len(self.live)] = self.live
+
+        removed = np.asarray(list(removed_docs), dtype = np.int64)
+        doc_len[removed] = 0
+        live[removed] = False
+        for doc_id, length in new_lens.items():
+            doc_len[doc_id] = length
+            live[doc_id] = True
+
+        # old postings as (term, doc, tf) triples, minus removed and re-added docs
+        old_terms = np.repeat(np.arange(len(self.terms)), np.diff(self.indptr))
+        keep = ~np.isin(self.doc_ids, np.concatenate([removed, np.fromiter(new_lens, dtype = np.int64)]))
+
+        vocab = np.asarray(self.terms, dtype = str)
+        for terms in new_terms:
+            vocab = np.union1d(vocab, terms)
+        old_term_ids = np.searchsorted(vocab, np.asarray(self.terms))[old_terms[keep]] if len(self.terms) else old_terms[keep]
+        new_term_ids = [
+            np.searchsorted(vocab, terms)[np.asarray(buffer.term_ids, dtype = np.int64)] if len(terms) else np.zeros(0, dtype = np.int64)
+            for buffer, terms in zip(postings, new_terms)
+        ]
+
+        term_ids = np.concatenate([old_term_ids] + new_term_ids).astype(np.int64)
+        doc_ids = np.concatenate(
+            [np.asarray(self.doc_ids)[keep]] + [np.asarray(buffer.doc_ids, dtype = np.int32) for buffer in postings]
+        ).astype(np.int32)
+        tfs = np.concatenate(
+            [np.asarray(self.tfs)[keep]] + [np.asarray(buffer.tfs, dtype = np.int32) for buffer in postings]
+        ).astype(np.int32)
+
+        # drop terms that lost all their postings, they must not count in the average idf
+        used = np.unique(term_ids)
+        vocab = vocab[used]
+        term_ids = np.searchsorted(used, term_ids)
+
+        order = np.lexsort((doc_ids, term_ids))
+        self.terms = vocab
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength = len(vocab)))]).astype(np.int64)
+        self.doc_ids = doc_ids[order]
+        self.tfs = tfs[order]
+        self.doc_len = doc_len
+        self.live = live
+
+        self.compute_weights()
+
+    def compute_weights(self):
+        # idf and length norms only change when the corpus changes, so every posting's score contribution is precomputed
+        num_docs = self.num_live
+        doc_freq = np.diff(self.indptr).astype(np.float64)
+
+        idf = np.log(num_docs - doc_freq + 0.5) - np.log(doc_freq + 0.5) if len(doc_freq) else doc_freq
+        average_idf = float(idf.mean()) if len(idf) else 0.0
+        idf = np.where(idf < 0, self.epsilon * average_idf, idf)
+
+        avgdl = float(self.doc_len[self.live].mean()) if num_docs else 0.0
+        norms = self.k1 * (1 - self.b + self.b * self.doc_len / avgdl) if avgdl > 0 else np.full(len(self.doc_len), self.k1)
+
+        tfs = self.tfs.astype(np.float64)
+        posting_idf = np.repeat(idf, np.diff(self.indptr))
+
+        self.idf = idf.astype(np.float32)
+        self.weights = (posting_idf * tfs * (self.k1 + 1) / (tfs + norms[self.doc_ids])).astype(np.float32)
+
+    def term_id(self, term):
+        pos = int(np.searchsorted(self.terms, term))
+        if pos < len(self.terms) and self.terms[pos] == term:
+            return pos
+        return -1
+
+    def _query_postings(self, toks):
+        # doc ids and weights of all postings of the query terms, repeated query terms count once per occurrence like BM25Okapi
+        counts = count_terms(toks)
+
+        docs = []
+        weights = []
+        for t, count in counts.items():
+            term = self.term_id(t)
+            if term == -1:
+                continue
+
+            start, end = int(self.indptr[term]), int(self.indptr[term + 1])
+            docs.append(self.doc_ids[start:end])
+            weights.append(self.weights[start:end] * count)
+
+        if not docs:
+            return np.zeros(0, dtype = np.int32), np.zeros(0, dtype = np.float32)
+
+        return np.concatenate(docs), np.concatenate(weights)
+
+    def get_scores(self, toks):
+        # full score vector, same as BM25Okapi.get_scores, only meant for checks and small corpora
+        docs, weights = self._query_postings(toks)
+        scores = np.zeros(self.corpus_size, dtype = np.float64)
+        np.add.at(scores, docs, weights)
+        return scores
+
+    def top_k(self, toks, k, mask = None):
+        # returns (chunk indexes, scores) of the k best chunks, best first.
+        # only chunks containing at least one query term are candidates, so there may be fewer than k results.
+        # mask: optional bool per chunk, postings of other chunks are dropped before scoring
+        docs, weights = self._query_postings(toks)
+        if mask is not None and len(docs):
+            keep = mask[docs]
+            docs, weights = docs[keep], weights[keep]
+
+        if len(docs) == 0 or k <= 0:
+            return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.float64)
+
+        candidates, inverse = np.unique(docs, return_inverse = True)
+        scores = np.bincount(inverse, weights = weights)
+
+        if len(candidates) > k:
+            # everything tied with the k-th score too, so ties at the cut go to the lowest chunk index
+            # (and a sharded search, plagiarism/shards.py, returns the same chunks)
+            kth = np.partition(-scores, k - 1)[k - 1]
+            best = np.flatnonzero(-scores <= kth)
+        else:
+            best = np.arange(len(candidates))
+
+        order = np.lexsort((candidates[best], -scores[best]))[:k] # score desc, then chunk index for stable ties
+        best = best[order]
+
+        return candidates[best].astype(np.int64), scores[best]
+
+    def top_k_batch(self, queries_toks, k, mask = None):
+        return [self.top_k(toks, k, mask = mask) for toks in queries_toks]
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents = True, exist_ok = True)
+
+        for name in BM25_ARRAYS:
+            np.save(index_dir / f"{name}.npy", getattr(self, name))
+
+        meta = {
+            "num_docs": self.corpus_size,
+            "num_live": self.num_live,
+            "num_terms": len(self.terms),
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon
+        }
+        with open(index_dir / BM25_META_FILE, "w", encoding = "utf-8") as f:
+            json.dump(meta, f, indent = 2)
+
+    @classmethod
+    def load(cls, index_dir, mmap = True):
+        index_dir = Path(index_dir)
+        meta_path = index_dir / BM25_META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(f"BM25 index not found at {index_dir}")
+
+        with open(meta_path, "r", encoding = "utf-8") as f:
+            meta = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(index_dir / f"{name}.npy", mmap_mode = mmap_mode)
+            for name in BM25_ARRAYS
+            if (index_dir / f"{name}.npy").exists()
+        }
+
+        return cls(**arrays, k1 = meta["k1"], b = meta["b"], epsilon = meta["epsilon"])
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+# retrieval candidates per query, kept at the largest k retrieved so far.
+# a search for a smaller k is answered with a prefix of the stored lists, so an evaluation grid that only varies
+# k, fusion weights or the LLM step retrieves every sample once (at the max k of the grid) instead of once per config.
+# results are tuples of arrays sorted best first, e.g. (distances, ids) for dense or (ids, scores) for BM25.
+# at most max_entries (kind, scope, query) entries are kept, the least recently used are dropped first.
+
+
+class CandidateMemo:
+    def __init__(self, max_entries = 100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict() # (kind, scope key, query) -> (k, arrays)
+        self._lock = threading.Lock()
+
+    def lookup(self, kind, queries, k, compute, scope_key = None):
+        # compute(queries, k) -> one tuple of arrays per query, only called for queries without k candidates yet
+        results = [None] * len(queries)
+        missing = OrderedDict() # query -> positions
+
+        with self._lock:
+            for pos, query in enumerate(queries):
+                key = (kind, scope_key, query)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] >= k:
+                    self._entries.move_to_end(key)
+                    results[pos] = tuple(a[:k] for a in entry[1])
+                    self.hits += 1
+                else:
+                    missing.setdefault(query, []).append(pos)
+                    self.misses += 1
+
+        if missing:
+            computed = compute(list(missing), k)
+
+            with self._lock:
+                for (query, positions), arrays in zip(missing.items(), computed):
+                    key = (kind, scope_key, query)
+                    entry = self._entries.get(key)
+                    if entry is None or entry[0] < k:
+                        self._entries[key] = (k, tuple(arrays))
+                    self._entries.move_to_end(key)
+
+                    for pos in positions:
+                        results[pos] = tuple(arrays)
+
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last = False)
+
+        return results
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "size": len(self._entries)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+# thresholds of the cascade detector: a query whose retrieval similarity is clearly high is accepted as plagiarism,
+# clearly low is rejected, and only the band in between is sent to the LLM.
+#
+# thresholds are a plain dict, saved as json:
+# - accept_min: score >= accept_min is plagiarism without asking the LLM (None = never)
+# - reject_max: score <= reject_max is clean without asking the LLM (None = never)
+# - w_dense: weight of the dense similarity in the score, the rest is lexical overlap
+# - target_precision, margin, n: how they were fit
+
+DEFAULT_THRESHOLDS = {"accept_min": None, "reject_max": None, "w_dense": 0.5}
+
+
+def token_overlap(query_toks, chunk_toks):
+    # share of the query's distinct identifiers that also appear in the chunk, 0..1
+    query_set = set(query_toks)
+    if not query_set:
+        return 0.0
+    return len(query_set & set(chunk_toks)) / len(query_set)
+
+
+def cascade_score(dense_sim, lexical, w_dense):
+    # a missing source (retriever timed out) gives the other one full weight
+    if dense_sim is None:
+        return lexical
+    if lexical is None:
+        return dense_sim
+    return w_dense * dense_sim + (1.0 - w_dense) * lexical
+
+
+def _decisive_end(scores, labels, positive, target_precision):
+    # walks from the highest (positive) or lowest (negative) score towards the middle while the share of
+    # samples with that label stays >= target_precision, returns the last score of the walk or None.
+    # samples with equal scores are taken together, a threshold can't split them.
+    pairs = sorted(zip(scores, labels), key = lambda p: p[0], reverse = positive)
+    correct = 0
+    seen = 0
+    threshold = None
+
+    i = 0
+    while i < len(pairs):
+        score = pairs[i][0]
+        while i < len(pairs) and pairs[i][0] == score:
+            correct += int(bool(pairs[i][1]) == positive)
+            seen += 1
+            i += 1
+
+        if correct / seen < target_precision:
+            break
+        threshold = score
+
+    return threshold
+
+
+def fit_thresholds(scores, labels, target_precision = 1.0, margin = 0.0, w_dense = 0.5):
+    # margin moves both thresholds towards the LLM band, so scores close to the fitted edge still get escalated
+    accept_min = _decisive_end(scores, labels, True, target_precision)
+    reject_max = _decisive_end(scores, labels, False, target_precision)
+
+    if accept_min is not None:
+        accept_min += margin
+    if reject_max is not None:
+        reject_max -= margin
+
+    return {
+        "accept_min": accept_min,
+        "reject_max": reject_max,
+        "w_dense": w_dense,
+        "target_precision": target_precision,
+        "margin": margin,
+        "n": len(scores)
+    }
+
+
+def cascade_decision(score, thresholds):
+    # "accept", "reject" or "escalate", a None score (both retrievers timed out) is left to the LLM
+    if score is None:
+        return "escalate"
+
+    accept_min = thresholds.get("accept_min")
+    reject_max = thresholds.get("reject_max")
+
+    if accept_min is not None and score >= accept_min:
+        return "accept"
+    if reject_max is not None and score <= reject_max:
+        return "reject"
+    return "escalate"
+
+
+def escalated_fraction(decisions):
+    decisions = list(decisions)
+    if not decisions:
+        return 0.0
+    return sum(1 for d in decisions if d == "escalate") / len(decisions)
+
+
+def save_thresholds(path, thresholds):
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    with open(path, "w", encoding = "utf-8") as f:
+        json.dump(thresholds, f, indent = 2)
+
+
+def load_thresholds(path):
+    path = Path(path)
+    if not path.exists():
+        return dict(DEFAULT_THRESHOLDS)
+
+    with open(path, "r", encoding = "utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,202 @@
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# binary chunk store, one directory with:
+# - blob.bin: utf-8 bytes of every field of every chunk, written row by row
+# - offsets.npy: int64 offset table, field f of row r spans offsets[r * F + f] .. offsets[r * F + f + 1]
+# - store.json: field names and number of chunks
+# - live.npy: optional bool per row, rows of deleted chunks are False (rows are never reused, the store is append-only)
+# blob and tables are memory-mapped, so opening a store costs the same no matter how big the corpus is.
+# strings are only decoded when a row is actually accessed.
+
+CHUNK_FIELDS = ["id", "repo", "source_path", "text"]
+
+BLOB_FILE = "blob.bin"
+OFFSETS_FILE = "offsets.npy"
+LIVE_FILE = "live.npy"
+STORE_META_FILE = "store.json"
+
+
+class ChunkStoreWriter:
+    # append = True continues an existing store, new chunks get the next free rows
+    def __init__(self, store_dir, fields = CHUNK_FIELDS, append = False):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents = True, exist_ok = True)
+        self.fields = list(fields)
+        self.num_chunks = 0
+
+        # offsets and live flags of the whole store stay in compact arrays, not python lists, while appending
+        self._offsets = array("q", [0])
+        self._live = bytearray()
+
+        if append and (self.store_dir / STORE_META_FILE).exists():
+            with open(self.store_dir / STORE_META_FILE, "r", encoding = "utf-8") as f:
+                meta = json.load(f)
+
+            if meta["fields"] != self.fields:
+                raise ValueError(f"chunk store at {self.store_dir} has fields {meta['fields']}, expected {self.fields}")
+
+            self.num_chunks = meta["num_chunks"]
+            self._offsets = array("q", np.load(self.store_dir / OFFSETS_FILE).astype(np.int64).tobytes())
+
+            live_path = self.store_dir / LIVE_FILE
+            self._live = bytearray(np.load(live_path).astype(np.uint8).tobytes()) if live_path.exists() else bytearray([1]) * self.num_chunks
+
+            # a run that crashed before close() can leave blob bytes past the last saved offset, drop them so new rows
+            # start where the offset table says they do
+            blob_path = self.store_dir / BLOB_FILE
+            blob_size = blob_path.stat().st_size
+            if blob_size < self._offsets[-1]:
+                raise ValueError(f"chunk store at {self.store_dir} is truncated: blob has {blob_size} bytes, offsets end at {self._offsets[-1]}")
+
+            self._blob = open(blob_path, "r+b")
+            self._blob.truncate(self._offsets[-1])
+            self._blob.seek(self._offsets[-1])
+        else:
+            self._blob = open(self.store_dir / BLOB_FILE, "wb")
+
+        self._pos = self._offsets[-1]
+
+    def add(self, chunk):
+        for field in self.fields:
+            data = str(chunk[field]).encode("utf-8")
+            self._blob.write(data)
+            self._pos += len(data)
+            self._offsets.append(self._pos)
+
+        self._live.append(1)
+        self.num_chunks += 1
+        return self.num_chunks - 1
+
+    def add_many(self, chunks):
+        return [self.add(chunk) for chunk in chunks]
+
+    def delete(self, rows):
+        # rows stay in the blob so row numbers (and FAISS ids) never shift, they are only marked as dead
+        for row in rows:
+            self._live[row] = 0
+
+    def close(self):
+        if self._blob.closed:
+            return
+
+        self._blob.close()
+        _save_array(self.store_dir / OFFSETS_FILE, np.frombuffer(self._offsets, dtype = np.int64))
+        _save_array(self.store_dir / LIVE_FILE, np.frombuffer(bytes(self._live), dtype = np.uint8).astype(bool))
+
+        meta = {"fields": self.fields, "num_chunks": self.num_chunks, "num_live": int(sum(self._live))}
+        tmp_path = self.store_dir / (STORE_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding = "utf-8") as f:
+            json.dump(meta, f, indent = 2)
+        os.replace(tmp_path, self.store_dir / STORE_META_FILE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _save_array(path, values):
+    # readers may have the old table memory-mapped, so it's replaced by a rename instead of being overwritten in place
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def write_chunk_store(store_dir, chunks, fields = CHUNK_FIELDS):
+    with ChunkStoreWriter(store_dir, fields = fields) as writer:
+        writer.add_many(chunks)
+
+    return writer.num_chunks
+
+
+class ChunkColumn:
+    # lazy list-like view over one field, so existing code like chunk_texts[idx] or chunk_texts[:top_n] keeps working
+    def __init__(self, store, field):
+        self.store = store
+        self.field_pos = store.fields.index(field)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.store.field(i, self.field_pos) for i in range(*idx.indices(len(self)))]
+
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("chunk index out of range")
+
+        return self.store.field(idx, self.field_pos)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.store.field(i, self.field_pos)
+
+
+class ChunkStore:
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+
+        meta_path = self.store_dir / STORE_META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(f"chunk store not found at {self.store_dir}")
+
+        with open(meta_path, "r", encoding = "utf-8") as f:
+            meta = json.load(f)
+
+        self.fields = meta["fields"]
+        self.num_chunks = meta["num_chunks"]
+        self.offsets = np.load(self.store_dir / OFFSETS_FILE, mmap_mode = "r")
+
+        live_path = self.store_dir / LIVE_FILE
+        self.live = np.load(live_path, mmap_mode = "r") if live_path.exists() else None
+
+        self._blob_file = open(self.store_dir / BLOB_FILE, "rb")
+        if self.offsets[-1] > 0:
+            self._blob = mmap.mmap(self._blob_file.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            self._blob = b"" # mmap can't map an empty file
+
+    def __len__(self):
+        return self.num_chunks
+
+    def field(self, idx, field_pos):
+        pos = idx * len(self.fields) + field_pos
+        start = int(self.offsets[pos])
+        end = int(self.offsets[pos + 1])
+        return self._blob[start:end].decode("utf-8")
+
+    def is_live(self, idx):
+        return self.live is None or bool(self.live[idx])
+
+    def live_rows(self):
+        for idx in range(self.num_chunks):
+            if self.is_live(idx):
+                yield idx
+
+    def column(self, field):
+        return ChunkColumn(self, field)
+
+    def get(self, idx):
+        return {field: self.field(idx, pos) for pos, field in enumerate(self.fields)}
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._blob_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
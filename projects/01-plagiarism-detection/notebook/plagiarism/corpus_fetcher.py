@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode, urlparse
+
+# downloads the reference repos of 01_data_generation.
+# file contents are cached in cache_dir/blobs by their git blob sha, which the repo tree lists for every file,
+# so a re-run only downloads files that changed since the last one. the tree itself is asked for with the ETag
+# of the previous answer, and GitHub answers 304 (free, no rate limit) when nothing was pushed.
+# sources:
+# - GitHubSource: the GitHub API + raw files over one pooled session. api_base / raw_base can point to a local
+#   HTTP stand-in serving the same paths
+# - MirrorSource: a local folder with <owner>/<repo> or <repo> checkouts, nothing is downloaded
+
+GITHUB_API = "https://api.github.com"
+GITHUB_RAW = "https://raw.githubusercontent.com"
+
+
+def parse_github_url(url):
+    parsed = urlparse(url)
+    parts = parsed.path.strip("/").split("/")
+
+    if len(parts) < 2:
+        raise ValueError(f"Cannot parse owner and repo from {url}")
+
+    owner, repo = parts[0], parts[1]
+    return owner, repo
+
+
+def git_blob_sha(data):
+    # the sha git (and the GitHub tree API) gives a file with these bytes
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FetchCache:
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self.blobs_dir = self.dir / "blobs"
+        self.blobs_dir.mkdir(parents = True, exist_ok = True)
+        self.responses_path = self.dir / "responses.json"
+        self.lock = threading.Lock()
+
+        self.responses = {}
+        if self.responses_path.exists():
+            with open(self.responses_path, "r", encoding = "utf-8") as f:
+                self.responses = json.load(f)
+
+    def blob_path(self, sha):
+        return self.blobs_dir / sha[:2] / sha
+
+    def blob(self, sha):
+        path = self.blob_path(sha)
+        return path.read_bytes() if path.exists() else None
+
+    def put_blob(self, sha, data):
+        path = self.blob_path(sha)
+        path.parent.mkdir(exist_ok = True)
+        tmp = path.with_name(f"{sha}.{threading.get_ident()}.tmp") # downloads run in threads
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def response(self, key):
+        with self.lock:
+            return self.responses.get(key)
+
+    def put_response(self, key, etag, body):
+        with self.lock:
+            self.responses[key] = {"etag": etag, "body": body}
+
+    def save(self):
+        with self.lock:
+            tmp = self.responses_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding = "utf-8") as f:
+                json.dump(self.responses, f)
+            os.replace(tmp, self.responses_path)
+
+
+class GitHubSource:
+    def __init__(self, cache, api_base = GITHUB_API, raw_base = GITHUB_RAW, token = None, pool_size = 8, timeout = 30):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.cache = cache
+        self.api_base = api_base.rstrip("/")
+        self.raw_base = raw_base.rstrip("/")
+        self.timeout = timeout
+
+        # one keep-alive connection per download thread, rate limits and server errors are retried with backoff
+        retry = Retry(total = 3, backoff_factor = 0.5, status_forcelist = [429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections = 2, pool_maxsize = pool_size, max_retries = retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def api_get(self, path, params = None):
+        url = f"{self.api_base}/{path}"
+        key = f"{url}?{urlencode(params)}" if params else url
+
+        cached = self.cache.response(key)
+        headers = {"If-None-Match": cached["etag"]} if cached and cached["etag"] else {}
+        res = self.session.get(url, params = params, headers = headers, timeout = self.timeout)
+
+        if res.status_code == 304 and cached:
+            return cached["body"]
+        if res.status_code != 200:
+            raise RuntimeError(f"GitHub API error {res.status_code} on {url}: {res.text[:200]}")
+
+        body = res.json()
+        self.cache.put_response(key, res.headers.get("ETag"), body)
+        return body
+
+    def list_files(self, owner, repo, suffix = None):
+        # (branch, [(path, blob sha)]) in tree order, only paths ending with suffix (None = all)
+        branch = self.api_get(f"repos/{owner}/{repo}")["default_branch"]
+        tree = self.api_get(f"repos/{owner}/{repo}/git/trees/{branch}", params = {"recursive": "1"})
+        return branch, [
+            (item["path"], item["sha"])
+            for item in tree["tree"]
+            if item["type"] == "blob" and (suffix is None or item["path"].endswith(suffix))
+        ]
+
+    def read(self, owner, repo, branch, path):
+        raw_url = f"{self.raw_base}/{owner}/{repo}/{branch}/{path}"
+        res = self.session.get(raw_url, timeout = self.timeout)
+
+        if res.status_code != 200:
+            print(f"skip {raw_url}, status {res.status_code}")
+            return None
+
+        return res.content
+
+
+class MirrorSource:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def repo_dir(self, owner, repo):
+        nested = self.root / owner / repo
+        return nested if nested.is_dir() else self.root / repo
+
+    def list_files(self, owner, repo, suffix = None):
+        repo_dir = self.repo_dir(owner, repo)
+        if not repo_dir.is_dir():
+            raise RuntimeError(f"{owner}/{repo} not found in mirror {self.root}")
+
+        # only files with the suffix are read and hashed
+        files = []
+        for path in sorted(repo_dir.rglob("*" if suffix is None else f"*{suffix}")):
+            rel = path.relative_to(repo_dir)
+            if path.is_file() and ".git" not in rel.parts:
+                files.append((rel.as_posix(), git_blob_sha(path.read_bytes())))
+
+        return "mirror", files
+
+    def read(self, owner, repo, branch, path):
+        return (self.repo_dir(owner, repo) / path).read_bytes()
+
+
+class CorpusFetcher:
+    def __init__(self, source, cache, max_workers = 8):
+        self.source = source
+        self.cache = cache
+        self.max_workers = max_workers
+
+    def download(self, owner, repo, branch, path, sha):
+        data = self.source.read(owner, repo, branch, path)
+        if data:
+            # the branch may have moved since the tree was listed, cache what was actually downloaded
+            self.cache.put_blob(git_blob_sha(data), data)
+        return data
+
+    def fetch(self, repos, out_dir, max_files_per_repo = None, suffix = ".go"):
+        # repos: (owner, repo) pairs. writes out_dir/<repo>/<path> for the first max_files_per_repo non empty files
+        # of every repo, only files whose content changed are rewritten. returns {repo: stats}
+        out_dir = Path(out_dir)
+
+        with ThreadPoolExecutor(max_workers = self.max_workers) as pool:
+            listings = list(pool.map(lambda r: self.source.list_files(*r, suffix = suffix), repos))
+
+            stats = {}
+            for (owner, repo), (branch, files) in zip(repos, listings):
+                stats[repo] = self.fetch_repo(pool, owner, repo, branch, files, out_dir, max_files_per_repo)
+
+        self.cache.save()
+        return stats
+
+    def fetch_repo(self, pool, owner, repo, branch, files, out_dir, max_files):
+        stats = {"files": 0, "cached": 0, "downloaded": 0, "skipped": 0, "written": 0}
+        wanted = len(files) if max_files is None else max_files
+        pos = 0
+
+        # empty or failed files don't count, so the next ones in the tree are tried in their place
+        while stats["files"] < wanted and pos < len(files):
+            batch = files[pos:pos + wanted - stats["files"]]
+            pos += len(batch)
+
+            cached = {path: self.cache.blob(sha) for path, sha in batch}
+            missing = [(path, sha) for path, sha in batch if cached[path] is None]
+            downloaded = pool.map(lambda f: self.download(owner, repo, branch, *f), missing)
+            contents = {**cached, **dict(zip((path for path, _ in missing), downloaded))}
+
+            stats["cached"] += len(batch) - len(missing)
+            stats["downloaded"] += len(missing)
+
+            for path, _ in batch:
+                data = contents[path]
+                if not data:
+                    stats["skipped"] += 1
+                    continue
+
+                target = out_dir / repo / path
+                if not target.exists() or target.read_bytes() != data:
+                    target.parent.mkdir(parents = True, exist_ok = True)
+                    target.write_bytes(data)
+                    stats["written"] += 1
+
+                stats["files"] += 1
+
+        return stats
@@ -0,0 +1,147 @@
+import json
+import math
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# dense search backends for the plagiarism index.
+# indexes/dense_index.faiss is always the exact ID-mapped flat index kept up to date by the incremental indexer,
+# it's the source of truth and the recall reference. other backends are built from its vectors (no re-embedding)
+# into their own file, and every backend is wrapped in IndexIDMap2 so search results are chunk store rows.
+#
+# backend configs are plain dicts, recorded in meta.json:
+# - {"type": "flat"}
+# - {"type": "hnsw", "M": 32, "efConstruction": 80, "efSearch": 64}
+# - {"type": "ivf_flat", "nlist": None, "nprobe": 8} (nlist None = picked from corpus size)
+# - {"type": "ivf_pq", "nlist": None, "nprobe": 8, "m": None, "nbits": 8} (m None = picked from dimension)
+
+DENSE_BACKENDS = ["flat", "hnsw", "ivf_flat", "ivf_pq"]
+DEFAULT_BACKEND = {"type": "flat"}
+
+# parameters that only change search behaviour, they can be swept without rebuilding the index
+SEARCH_PARAMS = {"hnsw": ["efSearch"], "ivf_flat": ["nprobe"], "ivf_pq": ["nprobe"]}
+
+
+def load_backend_config(path):
+    path = Path(path)
+    if not path.exists():
+        return dict(DEFAULT_BACKEND)
+
+    with open(path, "r", encoding = "utf-8") as f:
+        return json.load(f)
+
+
+def auto_nlist(num_vectors):
+    # ~4 * sqrt(N) lists, but keep at least ~40 training points per list
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 40))
+
+
+def auto_pq_m(dim):
+    for m in [48, 32, 24, 16, 12, 8, 4, 2, 1]:
+        if dim % m == 0 and m <= dim // 4:
+            return m
+    return 1
+
+
+def master_vectors(master_index):
+    # (vectors, ids) of an IndexIDMap2 over a flat index
+    inner = faiss.downcast_index(master_index.index)
+    vecs = inner.reconstruct_n(0, inner.ntotal) if inner.ntotal else np.zeros((0, inner.d), dtype = np.float32)
+    ids = faiss.vector_to_array(master_index.id_map).astype(np.int64)
+    return np.asarray(vecs, dtype = np.float32), ids
+
+
+def build_dense_index(config, vecs, ids):
+    backend = config.get("type", "flat")
+    if backend not in DENSE_BACKENDS:
+        raise ValueError(f"unknown dense backend {backend}, expected one of {DENSE_BACKENDS}")
+
+    num_vectors, dim = vecs.shape
+
+    if backend == "flat":
+        inner = faiss.IndexFlatL2(dim)
+    elif backend == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, config.get("M", 32))
+        inner.hnsw.efConstruction = config.get("efConstruction", 80)
+    else:
+        nlist = config.get("nlist") or auto_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dim)
+
+        if backend == "ivf_flat":
+            inner = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            m = config.get("m") or auto_pq_m(dim)
+            # 2^nbits centroids per sub-quantizer need enough training points
+            nbits = min(config.get("nbits", 8), max(1, int(math.log2(max(num_vectors, 2)))))
+            inner = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits)
+
+        inner.train(vecs)
+
+    index = faiss.IndexIDMap2(inner)
+    if num_vectors:
+        index.add_with_ids(vecs, ids)
+
+    set_search_params(index, config)
+    return index
+
+
+def set_search_params(index, config):
+    backend = config.get("type", "flat")
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+
+    if backend == "hnsw":
+        inner.hnsw.efSearch = config.get("efSearch", 64)
+    elif backend in ["ivf_flat", "ivf_pq"]:
+        faiss.extract_index_ivf(inner).nprobe = config.get("nprobe", 8)
+
+
+def filtered_search_params(config, rows):
+    # search parameters that only let the given chunk rows through. the selector is checked inside the search,
+    # so there's no over-fetch and post-filtering. on hnsw / ivf a very narrow filter can return fewer than k hits.
+    sel = faiss.IDSelectorBatch(np.asarray(rows, dtype = np.int64))
+    backend = config.get("type", "flat")
+
+    if backend == "hnsw":
+        return faiss.SearchParametersHNSW(sel = sel, efSearch = config.get("efSearch", 64))
+    if backend in ["ivf_flat", "ivf_pq"]:
+        return faiss.SearchParametersIVF(sel = sel, nprobe = config.get("nprobe", 8))
+    return faiss.SearchParameters(sel = sel)
+
+
+def search_index_file(config):
+    backend = config.get("type", "flat")
+    return "dense_index.faiss" if backend == "flat" else f"dense_index_{backend}.faiss"
+
+
+def build_search_index(indexes_dir, config, master_file = "dense_index.faiss"):
+    # builds the configured backend from the master flat index, returns the file name to search.
+    # skipped when the file was already built from the same master with the same config.
+    indexes_dir = Path(indexes_dir)
+    target_file = search_index_file(config)
+    if target_file == master_file:
+        return target_file
+
+    master_path = indexes_dir / master_file
+    sidecar_path = indexes_dir / f"{target_file}.json"
+    build_info = {"config": config, "master_mtime_ns": master_path.stat().st_mtime_ns}
+
+    if sidecar_path.exists() and (indexes_dir / target_file).exists():
+        with open(sidecar_path, "r", encoding = "utf-8") as f:
+            if json.load(f) == build_info:
+                return target_file
+
+    vecs, ids = master_vectors(faiss.read_index(str(master_path)))
+    index = build_dense_index(config, vecs, ids)
+    faiss.write_index(index, str(indexes_dir / target_file))
+
+    with open(sidecar_path, "w", encoding = "utf-8") as f:
+        json.dump(build_info, f, indent = 2)
+
+    return target_file
+
+
+def load_dense_index(path, config):
+    index = faiss.read_index(str(path))
+    set_search_params(index, config)
+    return index
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+# LRU cache of query embeddings, keyed by sha256(model name + normalized code).
+# resubmitted or repeated code is looked up here instead of going through the model again.
+
+
+def normalize_code(text):
+    # line endings and trailing whitespace don't change what the code does, so they shouldn't change the key
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, max_entries = 10000, cache_path = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_path = Path(cache_path) if cache_path else None
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_path and self.cache_path.exists():
+            self.load()
+
+    def key(self, text):
+        payload = f"{self.model_name}\0{normalize_code(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def encode(self, texts, encode_fn):
+        # returns a (len(texts), dim) float32 matrix, only texts not in the cache are passed to encode_fn
+        keys = [self.key(t) for t in texts]
+        vecs = [None] * len(texts)
+        missing = OrderedDict() # key -> positions in texts that need it
+
+        with self._lock:
+            for pos, key in enumerate(keys):
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    vecs[pos] = vec
+                    self.hits += 1
+                elif key in missing:
+                    missing[key].append(pos) # duplicate inside the same call, encoded once
+                    self.hits += 1
+                else:
+                    missing[key] = [pos]
+                    self.misses += 1
+
+        if missing:
+            new_vecs = np.asarray(encode_fn([texts[positions[0]] for positions in missing.values()]), dtype = np.float32)
+
+            with self._lock:
+                for (key, positions), vec in zip(missing.items(), new_vecs):
+                    self._put(key, vec)
+                    for pos in positions:
+                        vecs[pos] = vec
+
+        if not vecs:
+            return np.zeros((0, 0), dtype = np.float32)
+
+        return np.stack(vecs).astype(np.float32)
+
+    def _put(self, key, vec):
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last = False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "size": len(self._entries)
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self):
+        if self.cache_path is None or not self._entries:
+            return
+
+        with self._lock:
+            keys = np.array(list(self._entries.keys()))
+            vecs = np.stack(list(self._entries.values()))
+
+        self.cache_path.parent.mkdir(parents = True, exist_ok = True)
+        np.savez(self.cache_path, model_name = np.array(self.model_name), keys = keys, vecs = vecs)
+
+    def load(self):
+        with np.load(self.cache_path, allow_pickle = False) as data:
+            if str(data["model_name"]) != self.model_name:
+                return # vectors from another model are useless
+
+            with self._lock:
+                for key, vec in zip(data["keys"], data["vecs"]):
+                    self._put(str(key), vec)
@@ -0,0 +1,287 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# code encoders behind embed_code in 03_interactive and the encode step of 02_indexing.
+# configs are plain dicts, recorded in meta.json next to the dense backend, so queries are always encoded the way
+# the corpus was:
+# - {"type": "sentence_transformers"}: eager PyTorch fp32, the reference
+# - {"type": "onnx_int8", "path": "indexes/encoder_onnx", "intra_op_threads": None, "max_length": 256}:
+#   the same model exported to ONNX with dynamically quantized int8 weights, run by onnxruntime on the CPU
+#   (intra_op_threads None = onnxruntime default, one per physical core)
+# export and compare them with: python -m plagiarism.bench_encoder --export
+#
+# all-MiniLM-L6-v2 is BERT + mean pooling + L2 normalization, the ONNX graph only covers BERT
+# and the pooling is done here in numpy.
+#
+# both are wrapped in a WindowedEncoder, which the other keys of the config control:
+# - split_long: the model silently drops every token past its max sequence length (256 word pieces for MiniLM,
+#   a whole file without funcs is often longer). such texts are split on line boundaries into windows that
+#   overlap by window_overlap_lines lines, and the text vector is the normalized mean of its window vectors
+# - bucket_by_length: texts (windows) are sorted by token count before batching, so a batch is padded to
+#   texts of about its own length instead of the longest text that happened to land in it
+
+ENCODER_BACKENDS = ["sentence_transformers", "onnx_int8"]
+DEFAULT_ENCODER = {"type": "sentence_transformers", "split_long": True, "window_overlap_lines": 2, "bucket_by_length": True}
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+ONNX_META_FILE = "encoder.json"
+
+
+def encoder_config(config = None):
+    return {**DEFAULT_ENCODER, **(config or {})}
+
+
+def load_encoder_config(path):
+    path = Path(path)
+    if not path.exists():
+        return encoder_config()
+
+    with open(path, "r", encoding = "utf-8") as f:
+        return encoder_config(json.load(f))
+
+
+def encoder_key(model_name, config):
+    # name the indexer's manifest and the embedding cache use, vectors of different encoders must never mix.
+    # bucket_by_length doesn't change the vectors and isn't part of it
+    config = encoder_config(config)
+    key = model_name
+    if config["type"] != "sentence_transformers":
+        key += f"@{config['type']}"
+    if config["split_long"]:
+        key += f"+windows{config['window_overlap_lines']}"
+    return key
+
+
+def mean_pool(token_embeddings, attention_mask):
+    # (batch, seq, dim) + (batch, seq) -> L2 normalized (batch, dim), padding tokens don't count
+    mask = attention_mask[:, :, None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis = 1)
+    pooled = summed / np.maximum(mask.sum(axis = 1), 1e-9)
+    return pooled / np.maximum(np.linalg.norm(pooled, axis = 1, keepdims = True), 1e-12)
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, model_name, batch_size = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
+        self.max_length = self.model.max_seq_length
+
+    def token_counts(self, texts):
+        # word pieces without [CLS] / [SEP], not truncated
+        ids = self.model.tokenizer(list(texts), add_special_tokens = False, truncation = False, verbose = False)["input_ids"]
+        return [len(i) for i in ids]
+
+    def __call__(self, texts):
+        vecs = self.model.encode(list(texts), batch_size = self.batch_size, convert_to_numpy = True, show_progress_bar = False)
+        return np.asarray(vecs, dtype = np.float32).reshape(len(texts), -1)
+
+
+class OnnxEncoder:
+    # session: onnxruntime InferenceSession of the exported BERT, tokenizer: a `tokenizers` Tokenizer with truncation on
+    def __init__(self, session, tokenizer, batch_size = 64, max_length = 256):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    @classmethod
+    def from_dir(cls, model_dir, intra_op_threads = None, max_length = 256, batch_size = 64, quantized = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        session = ort.InferenceSession(
+            str(model_dir / (ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)),
+            sess_options = options,
+            providers = ["CPUExecutionProvider"]
+        )
+
+        tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length = max_length)
+        tokenizer.no_padding() # batches are padded here, to their own longest text
+
+        return cls(session, tokenizer, batch_size = batch_size, max_length = max_length)
+
+    def token_counts(self, texts):
+        # word pieces without [CLS] / [SEP]. the tokenizer truncates at max_length, which is still enough to tell
+        # that a text doesn't fit (and lines are short)
+        return [len(e.ids) for e in self.tokenizer.encode_batch(list(texts), add_special_tokens = False)]
+
+    def __call__(self, texts):
+        texts = list(texts)
+        encodings = self.tokenizer.encode_batch(texts)
+
+        # batches of similar length, so short queries aren't padded to the longest chunk of the call
+        order = sorted(range(len(texts)), key = lambda i: len(encodings[i].ids))
+        vecs = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            seq_len = max(len(encodings[i].ids) for i in batch)
+
+            inputs = {
+                "input_ids": np.zeros((len(batch), seq_len), dtype = np.int64),
+                "attention_mask": np.zeros((len(batch), seq_len), dtype = np.int64),
+                "token_type_ids": np.zeros((len(batch), seq_len), dtype = np.int64)
+            }
+            for row, i in enumerate(batch):
+                n = len(encodings[i].ids)
+                inputs["input_ids"][row, :n] = encodings[i].ids
+                inputs["attention_mask"][row, :n] = 1
+
+            token_embeddings = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+            for row, vec in zip(batch, mean_pool(token_embeddings, inputs["attention_mask"])):
+                vecs[row] = vec
+
+        if not vecs:
+            return np.zeros((0, 0), dtype = np.float32)
+        return np.stack(vecs).astype(np.float32)
+
+
+class WindowedEncoder:
+    # encoder: SentenceTransformerEncoder or OnnxEncoder (anything with max_length, token_counts and __call__).
+    # stats add up over calls: texts, windows, split (texts cut into windows), tokens (fed to the model, with
+    # [CLS] / [SEP]) and padded_tokens (batch size x longest text of every batch, what the model actually computes)
+    def __init__(self, encoder, split_long = True, overlap_lines = 2, bucket_by_length = True, batch_size = 64):
+        self.encoder = encoder
+        self.split_long = split_long
+        self.overlap_lines = overlap_lines
+        self.bucket_by_length = bucket_by_length
+        self.batch_size = batch_size
+        self.max_tokens = encoder.max_length - 2
+        self.stats = {"texts": 0, "windows": 0, "split": 0, "tokens": 0, "padded_tokens": 0}
+
+    def split(self, text, length):
+        # [(window text, tokens)], consecutive windows share overlap_lines lines.
+        # a single line over max_tokens still gets truncated by the model
+        if not self.split_long or length <= self.max_tokens:
+            return [(text, min(length, self.max_tokens))]
+
+        lines = text.split("\n")
+        costs = self.encoder.token_counts(lines)
+        windows = []
+        start = 0
+
+        while True:
+            end = start
+            tokens = 0
+            while end < len(lines) and (end == start or tokens + costs[end] <= self.max_tokens):
+                tokens += costs[end]
+                end += 1
+
+            windows.append(("\n".join(lines[start:end]), min(tokens, self.max_tokens)))
+            if end == len(lines):
+                return windows
+            start = max(end - self.overlap_lines, start + 1)
+
+    def __call__(self, texts):
+        texts = list(texts)
+        windows = []
+        tokens = []
+        parents = []
+
+        for pos, (text, length) in enumerate(zip(texts, self.encoder.token_counts(texts))):
+            parts = self.split(text, length)
+            for window, count in parts:
+                windows.append(window)
+                tokens.append(count + 2)
+                parents.append(pos)
+            self.stats["split"] += len(parts) > 1
+
+        order = sorted(range(len(windows)), key = lambda i: tokens[i]) if self.bucket_by_length else list(range(len(windows)))
+        vecs = None
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            out = np.asarray(self.encoder([windows[i] for i in batch]), dtype = np.float32)
+            if vecs is None:
+                vecs = np.zeros((len(windows), out.shape[1]), dtype = np.float32)
+            vecs[batch] = out
+
+            self.stats["tokens"] += sum(tokens[i] for i in batch)
+            self.stats["padded_tokens"] += len(batch) * max(tokens[i] for i in batch)
+
+        self.stats["texts"] += len(texts)
+        self.stats["windows"] += len(windows)
+
+        if vecs is None:
+            return np.zeros((0, 0), dtype = np.float32)
+        if len(windows) == len(texts):
+            return vecs
+
+        pooled = np.zeros((len(texts), vecs.shape[1]), dtype = np.float32)
+        np.add.at(pooled, np.asarray(parents), vecs)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis = 1, keepdims = True), 1e-12)
+
+
+def load_encoder(config, model_name, batch_size = 64):
+    # returns encode(list of texts) -> float32 (n, dim) matrix, a WindowedEncoder
+    config = encoder_config(config)
+    kind = config["type"]
+
+    if kind == "sentence_transformers":
+        encoder = SentenceTransformerEncoder(model_name, batch_size = batch_size)
+    elif kind == "onnx_int8":
+        encoder = OnnxEncoder.from_dir(
+            config["path"],
+            intra_op_threads = config.get("intra_op_threads"),
+            max_length = config.get("max_length", 256),
+            batch_size = batch_size
+        )
+    else:
+        raise ValueError(f"unknown encoder type {kind}, expected one of {ENCODER_BACKENDS}")
+
+    return WindowedEncoder(
+        encoder,
+        split_long = config["split_long"],
+        overlap_lines = config["window_overlap_lines"],
+        bucket_by_length = config["bucket_by_length"],
+        batch_size = batch_size
+    )
+
+
+def export_onnx(model_name, out_dir, opset = 17):
+    # BERT of a sentence-transformers model -> out_dir/model.onnx (fp32) and out_dir/model_int8.onnx
+    # (dynamic int8 quantization of the weights, activations are quantized on the fly), plus its tokenizer
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents = True, exist_ok = True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(out_dir) # writes tokenizer.json, what OnnxEncoder reads
+
+    sample = tokenizer(["func main() {\n    fmt.Println(1)\n}"], return_tensors = "pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            str(out_dir / ONNX_FP32_FILE),
+            input_names = names,
+            output_names = ["last_hidden_state"],
+            dynamic_axes = {name: {0: "batch", 1: "seq"} for name in names + ["last_hidden_state"]},
+            opset_version = opset
+        )
+
+    quantize_dynamic(str(out_dir / ONNX_FP32_FILE), str(out_dir / ONNX_INT8_FILE), weight_type = QuantType.QInt8)
+
+    with open(out_dir / ONNX_META_FILE, "w", encoding = "utf-8") as f:
+        json.dump({"model_name": model_name, "opset": opset}, f, indent = 2)
+
+    return out_dir
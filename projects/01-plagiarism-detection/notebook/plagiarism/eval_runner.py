@@ -0,0 +1,216 @@
+import asyncio
+import csv
+import random
+import threading
+import time
+from pathlib import Path
+
+# asyncio runner for the evaluation grid.
+# every job (one sample, or one batch of samples) waits for the rate limiter, runs in a worker thread,
+# is retried with jittered exponential backoff on transient API errors (every attempt waits for the rate limiter
+# again), and its rows are appended to the predictions CSV of its config right away. a re-run reads those CSVs and
+# skips samples that are already there.
+
+
+class TokenBucket:
+    # refills per_minute units per minute, up to capacity (default: one minute worth)
+    def __init__(self, per_minute, capacity = None, clock = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = float(self.capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # seconds until amount is available, a request bigger than the bucket only waits for a full bucket
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    # requests per minute and (estimated) tokens per minute, None = no limit on that one
+    def __init__(self, requests_per_min = None, tokens_per_min = None):
+        self.requests = TokenBucket(requests_per_min) if requests_per_min else None
+        self.tokens = TokenBucket(tokens_per_min) if tokens_per_min else None
+        self._lock = None
+
+    async def acquire(self, requests = 1, tokens = 0):
+        if self._lock is None:
+            self._lock = asyncio.Lock() # created lazily, it belongs to the running event loop
+
+        async with self._lock: # first come first served, a big request can't be starved by small ones
+            while True:
+                wait = 0.0
+                if self.requests is not None and requests:
+                    wait = max(wait, self.requests.wait_time(requests))
+                if self.tokens is not None and tokens:
+                    wait = max(wait, self.tokens.wait_time(tokens))
+
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            if self.requests is not None and requests:
+                self.requests.take(requests)
+            if self.tokens is not None and tokens:
+                self.tokens.take(tokens)
+
+
+def backoff_delay(attempt, base_delay = 1.0, max_delay = 60.0):
+    # "full jitter": uniform in [0, base * 2^attempt], so retries of parallel jobs don't line up
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+async def with_retries(fn, retries = 5, retry_on = (Exception,), base_delay = 1.0, max_delay = 60.0, before_attempt = None):
+    # fn: blocking callable, run in a worker thread. before_attempt: coroutine function awaited before every attempt
+    attempt = 0
+    while True:
+        if before_attempt is not None:
+            await before_attempt()
+        try:
+            return await asyncio.to_thread(fn)
+        except retry_on:
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+
+class CsvCheckpoint:
+    # predictions CSV of one config, rows are appended (and flushed) as soon as a sample is done
+    def __init__(self, path, fieldnames, key = "id"):
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        self.key = key
+        self._lock = threading.Lock()
+
+    def header(self):
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+
+        with open(self.path, "r", encoding = "utf-8", newline = "") as f:
+            return next(csv.reader(f), None)
+
+    def completed(self):
+        # a file written with other columns (an older version of the row) is moved aside, its samples run again
+        if self.header() != self.fieldnames:
+            self.rotate_stale()
+            return set()
+
+        with open(self.path, "r", encoding = "utf-8", newline = "") as f:
+            return {row[self.key] for row in csv.DictReader(f)}
+
+    def append(self, rows):
+        if not rows:
+            return
+
+        with self._lock:
+            self.path.parent.mkdir(parents = True, exist_ok = True)
+            self.rotate_stale()
+            new_file = self.header() is None
+
+            with open(self.path, "w" if new_file else "a", encoding = "utf-8", newline = "") as f:
+                writer = csv.DictWriter(f, fieldnames = self.fieldnames)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+
+    def rotate_stale(self):
+        # renames a file with other columns to <name>.<time>.stale instead of overwriting its rows, returns the new path
+        header = self.header()
+        if header is None or header == self.fieldnames:
+            return None
+
+        stale_path = self.path.with_name(f"{self.path.name}.{time.strftime('%Y%m%d-%H%M%S')}.stale")
+        n = 1
+        while stale_path.exists():
+            stale_path = self.path.with_name(f"{self.path.name}.{time.strftime('%Y%m%d-%H%M%S')}-{n}.stale")
+            n += 1
+
+        self.path.replace(stale_path)
+        return stale_path
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+class Job:
+    # fn() returns a list of row dicts for the checkpoint.
+    # requests / tokens: what the job will take from the rate limiter (0 requests = no API calls, not limited)
+    def __init__(self, name, fn, checkpoint, requests = 1, tokens = 0):
+        self.name = name
+        self.fn = fn
+        self.checkpoint = checkpoint
+        self.requests = requests
+        self.tokens = tokens
+
+
+async def run_jobs(jobs, limiter = None, max_concurrency = 4, retries = 5, retry_on = (Exception,), base_delay = 1.0, progress = print):
+    # returns {"done": n, "failed": [(job name, error), ...]}, failed jobs aren't checkpointed so a re-run retries them
+    semaphore = asyncio.Semaphore(max_concurrency)
+    report = {"done": 0, "failed": []}
+    total = len(jobs)
+    step = max(1, total // 10)
+
+    async def run_one(job):
+        async def acquire():
+            await limiter.acquire(requests = job.requests, tokens = job.tokens)
+
+        async with semaphore:
+            try:
+                rows = await with_retries(
+                    job.fn,
+                    retries = retries,
+                    retry_on = retry_on,
+                    base_delay = base_delay,
+                    before_attempt = acquire if limiter is not None and job.requests else None
+                )
+            except Exception as e:
+                report["failed"].append((job.name, repr(e)))
+                return
+
+            job.checkpoint.append(rows)
+            report["done"] += 1
+
+            finished = report["done"] + len(report["failed"])
+            if progress is not None and (finished % step == 0 or finished == total):
+                progress(f"{finished}/{total} jobs finished ({len(report['failed'])} failed)")
+
+    await asyncio.gather(*(run_one(job) for job in jobs))
+    return report
+
+
+def run_sync(coro):
+    # asyncio.run, also from inside jupyter where an event loop is already running in this thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target = target)
+    thread.start()
+    thread.join()
+
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
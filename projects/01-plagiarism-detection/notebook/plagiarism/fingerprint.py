@@ -0,0 +1,261 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+# token fingerprints for copy-paste detection, without an encoder.
+# a chunk's tokenize_code stream (optionally with identifiers renamed to one placeholder) is cut into k-grams,
+# the k-gram hashes are winnowed (the min of every window of w consecutive hashes, so any copied run of
+# window + kgram - 1 tokens shares at least one fingerprint), and the set of fingerprints becomes a MinHash signature.
+# signatures go into an LSH index: every signature is cut into `bands` slices, a lookup is a binary search for the
+# query's slice hashes in one sorted table of all slice hashes, and only chunks colliding in some band get a Jaccard
+# estimate. with 16 bands of 4 rows, pairs with Jaccard 0.5 are found ~65% of the time, 0.7 ~99%.
+#
+# on disk it's a directory of .npy arrays plus fingerprint.json (the config), loaded with mmap:
+# - signatures.npy: uint32 signature per chunk row (rows of removed / empty chunks are not live)
+# - live.npy: bool per chunk row
+# - band_keys.npy / band_rows.npy: hash of every (band, slice) of every live row sorted, and the row of each hash
+
+FINGERPRINT_META_FILE = "fingerprint.json"
+FINGERPRINT_ARRAYS = ["signatures", "live", "band_keys", "band_rows"]
+
+DEFAULT_FINGERPRINT_CONFIG = {
+    "kgram": 5,
+    "window": 4,
+    "num_perm": 64,
+    "bands": 16,
+    "normalize_identifiers": True,
+    "seed": 1
+}
+
+# kept as they are when identifiers are normalized, everything else tokenize_code finds becomes "ID"
+GO_KEYWORDS = frozenset([
+    "break", "case", "chan", "const", "continue", "default", "defer", "else", "fallthrough", "for", "func", "go",
+    "goto", "if", "import", "interface", "map", "package", "range", "return", "select", "struct", "switch", "type", "var",
+    "bool", "byte", "complex64", "complex128", "error", "float32", "float64", "int", "int8", "int16", "int32", "int64",
+    "rune", "string", "uint", "uint8", "uint16", "uint32", "uint64", "uintptr", "any",
+    "nil", "true", "false", "iota", "append", "cap", "close", "copy", "delete", "len", "make", "new", "panic", "recover"
+])
+
+_KGRAM_BASE = np.uint64(1099511628211) # FNV prime, any odd 64 bit constant works
+_BAND_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def fingerprint_config(config = None):
+    return {**DEFAULT_FINGERPRINT_CONFIG, **(config or {})}
+
+
+def normalize_tokens(toks):
+    return [t if t in GO_KEYWORDS else "ID" for t in toks]
+
+
+@lru_cache(maxsize = 1 << 16)
+def _token_hash(tok):
+    return int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size = 8).digest(), "little")
+
+
+def kgram_hashes(toks, kgram):
+    # uint64 hash of every k-gram, a stream shorter than kgram is a single gram
+    if not toks:
+        return np.zeros(0, dtype = np.uint64)
+
+    token_hashes = np.fromiter((_token_hash(t) for t in toks), dtype = np.uint64, count = len(toks))
+    kgram = min(kgram, len(toks))
+    n = len(toks) - kgram + 1
+
+    hashes = np.zeros(n, dtype = np.uint64)
+    for i in range(kgram): # polynomial rolling hash, uint64 arithmetic wraps around
+        hashes = hashes * _KGRAM_BASE + token_hashes[i:i + n]
+
+    return hashes
+
+
+def winnow(hashes, window):
+    # distinct minima of all windows of consecutive hashes
+    if len(hashes) == 0:
+        return hashes
+    if len(hashes) <= window:
+        return np.unique(hashes.min(keepdims = True))
+
+    return np.unique(np.lib.stride_tricks.sliding_window_view(hashes, window).min(axis = 1))
+
+
+def code_fingerprints(toks, config = None):
+    config = fingerprint_config(config)
+    if config["normalize_identifiers"]:
+        toks = normalize_tokens(toks)
+
+    return winnow(kgram_hashes(toks, config["kgram"]), config["window"])
+
+
+@lru_cache(maxsize = 8)
+def _permutations(num_perm, seed):
+    # multiply-shift hash functions h(x) = (a * x + b) >> 32 with odd a
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2 ** 63, size = num_perm, dtype = np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size = num_perm, dtype = np.uint64)
+    return a[:, None], b[:, None]
+
+
+def minhash(fingerprints, num_perm, seed):
+    # uint32 signature, None for an empty set
+    if len(fingerprints) == 0:
+        return None
+
+    a, b = _permutations(num_perm, seed)
+    return ((a * fingerprints[None, :] + b) >> np.uint64(32)).min(axis = 1).astype(np.uint32)
+
+
+def code_signature(toks, config = None):
+    # toks: tokenize_code output of one chunk or query
+    config = fingerprint_config(config)
+    return minhash(code_fingerprints(toks, config), config["num_perm"], config["seed"])
+
+
+def jaccard_estimates(signature, signatures):
+    # share of equal signature positions = estimated Jaccard similarity of the fingerprint sets
+    return (np.asarray(signatures) == signature).mean(axis = 1)
+
+
+def band_keys(signatures, bands):
+    # (n, bands) uint64 hash of every band slice of every signature, the band number is hashed in too
+    # so all bands can share one table
+    signatures = np.asarray(signatures, dtype = np.uint64)
+    signatures = signatures.reshape(len(signatures), bands, signatures.shape[1] // bands)
+
+    keys = np.broadcast_to(np.arange(bands, dtype = np.uint64), signatures.shape[:2])
+    for r in range(signatures.shape[2]):
+        keys = keys * _BAND_BASE + signatures[:, :, r]
+
+    return keys
+
+
+class FingerprintIndex:
+    def __init__(self, config, signatures, live, band_keys, band_rows):
+        self.config = fingerprint_config(config)
+        self.signatures = signatures
+        self.live = live
+        self.band_keys = band_keys
+        self.band_rows = band_rows
+
+        if self.config["num_perm"] % self.config["bands"]:
+            raise ValueError(f"num_perm {self.config['num_perm']} is not a multiple of bands {self.config['bands']}")
+
+    @property
+    def num_rows(self):
+        return len(self.live)
+
+    @property
+    def num_live(self):
+        return int(np.count_nonzero(self.live))
+
+    @classmethod
+    def build(cls, tokenized_corpus, config = None):
+        config = fingerprint_config(config)
+        index = cls(
+            config,
+            np.zeros((0, config["num_perm"]), dtype = np.uint32),
+            np.zeros(0, dtype = bool),
+            np.zeros(0, dtype = np.uint64),
+            np.zeros(0, dtype = np.int64)
+        )
+        index.update(added = ((row, code_signature(toks, config)) for row, toks in enumerate(tokenized_corpus)))
+        return index
+
+    def update(self, removed_rows = (), added = ()):
+        # removed_rows: chunk rows to drop, added: (row, signature) pairs for new chunks, a None signature isn't indexed
+        added = list(added)
+        num_rows = max([self.num_rows] + [row + 1 for row, _ in added])
+
+        signatures = np.zeros((num_rows, self.config["num_perm"]), dtype = np.uint32)
+        signatures[:self.num_rows] = self.signatures
+        live = np.zeros(num_rows, dtype = bool)
+        live[:self.num_rows] = self.live
+
+        live[np.asarray(list(removed_rows), dtype = np.int64)] = False
+        for row, signature in added:
+            live[row] = signature is not None
+            if signature is not None:
+                signatures[row] = signature
+
+        self.signatures = signatures
+        self.live = live
+        self.build_bands()
+
+    def build_bands(self):
+        # the band table is recomputed from the live signatures with one sort
+        rows = np.flatnonzero(self.live)
+        keys = band_keys(self.signatures[rows], self.config["bands"]).ravel()
+
+        order = np.argsort(keys, kind = "stable")
+        self.band_keys = keys[order]
+        self.band_rows = np.repeat(rows, self.config["bands"])[order]
+
+    def candidates(self, signature):
+        # rows sharing at least one band with the signature, two vectorized binary searches for all bands
+        keys = band_keys(signature[None, :], self.config["bands"])[0]
+        starts = np.searchsorted(self.band_keys, keys, side = "left")
+        ends = np.searchsorted(self.band_keys, keys, side = "right")
+
+        found = [self.band_rows[start:end] for start, end in zip(starts, ends) if end > start]
+        if not found:
+            return np.zeros(0, dtype = np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, toks, top_k = 10, threshold = 0.0, mask = None):
+        # returns (chunk rows, estimated Jaccard) of up to top_k candidates with an estimate >= threshold, best first.
+        # mask: optional bool per chunk row, other rows are dropped before the estimate
+        signature = code_signature(toks, self.config)
+        if signature is None or top_k <= 0:
+            return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.float64)
+
+        rows = self.candidates(signature)
+        if mask is not None and len(rows):
+            rows = rows[mask[rows]]
+
+        scores = jaccard_estimates(signature, self.signatures[rows])
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
+
+        order = np.lexsort((rows, -scores))[:top_k] # estimate desc, then row for stable ties
+        return rows[order].astype(np.int64), scores[order]
+
+    def query_batch(self, queries_toks, top_k = 10, threshold = 0.0, mask = None):
+        return [self.query(toks, top_k = top_k, threshold = threshold, mask = mask) for toks in queries_toks]
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents = True, exist_ok = True)
+
+        for name in FINGERPRINT_ARRAYS:
+            np.save(index_dir / f"{name}.npy", getattr(self, name))
+
+        meta = {**self.config, "num_rows": self.num_rows, "num_live": self.num_live}
+        with open(index_dir / FINGERPRINT_META_FILE, "w", encoding = "utf-8") as f:
+            json.dump(meta, f, indent = 2)
+
+    @staticmethod
+    def load_config(index_dir):
+        # config the index at index_dir was built with, None if there is no index
+        meta_path = Path(index_dir) / FINGERPRINT_META_FILE
+        if not meta_path.exists():
+            return None
+
+        with open(meta_path, "r", encoding = "utf-8") as f:
+            meta = json.load(f)
+
+        return {name: meta[name] for name in DEFAULT_FINGERPRINT_CONFIG}
+
+    @classmethod
+    def load(cls, index_dir, mmap = True):
+        index_dir = Path(index_dir)
+        config = cls.load_config(index_dir)
+        if config is None:
+            raise FileNotFoundError(f"fingerprint index not found at {index_dir}")
+
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(index_dir / f"{name}.npy", mmap_mode = mmap_mode) for name in FINGERPRINT_ARRAYS}
+
+        return cls(config, **arrays)
@@ -0,0 +1,429 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from plagiarism.bm25_index import BM25Index, PostingsBuffer, count_terms
+from plagiarism.chunk_store import ChunkStore, ChunkStoreWriter
+from plagiarism.fingerprint import FingerprintIndex, code_signature, fingerprint_config
+
+# incremental, streaming indexing of the reference corpus.
+# manifest.json remembers the content hash and chunk rows of every indexed .go file, so a re-run only
+# chunks and embeds files that were added or changed. chunks of changed / deleted files are removed from
+# the ID-mapped FAISS index, the BM25 postings and the fingerprint LSH index, and marked dead in the chunk store.
+# FAISS ids, BM25 doc ids, fingerprint rows and chunk store rows are the same number, so search results index the store directly.
+#
+# the pipeline is a chain of generators: file discovery -> read + hash + chunk + count terms + MinHash in a process pool
+# -> fixed-size encoding batches -> appends to the chunk store and the FAISS index.
+# at most max_pending files are in flight in the pool and at most encode_batch_size chunk texts wait for the
+# encoder. BM25 postings and MinHash signatures of new chunks are spilled to indexes/segments every segment_chunks
+# chunks and merged into the indexes when the run ends (the fingerprint index one segment at a time, BM25 all segments
+# in one pass), so what the run buffers doesn't grow with the corpus. the indexes themselves are held in memory while
+# they are updated: the FAISS flat index for the whole run, BM25 and the fingerprint index while the segments are merged.
+
+MANIFEST_FILE = "manifest.json"
+DENSE_INDEX_FILE = "dense_index.faiss"
+CHUNK_STORE_DIR = "chunk_store"
+BM25_DIR = "bm25"
+FINGERPRINT_DIR = "fingerprint"
+SEGMENTS_DIR = "segments"
+
+func_pattern = re.compile(r"^func\s", re.MULTILINE)
+
+
+def tokenize_code(text):
+    return re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text)
+
+
+def file_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_go_file(text):
+    # one chunk per top level func, files without any func become a single chunk
+    matches = list(func_pattern.finditer(text))
+    if not matches:
+        return [text.strip()] if text.strip() else []
+
+    chunk_texts = []
+    for idx, match in enumerate(matches):
+        start = match.start()
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
+
+        chunk_text = text[start:end].strip()
+        if chunk_text:
+            chunk_texts.append(chunk_text)
+
+    return chunk_texts
+
+
+def discover_files(ref_dir):
+    # walks the corpus lazily in a stable order, yields (absolute path, path relative to ref_dir)
+    ref_dir = Path(ref_dir)
+
+    for root, dirs, files in os.walk(ref_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".go"):
+                go_file = Path(root) / name
+                yield str(go_file), str(go_file.relative_to(ref_dir))
+
+
+def process_file(file_path, rel_path, known_sha256, signature_config = None):
+    # runs in a pool worker: read, hash and, only if the file changed, chunk, count BM25 terms and MinHash the tokens
+    text = Path(file_path).read_text(encoding = "utf-8", errors = "ignore")
+    sha256 = file_hash(text)
+
+    result = {
+        "path": rel_path,
+        "repo": Path(rel_path).parts[0],
+        "sha256": sha256,
+        "bytes": len(text),
+        "chunks": None
+    }
+
+    if sha256 != known_sha256:
+        result["chunks"] = []
+        for chunk_text in chunk_go_file(text):
+            toks = tokenize_code(chunk_text)
+            result["chunks"].append((chunk_text, count_terms(toks), len(toks), code_signature(toks, signature_config)))
+
+    return result
+
+
+def bounded_map(fn, items, workers, max_pending):
+    # like executor.map, but never has more than max_pending tasks submitted, so a slow consumer
+    # (the encoder) holds back file reading instead of letting results pile up. results keep input order.
+    if workers == 0:
+        for args in items:
+            yield fn(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        pending = deque()
+
+        for args in items:
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+class IndexingStats:
+    def __init__(self, progress = print, progress_every = 5.0):
+        self.progress = progress
+        self.progress_every = progress_every
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+        self.files = 0
+        self.bytes = 0
+        self.chunks = 0
+        self.chunks_encoded = 0
+        self.encode_seconds = 0.0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        elapsed = max(self.elapsed(), 1e-9)
+        return {
+            "seconds": elapsed,
+            "files": self.files,
+            "chunks": self.chunks,
+            "chunks_encoded": self.chunks_encoded,
+            "files_per_s": self.files / elapsed,
+            "chunks_per_s": self.chunks_encoded / elapsed,
+            "mb_per_s": self.bytes / elapsed / 1e6,
+            "encode_seconds": self.encode_seconds,
+            "encode_share": self.encode_seconds / elapsed
+        }
+
+    def tick(self, force = False):
+        now = time.perf_counter()
+        if self.progress is None or (not force and now - self.last_report < self.progress_every):
+            return
+
+        self.last_report = now
+        s = self.summary()
+        self.progress(
+            f"[{s['seconds']:.0f}s] {s['files']} files, {s['chunks_encoded']} chunks encoded "
+            f"({s['files_per_s']:.1f} files/s, {s['chunks_per_s']:.1f} chunks/s, {s['mb_per_s']:.2f} MB/s)"
+        )
+
+
+class IncrementalIndexer:
+    def __init__(self, indexes_dir, encode_fn, embedding_model, encode_batch_size = 256, workers = None, max_pending = None, progress = print, progress_every = 5.0, fingerprint = None, segment_chunks = 100000):
+        # encode_fn: list of texts -> float32 matrix of embeddings
+        # workers: chunking processes, None = all cores, 0 = chunk in this process
+        # segment_chunks: new chunks whose postings and signatures are buffered before they're spilled to disk
+        # fingerprint: overrides of DEFAULT_FINGERPRINT_CONFIG in plagiarism/fingerprint.py
+        self.indexes_dir = Path(indexes_dir)
+        self.encode_fn = encode_fn
+        self.embedding_model = embedding_model
+        self.fingerprint_config = fingerprint_config(fingerprint)
+        self.manifest_path = self.indexes_dir / MANIFEST_FILE
+
+        self.encode_batch_size = encode_batch_size
+        self.segment_chunks = segment_chunks
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(4 * self.workers, 16)
+        self.progress = progress
+        self.progress_every = progress_every
+
+        self.stats = None
+
+    def load_manifest(self):
+        if not self.manifest_path.exists():
+            return None
+
+        with open(self.manifest_path, "r", encoding = "utf-8") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding = "utf-8") as f:
+            json.dump(manifest, f, indent = 2)
+        tmp_path.replace(self.manifest_path)
+
+    def reset(self):
+        for name in [CHUNK_STORE_DIR, BM25_DIR, FINGERPRINT_DIR, SEGMENTS_DIR]:
+            if (self.indexes_dir / name).exists():
+                shutil.rmtree(self.indexes_dir / name)
+
+        for name in [DENSE_INDEX_FILE, MANIFEST_FILE]:
+            if (self.indexes_dir / name).exists():
+                (self.indexes_dir / name).unlink()
+
+    def sync(self, ref_dir, rebuild = False):
+        self.indexes_dir.mkdir(parents = True, exist_ok = True)
+        manifest = self.load_manifest()
+
+        # no manifest means the indexes weren't built by this indexer, and a new model invalidates every vector
+        if rebuild or manifest is None or manifest["embedding_model"] != self.embedding_model:
+            self.reset()
+            manifest = {"embedding_model": self.embedding_model, "next_chunk_num": 1, "num_rows": 0, "num_live_chunks": 0, "files": {}}
+
+        old_files = manifest["files"]
+        seen_paths = set()
+        removed_rows = []
+        report = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "chunks_added": 0, "chunks_removed": 0}
+
+        self.stats = IndexingStats(progress = self.progress, progress_every = self.progress_every)
+        self._dense_index = None
+        self._writer = None
+        self._postings = PostingsBuffer()
+        self._signatures = []
+        self._segments = []
+        self._batch_texts = []
+        self._batch_rows = []
+
+        # a fingerprint index that is missing (indexes from before it existed) or was built with another config
+        # is rebuilt from the chunk store texts, without embedding anything again
+        self._rebuild_fingerprints = bool(old_files) and FingerprintIndex.load_config(self.indexes_dir / FINGERPRINT_DIR) != self.fingerprint_config
+
+        # segments of a run that died before finish() belong to chunks its manifest never recorded
+        if (self.indexes_dir / SEGMENTS_DIR).exists():
+            shutil.rmtree(self.indexes_dir / SEGMENTS_DIR)
+
+        tasks = (
+            (file_path, rel_path, old_files.get(rel_path, {}).get("sha256"), self.fingerprint_config)
+            for file_path, rel_path in discover_files(ref_dir)
+        )
+
+        for result in bounded_map(process_file, tasks, self.workers, self.max_pending):
+            path = result["path"]
+            seen_paths.add(path)
+            self.stats.files += 1
+            self.stats.bytes += result["bytes"]
+
+            if result["chunks"] is None:
+                report["unchanged"] += 1
+                self.stats.tick()
+                continue
+
+            if path in old_files:
+                report["changed"] += 1
+                removed_rows.extend(old_files[path]["rows"])
+            else:
+                report["added"] += 1
+
+            rows = []
+            chunk_ids = []
+
+            for chunk_text, counts, length, signature in result["chunks"]:
+                chunk_id = f"chunk_{manifest['next_chunk_num']:05d}"
+                manifest["next_chunk_num"] += 1
+
+                row = self.add_chunk({"id": chunk_id, "repo": result["repo"], "source_path": path, "text": chunk_text}, counts, length, signature)
+                rows.append(row)
+                chunk_ids.append(chunk_id)
+
+            report["chunks_added"] += len(rows)
+            old_files[path] = {"sha256": result["sha256"], "repo": result["repo"], "rows": rows, "chunk_ids": chunk_ids}
+            self.stats.tick()
+
+        for path, entry in list(old_files.items()):
+            if path not in seen_paths:
+                report["removed"] += 1
+                removed_rows.extend(entry["rows"])
+                del old_files[path]
+
+        report["chunks_removed"] = len(removed_rows)
+
+        if report["added"] or report["changed"] or removed_rows:
+            self.flush_batch()
+            self.finish(removed_rows)
+            manifest["num_rows"] = self._writer.num_chunks
+        elif self._rebuild_fingerprints:
+            self.rebuild_fingerprints()
+
+        manifest["num_live_chunks"] = sum(len(entry["rows"]) for entry in old_files.values())
+        self.save_manifest(manifest) # written last, if a run dies before this point re-run with rebuild = True
+
+        self.stats.tick(force = True)
+        report["stats"] = self.stats.summary()
+        return report
+
+    def add_chunk(self, chunk, counts, length, signature = None):
+        if self._writer is None:
+            self._writer = ChunkStoreWriter(self.indexes_dir / CHUNK_STORE_DIR, append = True)
+
+        row = self._writer.add(chunk)
+        self._postings.add_counts(row, counts, length)
+        self._signatures.append((row, signature))
+
+        self._batch_texts.append(chunk["text"])
+        self._batch_rows.append(row)
+        self.stats.chunks += 1
+
+        if len(self._batch_texts) >= self.encode_batch_size:
+            self.flush_batch()
+        if len(self._postings) >= self.segment_chunks:
+            self.spill_segment()
+
+        return row
+
+    def spill_segment(self):
+        # postings and signatures buffered so far go to disk, finish() merges them
+        segment_dir = self.indexes_dir / SEGMENTS_DIR / f"segment_{len(self._segments):05d}"
+        self._postings.save(segment_dir / BM25_DIR)
+
+        rows = np.asarray([row for row, _ in self._signatures], dtype = np.int64)
+        indexed = np.asarray([signature is not None for _, signature in self._signatures], dtype = bool)
+        signatures = np.zeros((len(rows), self.fingerprint_config["num_perm"]), dtype = np.uint32)
+        for pos, (_, signature) in enumerate(self._signatures):
+            if signature is not None:
+                signatures[pos] = signature
+
+        np.save(segment_dir / "signature_rows.npy", rows)
+        np.save(segment_dir / "signature_indexed.npy", indexed)
+        np.save(segment_dir / "signatures.npy", signatures)
+
+        self._segments.append(segment_dir)
+        self._postings = PostingsBuffer()
+        self._signatures = []
+
+    def segments(self):
+        # (postings, signatures) of the spilled segments, one segment in memory at a time, then of the last buffer
+        for segment_dir in self._segments:
+            rows = np.load(segment_dir / "signature_rows.npy")
+            indexed = np.load(segment_dir / "signature_indexed.npy")
+            signatures = np.load(segment_dir / "signatures.npy")
+            yield PostingsBuffer.load(segment_dir / BM25_DIR), [
+                (int(row), signature if ok else None) for row, ok, signature in zip(rows, indexed, signatures)
+            ]
+
+        yield self._postings, self._signatures
+
+    def flush_batch(self):
+        if not self._batch_texts:
+            return
+
+        started = time.perf_counter()
+        vecs = np.asarray(self.encode_fn(self._batch_texts), dtype = np.float32)
+        self.stats.encode_seconds += time.perf_counter() - started
+
+        index = self.dense_index(vecs.shape[1])
+        index.add_with_ids(vecs, np.asarray(self._batch_rows, dtype = np.int64))
+
+        self.stats.chunks_encoded += len(self._batch_texts)
+        self._batch_texts = []
+        self._batch_rows = []
+
+    def dense_index(self, dim = None):
+        if self._dense_index is None:
+            index_path = self.indexes_dir / DENSE_INDEX_FILE
+            if index_path.exists():
+                self._dense_index = faiss.read_index(str(index_path))
+            elif dim is not None:
+                self._dense_index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+
+        return self._dense_index
+
+    def finish(self, removed_rows):
+        if self._writer is None:
+            self._writer = ChunkStoreWriter(self.indexes_dir / CHUNK_STORE_DIR, append = True)
+
+        self._writer.delete(removed_rows)
+        self._writer.close()
+
+        index = self.dense_index()
+        if index is not None:
+            if removed_rows:
+                index.remove_ids(np.asarray(removed_rows, dtype = np.int64))
+            faiss.write_index(index, str(self.indexes_dir / DENSE_INDEX_FILE))
+
+        bm25_dir = self.indexes_dir / BM25_DIR
+        bm25 = BM25Index.load(bm25_dir, mmap = False) if bm25_dir.exists() else BM25Index.build([])
+
+        fingerprint_dir = self.indexes_dir / FINGERPRINT_DIR
+        fingerprints = None
+        if not self._rebuild_fingerprints:
+            fingerprints = FingerprintIndex.load(fingerprint_dir, mmap = False) if fingerprint_dir.exists() else FingerprintIndex.build([], self.fingerprint_config)
+
+        # BM25 takes the postings of every segment in one merge, so it sorts its postings once and not per segment
+        segment_postings = []
+        removed_signatures = removed_rows
+        for postings, signatures in self.segments():
+            segment_postings.append(postings)
+            if fingerprints is not None:
+                fingerprints.update(removed_rows = removed_signatures, added = signatures)
+            removed_signatures = [] # dropped by the first update
+
+        bm25.merge(*segment_postings, removed_docs = removed_rows)
+        bm25.save(bm25_dir)
+
+        if (self.indexes_dir / SEGMENTS_DIR).exists():
+            shutil.rmtree(self.indexes_dir / SEGMENTS_DIR)
+
+        if fingerprints is None:
+            self.rebuild_fingerprints()
+        else:
+            fingerprints.save(fingerprint_dir)
+
+    def rebuild_fingerprints(self):
+        # signatures of every live chunk from the texts in the chunk store, segment_chunks at a time
+        fingerprints = FingerprintIndex.build([], self.fingerprint_config)
+
+        with ChunkStore(self.indexes_dir / CHUNK_STORE_DIR) as store:
+            text_pos = store.fields.index("text")
+            signatures = []
+            for row in store.live_rows():
+                signatures.append((row, code_signature(tokenize_code(store.field(row, text_pos)), self.fingerprint_config)))
+                if len(signatures) >= self.segment_chunks:
+                    fingerprints.update(added = signatures)
+                    signatures = []
+            fingerprints.update(added = signatures)
+
+        fingerprints.save(self.indexes_dir / FINGERPRINT_DIR)
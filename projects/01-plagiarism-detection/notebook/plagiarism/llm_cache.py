@@ -0,0 +1,124 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# on-disk cache of LLM verdicts, keyed by sha256(model + response schema + request).
+# requests are sent at temperature 0, so an identical prompt gets the stored parsed response instead of an API call.
+# ablation configs often build byte-identical prompts, and re-running the evaluation repeats all of them.
+#
+# one sqlite table, responses are stored as json of the parsed model (model_dump()).
+# entries older than ttl_s are dropped on lookup, and past max_entries the least recently used ones are evicted.
+
+
+class LLMCache:
+    def __init__(self, db_path, ttl_s = None, max_entries = 100000):
+        self.db_path = Path(db_path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._last_stamp = 0.0
+
+        self.db_path.parent.mkdir(parents = True, exist_ok = True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread = False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def key(model, schema, messages, **params):
+        # schema: json schema of the response model, so changing the fields invalidates old verdicts
+        # params: other request parameters that change the answer, e.g. temperature
+        payload = json.dumps(
+            {"model": model, "schema": schema, "messages": messages, "params": params},
+            sort_keys = True,
+            ensure_ascii = False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _now(self):
+        # strictly increasing, so entries used within the same clock tick still have an LRU order
+        self._last_stamp = max(time.time(), self._last_stamp + 1e-6)
+        return self._last_stamp
+
+    def get(self, key):
+        # returns the stored response dict, or None on a miss
+        with self._lock:
+            now = self._now()
+            row = self._conn.execute("SELECT response, created FROM verdicts WHERE key = ?", (key,)).fetchone()
+
+            if row is not None and self.ttl_s is not None and now - row[1] > self.ttl_s:
+                self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        with self._lock:
+            now = self._now()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response, ensure_ascii = False), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl_s is not None:
+            self._conn.execute("DELETE FROM verdicts WHERE created < ?", (now - self.ttl_s,))
+
+        size = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        if size > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used LIMIT ?)",
+                (size - self.max_entries,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "size": len(self)
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM verdicts")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
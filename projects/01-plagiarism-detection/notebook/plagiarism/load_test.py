@@ -0,0 +1,141 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+# load test of plagiarism.service: for every concurrency level, that many clients start together (a burst) and send
+# the queries of data/test_dataset.json round robin over keep-alive connections, --requests in total.
+# reports throughput, client side latency percentiles and the mean batch size the service formed meanwhile.
+# start the service first, then from the notebook folder:
+#   python -m plagiarism.load_test --method pure_embedding --concurrency 1 4 16 64 --requests 512
+
+
+class Client:
+    def __init__(self, url, timeout = 120):
+        parsed = urlparse(url)
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout = timeout)
+
+    def request(self, method, path, body = None):
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {} if data is None else {"Content-Type": "application/json"}
+        self.conn.request(method, path, body = data, headers = headers)
+        res = self.conn.getresponse()
+        payload = json.loads(res.read())
+        if res.status != 200:
+            raise RuntimeError(f"{method} {path}: {res.status} {payload}")
+        return payload
+
+    def close(self):
+        self.conn.close()
+
+
+def batch_totals(metrics, method):
+    # (batches, items) the service has batched so far for this method, over all its params. configs are keyed by
+    # the params the service normalized, and the load test only sends one config at a time
+    batches, items = 0, 0.0
+    for config in metrics["methods"].get(method, {}).get("configs", {}).values():
+        sizes = config["batch_size"]
+        batches += sizes["count"]
+        items += (sizes["mean"] or 0.0) * sizes["count"]
+    return batches, items
+
+
+def run_level(url, method, params, codes, concurrency, num_requests):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    next_request = iter(range(num_requests))
+
+    def worker():
+        client = Client(url)
+        start.wait()
+        try:
+            while True:
+                with lock:
+                    i = next(next_request, None)
+                if i is None:
+                    return
+
+                started = time.perf_counter()
+                try:
+                    client.request("POST", f"/detect/{method}", {"code": codes[i % len(codes)], "params": params})
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+
+                with lock:
+                    latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target = worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": seconds,
+        "requests_per_s": len(latencies) / max(seconds, 1e-9),
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if latencies else None,
+        "first_error": errors[0] if errors else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "burst load test of the plagiarism check service")
+    parser.add_argument("--url", default = "http://127.0.0.1:8000")
+    parser.add_argument("--method", default = "pure_embedding")
+    parser.add_argument("--params", default = "{}", help = 'detector params as JSON, e.g. \'{"top_k": 10}\'')
+    parser.add_argument("--dataset", default = "data/test_dataset.json")
+    parser.add_argument("--concurrency", type = int, nargs = "+", default = [1, 4, 16, 64])
+    parser.add_argument("--requests", type = int, default = 512, help = "requests per concurrency level")
+    parser.add_argument("--out", default = None, help = "also save the results as JSON")
+    args = parser.parse_args()
+
+    params = json.loads(args.params)
+    with open(args.dataset, "r", encoding = "utf-8") as f:
+        codes = [item["query_code"] for item in json.load(f)]
+
+    admin = Client(args.url)
+    results = []
+
+    for concurrency in args.concurrency:
+        batches_before, items_before = batch_totals(admin.request("GET", "/metrics"), args.method)
+        level = run_level(args.url, args.method, params, codes, concurrency, args.requests)
+        batches_after, items_after = batch_totals(admin.request("GET", "/metrics"), args.method)
+
+        batches = batches_after - batches_before
+        level["mean_batch_size"] = (items_after - items_before) / batches if batches else None
+        results.append(level)
+
+        print(
+            f"concurrency {concurrency:4d}: {level['requests_per_s']:8.1f} req/s, p50 {level['p50_ms']:.1f} ms, "
+            f"p95 {level['p95_ms']:.1f} ms, p99 {level['p99_ms']:.1f} ms, mean batch {level['mean_batch_size'] or 0:.1f}, "
+            f"{level['errors']} errors"
+        )
+
+    admin.close()
+
+    if args.out:
+        with open(args.out, "w", encoding = "utf-8") as f:
+            json.dump({"method": args.method, "params": params, "levels": results}, f, indent = 2)
+
+
+if __name__ == "__main__":
+    main()
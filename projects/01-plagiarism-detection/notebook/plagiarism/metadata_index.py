@@ -0,0 +1,108 @@
+import hashlib
+
+import numpy as np
+
+# repo and path lookups over the live chunks of a chunk store, so scoped searches and path lookups
+# don't scan every chunk.
+# - repo_rows: repo name -> sorted rows of that repo
+# - paths / path_rows: every live chunk's path (separators normalized to "/") sorted, with its row next to it.
+#   chunks of one path, and of all paths under a prefix, are one contiguous slice found with searchsorted.
+
+
+def normalize_path(path):
+    return str(path).replace("\\", "/")
+
+
+class ChunkFilter:
+    # the rows a scoped search may return, as a sorted row array and a bool mask over all rows.
+    # search_params: prepared dense search parameters (e.g. a FAISS ID selector), built once per filter.
+    # key: identifies the filter in caches and shard workers (default: a digest of its rows), never id(), which a
+    # later filter can get again once this one is garbage collected.
+    # version: the index snapshot the rows belong to, None = not tied to one
+    def __init__(self, rows, num_rows, search_params = None, key = None, version = None):
+        self.rows = np.asarray(rows, dtype = np.int64)
+        self.mask = np.zeros(num_rows, dtype = bool)
+        self.mask[self.rows] = True
+        self.search_params = search_params
+        self.key = key if key is not None else ("rows", hashlib.sha1(self.rows.tobytes()).hexdigest())
+        self.version = version
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class MetadataIndex:
+    def __init__(self, num_rows, live_rows, repo_rows, paths, path_rows):
+        self.num_rows = num_rows
+        self.live_rows = live_rows
+        self.repo_rows = repo_rows
+        self.paths = paths
+        self.path_rows = path_rows
+
+    @classmethod
+    def build(cls, repos, paths, live_rows, num_rows = None):
+        # repos / paths: list-like columns indexed by row (e.g. ChunkStore columns), only live_rows are read
+        rows = np.fromiter(live_rows, dtype = np.int64)
+        num_rows = num_rows if num_rows is not None else len(repos)
+
+        repo_of = np.array([repos[r] for r in rows], dtype = str)
+        path_of = np.array([normalize_path(paths[r]) for r in rows], dtype = str)
+
+        repo_rows = {}
+        if len(rows):
+            order = np.lexsort((rows, repo_of))
+            names, starts = np.unique(repo_of[order], return_index = True)
+            ends = list(starts[1:]) + [len(order)]
+            repo_rows = {str(name): rows[order[start:end]] for name, start, end in zip(names, starts, ends)}
+
+        order = np.lexsort((rows, path_of))
+        return cls(num_rows, rows, repo_rows, path_of[order], rows[order])
+
+    @classmethod
+    def from_chunk_store(cls, store):
+        return cls.build(store.column("repo"), store.column("source_path"), store.live_rows(), num_rows = len(store))
+
+    @property
+    def repos(self):
+        return sorted(self.repo_rows)
+
+    def rows_for_path(self, path):
+        path = normalize_path(path)
+        start = int(np.searchsorted(self.paths, path, side = "left"))
+        end = int(np.searchsorted(self.paths, path, side = "right"))
+        return self.path_rows[start:end]
+
+    def rows_for_prefix(self, prefix):
+        prefix = normalize_path(prefix)
+        start = int(np.searchsorted(self.paths, prefix, side = "left"))
+        end = int(np.searchsorted(self.paths, prefix + "\U0010ffff", side = "left"))
+        return np.sort(self.path_rows[start:end])
+
+    def rows_for_repos(self, repos):
+        parts = [self.repo_rows[r] for r in repos if r in self.repo_rows]
+        if not parts:
+            return np.zeros(0, dtype = np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def select(self, repos = None, exclude_repos = None, path_prefix = None):
+        # sorted live rows matching every given condition, None when no condition is given (whole corpus)
+        if repos is None and exclude_repos is None and path_prefix is None:
+            return None
+
+        rows = self.live_rows
+        if repos is not None:
+            rows = self.rows_for_repos(repos)
+        if path_prefix is not None:
+            rows = np.intersect1d(rows, self.rows_for_prefix(path_prefix), assume_unique = True)
+        if exclude_repos is not None:
+            rows = np.setdiff1d(rows, self.rows_for_repos(exclude_repos), assume_unique = True)
+
+        return np.sort(rows)
+
+    def make_filter(self, repos = None, exclude_repos = None, path_prefix = None, make_search_params = None, key = None, version = None):
+        rows = self.select(repos = repos, exclude_repos = exclude_repos, path_prefix = path_prefix)
+        if rows is None:
+            return None
+
+        search_params = make_search_params(rows) if make_search_params else None
+        return ChunkFilter(rows, self.num_rows, search_params = search_params, key = key, version = version)
@@ -0,0 +1,153 @@
+import hashlib
+import math
+import re
+from functools import lru_cache
+
+# packs retrieved snippets into an LLM prompt under a token budget.
+# snippets are cleaned (comments, blank lines and trailing spaces removed), exact and near duplicates are dropped,
+# and they're added best score first until the budget is full. a snippet longer than max_snippet_tokens, or the last
+# one that only partly fits, is cut to the run of lines sharing the most tokens with the query.
+# tokens are counted locally with count_tokens: the model's tiktoken encoding when tiktoken is installed and its
+# encoding file can be loaded, otherwise estimate_tokens, a BPE-like estimate (words are split every 4 characters,
+# every other non space character is a token). the estimate isn't checked against a real tokenizer, so budgets
+# are only exact with tiktoken.
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# literals are matched first and kept (group 1), so "http://x" isn't taken for a comment
+GO_COMMENT_PATTERN = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`[^`]*`)|//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+TRIM_MARKER = "// ..."
+
+TIKTOKEN_ENCODING = "o200k_base" # gpt-4o and gpt-4o-mini
+
+
+def estimate_tokens(text):
+    return sum(math.ceil(len(piece) / 4) if piece[0].isalnum() else 1 for piece in TOKEN_PATTERN.findall(text))
+
+
+@lru_cache(maxsize = None)
+def tiktoken_encoding(name = TIKTOKEN_ENCODING):
+    # None when tiktoken isn't installed or the encoding can't be loaded (it's downloaded on first use)
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    encoding = tiktoken_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special = ()))
+
+
+def strip_go_comments(text):
+    # drops // and /* */ comments outside of string, rune and raw string literals, then blank lines and trailing spaces
+    text = GO_COMMENT_PATTERN.sub(lambda m: m.group(1) or "", text)
+    lines = (line.rstrip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def shingles(text, size = 3):
+    words = WORD_PATTERN.findall(text)
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def trim_to_query(text, query_words, max_tokens, count = count_tokens):
+    # the run of consecutive lines of at most max_tokens tokens with the most query words in it,
+    # cut lines are replaced by a marker. returns None when not even one line fits
+    lines = text.split("\n")
+    costs = [count(line) + 1 for line in lines] # + newline
+    hits = [sum(1 for w in WORD_PATTERN.findall(line) if w in query_words) for line in lines]
+
+    budget = max_tokens - 2 * (count(TRIM_MARKER) + 1)
+    best = None
+    start = 0
+    tokens = 0
+    overlap = 0
+
+    for end in range(len(lines)):
+        tokens += costs[end]
+        overlap += hits[end]
+        while tokens > budget and start <= end:
+            tokens -= costs[start]
+            overlap -= hits[start]
+            start += 1
+
+        if start <= end and (best is None or overlap > best[0]):
+            best = (overlap, start, end)
+
+    if best is None:
+        return None
+
+    _, start, end = best
+    kept = lines[start:end + 1]
+    if start > 0:
+        kept.insert(0, TRIM_MARKER)
+    if end < len(lines) - 1:
+        kept.append(TRIM_MARKER)
+    return "\n".join(kept)
+
+
+def pack_snippets(snippets, code_query, budget_tokens, scores = None, max_snippet_tokens = None, snippet_overhead = 12,
+                  near_duplicate = 0.9, min_snippet_tokens = 32, count = count_tokens):
+    # snippets: texts, scores: higher is better (None = keep the given order).
+    # budget_tokens is for the snippets only, snippet_overhead covers the "[i]" and code fence around each one.
+    # returns (packed texts best first, stats)
+    order = range(len(snippets)) if scores is None else sorted(range(len(snippets)), key = lambda i: -scores[i])
+    query_words = set(WORD_PATTERN.findall(code_query))
+
+    packed = []
+    seen_hashes = set()
+    seen_shingles = []
+    stats = {"snippets": len(snippets), "packed": 0, "duplicates": 0, "trimmed": 0, "over_budget": 0, "tokens": 0}
+    remaining = budget_tokens
+
+    for pos in order:
+        if remaining - snippet_overhead < min_snippet_tokens: # full, the rest isn't even cleaned
+            stats["over_budget"] += 1
+            continue
+
+        text = strip_go_comments(snippets[pos])
+        if not text:
+            continue
+
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        text_shingles = shingles(text)
+        if digest in seen_hashes or any(jaccard(text_shingles, s) >= near_duplicate for s in seen_shingles):
+            stats["duplicates"] += 1
+            continue
+
+        limit = remaining - snippet_overhead
+        if max_snippet_tokens is not None:
+            limit = min(limit, max_snippet_tokens)
+
+        tokens = count(text)
+        if tokens > limit:
+            text = trim_to_query(text, query_words, limit, count) if limit >= min_snippet_tokens else None
+            if text is None:
+                stats["over_budget"] += 1
+                continue
+            tokens = count(text)
+            stats["trimmed"] += 1
+
+        packed.append(text)
+        seen_hashes.add(digest)
+        seen_shingles.append(text_shingles)
+        remaining -= tokens + snippet_overhead
+
+    stats["packed"] = len(packed)
+    stats["tokens"] = budget_tokens - remaining
+    return packed, stats
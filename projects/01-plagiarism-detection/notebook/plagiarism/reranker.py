@@ -0,0 +1,110 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+# local alternative to the LLM verdict: hybrid retrieval candidates are scored as (query, candidate) pairs by a
+# small cross-encoder on the CPU, and a query counts as plagiarized when its best pair reaches the threshold.
+# the threshold is calibrated on labelled queries with fit_threshold (04_evaluation does it on test_dataset.json).
+#
+# config is a plain dict, saved as json next to the indexes:
+# - model: sentence-transformers CrossEncoder name or local path, max_length: tokens of query + candidate together
+# - batch_size: pairs per forward pass, all pairs of a detect batch go through one predict call
+# - threshold: best pair score >= threshold is plagiarism (0..1, the model's sigmoid output), None until calibrated
+# - precision, recall, f1, n: how the threshold was fit
+#
+# the default model is trained on MS MARCO web search passages, not on code pairs, so its score says how relevant a
+# candidate is to the query and not how likely it is copied. there is no default threshold: the method refuses to
+# run until fit_threshold has set one and recorded its precision / recall, and another model (e.g. one trained on
+# code clone pairs) can be set in reranker.json, which needs a new fit as well.
+
+DEFAULT_RERANKER = {
+    "model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    "max_length": 512,
+    "batch_size": 32,
+    "threshold": None
+}
+
+
+class CrossEncoderScorer:
+    def __init__(self, model_name, max_length = 512, batch_size = 32):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length = max_length, device = "cpu")
+        self.batch_size = batch_size
+
+    def __call__(self, pairs):
+        # [(query, candidate)] -> float32 scores in 0..1
+        if not pairs:
+            return np.zeros(0, dtype = np.float32)
+        scores = self.model.predict(pairs, batch_size = self.batch_size, show_progress_bar = False, convert_to_numpy = True)
+        return np.asarray(scores, dtype = np.float32).reshape(len(pairs))
+
+
+def rerank_candidates(scorer, queries, candidates):
+    # candidates: one list of texts per query -> one score array per query, in candidate order.
+    # pairs of every query go to the scorer in one call, so it can batch across queries
+    pairs = [(query, text) for query, texts in zip(queries, candidates) for text in texts]
+    scores = scorer(pairs)
+
+    out = []
+    start = 0
+    for texts in candidates:
+        out.append(np.asarray(scores[start:start + len(texts)], dtype = np.float32))
+        start += len(texts)
+
+    return out
+
+
+def _f1(scores, labels, threshold):
+    predicted = scores >= threshold
+    tp = int((predicted & labels).sum())
+    fp = int((predicted & ~labels).sum())
+    fn = int((~predicted & labels).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def fit_threshold(scores, labels):
+    # the threshold with the best F1 (then precision) on the given queries. candidates are midpoints between
+    # consecutive distinct scores, so a query scored a little differently later doesn't flip right at the edge
+    scores = np.asarray(scores, dtype = np.float64)
+    labels = np.asarray(labels, dtype = bool)
+
+    distinct = np.unique(scores)
+    thresholds = np.concatenate([[distinct[0]], (distinct[1:] + distinct[:-1]) / 2]) if len(distinct) else np.array([0.5])
+
+    best = None
+    for threshold in thresholds:
+        precision, recall, f1 = _f1(scores, labels, threshold)
+        if best is None or (f1, precision) > (best["f1"], best["precision"]):
+            best = {"threshold": float(threshold), "precision": precision, "recall": recall, "f1": f1}
+
+    best["n"] = len(scores)
+    return best
+
+
+def save_reranker_config(path, config):
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    with open(path, "w", encoding = "utf-8") as f:
+        json.dump(config, f, indent = 2)
+
+
+def load_reranker_config(path):
+    path = Path(path)
+    if not path.exists():
+        return dict(DEFAULT_RERANKER)
+
+    with open(path, "r", encoding = "utf-8") as f:
+        return {**DEFAULT_RERANKER, **json.load(f)}
+
+
+def check_calibrated(config):
+    # the threshold only means something for the model it was fit with
+    if config.get("threshold") is None:
+        raise ValueError(f"the reranker threshold for {config['model']} isn't calibrated, run fit_reranker (04_evaluation) first")
+    if config.get("fit_model", config["model"]) != config["model"]:
+        raise ValueError(f"the reranker threshold was fit for {config['fit_model']}, not {config['model']}, run fit_reranker again")
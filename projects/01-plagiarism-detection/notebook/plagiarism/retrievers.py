@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from plagiarism.spans import submit_in_context
+
+# runs several retrievers (dense and BM25 for hybrid RAG) on the same queries at once, each with its own timeout.
+# all calls start together and every timeout counts from that moment. a call that misses its timeout is left out
+# (None), the caller fuses the others alone, and when every call misses it there are no candidates at all.
+#
+# a running thread can't be stopped, so a call that missed its timeout keeps its worker until it returns. the pool has
+# max_workers threads for the calls being waited for plus max_abandoned per retriever for such leftovers, and a
+# retriever that already has max_abandoned leftovers running is skipped (counted as a timeout) until one of them
+# returns. so a hanging retriever can't take the workers the other one needs.
+
+
+class ParallelRetrievers:
+    def __init__(self, names, max_workers = 8, max_abandoned = 4, thread_name_prefix = "retrieval"):
+        self.names = list(names)
+        self.max_abandoned = max_abandoned
+        self.pool = ThreadPoolExecutor(max_workers = max_workers + max_abandoned * len(self.names), thread_name_prefix = thread_name_prefix)
+
+        self.timeouts = {name: 0 for name in self.names} # calls that missed their timeout or were skipped
+        self.abandoned = {name: 0 for name in self.names} # calls that missed their timeout and are still running
+        self._lock = threading.Lock()
+
+    def run(self, calls, timeouts = None):
+        # calls: name -> function without arguments, timeouts: name -> seconds (None or missing = wait).
+        # returns name -> result, None for a call that missed its timeout
+        timeouts = timeouts or {}
+        started = time.perf_counter()
+
+        futures = {}
+        for name, fn in calls.items():
+            with self._lock:
+                skip = timeouts.get(name) is not None and self.abandoned[name] >= self.max_abandoned
+            futures[name] = None if skip else submit_in_context(self.pool, fn)
+
+        results = {}
+        for name, future in futures.items():
+            timeout = timeouts.get(name)
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - started))
+            results[name] = None
+            try:
+                if future is not None:
+                    results[name] = future.result(timeout = remaining)
+                    continue
+            except FuturesTimeout:
+                self._abandon(name, future)
+
+            with self._lock:
+                self.timeouts[name] += 1
+
+        return results
+
+    def _abandon(self, name, future):
+        if future.cancel(): # still queued, it never runs
+            return
+
+        with self._lock:
+            self.abandoned[name] += 1
+        future.add_done_callback(lambda _: self._returned(name))
+
+    def _returned(self, name):
+        with self._lock:
+            self.abandoned[name] -= 1
+
+    def close(self):
+        self.pool.shutdown(wait = False, cancel_futures = True)
@@ -0,0 +1,247 @@
+import csv
+import json
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from plagiarism.indexer import chunk_go_file, discover_files, file_hash
+
+# bulk scanning of submissions: whole .go files, or directories of them.
+# files are split with the same top level func chunking as the reference corpus (chunk_go_file), every function is
+# keyed by the sha256 of its text, and only functions not seen before (in this or an earlier submission) reach the
+# detector, batch_size unique functions per detect_batch call. as soon as a batch is detected, the files waiting for
+# it get their verdicts streamed to JSONL / CSV, so memory holds one batch of files plus a bounded verdict cache.
+
+SCAN_CSV_FIELDS = ["path", "functions", "flagged_functions", "is_plagiarized", "matched_paths", "error"]
+
+func_name_pattern = re.compile(r"^func\s+(?:\([^)]*\)\s*)?([A-Za-z_][A-Za-z0-9_]*)")
+
+
+def function_name(func_text):
+    match = func_name_pattern.match(func_text)
+    return match.group(1) if match else None
+
+
+def default_verdict(result):
+    # DetectionResult -> what is kept per function
+    return {"is_plagiarized": bool(result.is_plagiarized), "reason": result.reason, "evidence": result.evidence_mine}
+
+
+def discover_submissions(paths):
+    # yields (file path, path to report) for .go files and every .go file under directories, in a stable order
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for file_path, rel_path in discover_files(path):
+                yield file_path, str(Path(path.name) / rel_path)
+        else:
+            yield str(path), path.name
+
+
+class ScanStats:
+    def __init__(self, progress = print, progress_every = 5.0):
+        self.progress = progress
+        self.progress_every = progress_every
+        self.started = time.perf_counter()
+        self.last_report = self.started
+
+        self.files = 0
+        self.functions = 0
+        self.detected = 0 # unique functions sent to the detector
+        self.reused = 0 # functions answered from an identical function seen before
+        self.flagged_files = 0
+        self.errors = 0
+        self.detect_seconds = 0.0
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "seconds": elapsed,
+            "files": self.files,
+            "functions": self.functions,
+            "detected": self.detected,
+            "reused": self.reused,
+            "flagged_files": self.flagged_files,
+            "errors": self.errors,
+            "files_per_s": self.files / elapsed,
+            "functions_per_s": self.functions / elapsed,
+            "detect_share": self.detect_seconds / elapsed
+        }
+
+    def tick(self, force = False):
+        now = time.perf_counter()
+        if self.progress is None or (not force and now - self.last_report < self.progress_every):
+            return
+
+        self.last_report = now
+        s = self.summary()
+        self.progress(
+            f"[{s['seconds']:.0f}s] {s['files']} files, {s['functions']} functions ({s['detected']} detected, "
+            f"{s['reused']} reused), {s['flagged_files']} flagged ({s['files_per_s']:.1f} files/s, {s['functions_per_s']:.1f} functions/s)"
+        )
+
+
+class SubmissionScanner:
+    def __init__(self, detect_batch, to_verdict = default_verdict, batch_size = 256, max_cached = 100000, progress = print, progress_every = 5.0):
+        # detect_batch: list of function texts -> list of detection results, e.g. detect_fingerprint_batch
+        # to_verdict: detection result -> json serializable dict with an "is_plagiarized" key
+        # max_cached: verdicts of unique functions kept for dedup across submissions (least recently used are dropped)
+        self.detect_batch = detect_batch
+        self.to_verdict = to_verdict
+        self.batch_size = batch_size
+        self.max_cached = max_cached
+        self.progress = progress
+        self.progress_every = progress_every
+
+        self.verdicts = OrderedDict() # function sha256 -> verdict
+        self.stats = None
+
+    def scan(self, paths, jsonl_path = None, csv_path = None):
+        # paths: files and / or directories. returns the stats summary, results only go to the output files
+        self.stats = ScanStats(progress = self.progress, progress_every = self.progress_every)
+        self._waiting_files = []
+        self._pending = OrderedDict() # sha256 -> text of functions waiting for the detector
+
+        with ScanWriter(jsonl_path, csv_path) as writer:
+            self._writer = writer
+
+            for file_path, report_path in discover_submissions(paths):
+                self.add_file(file_path, report_path)
+                # files made only of known functions wait too, so they're bounded by the same batch size
+                if len(self._pending) >= self.batch_size or len(self._waiting_files) >= self.batch_size:
+                    self.flush()
+
+            self.flush()
+
+        self.stats.tick(force = True)
+        return self.stats.summary()
+
+    def add_file(self, file_path, report_path):
+        self.stats.files += 1
+
+        try:
+            text = Path(file_path).read_text(encoding = "utf-8", errors = "ignore")
+        except OSError as e:
+            self._waiting_files.append({"path": report_path, "functions": [], "error": repr(e)})
+            return
+
+        functions = []
+        for func_text in chunk_go_file(text):
+            sha256 = file_hash(func_text)
+            functions.append({"name": function_name(func_text), "sha256": sha256})
+            self.stats.functions += 1
+
+            if sha256 in self.verdicts or sha256 in self._pending:
+                self.stats.reused += 1
+            else:
+                self._pending[sha256] = func_text
+
+        self._waiting_files.append({"path": report_path, "functions": functions, "error": None})
+
+    def flush(self):
+        if self._pending:
+            texts = list(self._pending.values())
+
+            started = time.perf_counter()
+            results = self.detect_batch(texts)
+            self.stats.detect_seconds += time.perf_counter() - started
+            self.stats.detected += len(texts)
+
+            for sha256, result in zip(self._pending, results):
+                self.verdicts[sha256] = self.to_verdict(result)
+            self._pending = OrderedDict()
+
+        for entry in self._waiting_files:
+            self._writer.write(self.file_record(entry))
+        self._writer.flush()
+        self._waiting_files = []
+
+        # only evicted once the waiting files are written, they may need any of the cached verdicts
+        while len(self.verdicts) > self.max_cached:
+            self.verdicts.popitem(last = False)
+
+        self.stats.tick()
+
+    def file_record(self, entry):
+        functions = []
+        for func in entry["functions"]:
+            verdict = self.verdicts[func["sha256"]]
+            self.verdicts.move_to_end(func["sha256"])
+            functions.append({**func, **verdict})
+
+        flagged = [func for func in functions if func["is_plagiarized"]]
+        if flagged:
+            self.stats.flagged_files += 1
+        if entry["error"]:
+            self.stats.errors += 1
+
+        return {
+            "path": entry["path"],
+            "is_plagiarized": len(flagged) > 0,
+            "functions": len(functions),
+            "flagged_functions": len(flagged),
+            "error": entry["error"],
+            "flagged": flagged # evidence only for flagged functions, clean ones just count
+        }
+
+
+class ScanWriter:
+    # one JSON line (full record) and / or one CSV row (summary) per file, flushed per batch
+    def __init__(self, jsonl_path = None, csv_path = None):
+        self._jsonl = self._open(jsonl_path)
+        self._csv_file = self._open(csv_path)
+        self._csv = None
+
+        if self._csv_file is not None:
+            self._csv = csv.DictWriter(self._csv_file, fieldnames = SCAN_CSV_FIELDS)
+            self._csv.writeheader()
+
+    @staticmethod
+    def _open(path):
+        if path is None:
+            return None
+
+        path = Path(path)
+        path.parent.mkdir(parents = True, exist_ok = True)
+        return open(path, "w", encoding = "utf-8", newline = "")
+
+    def write(self, record):
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(record, default = str) + "\n")
+
+        if self._csv is not None:
+            matched_paths = []
+            for func in record["flagged"]:
+                for evidence in func.get("evidence") or []:
+                    path = evidence.get("path") if isinstance(evidence, dict) else None
+                    if path and path not in matched_paths:
+                        matched_paths.append(path)
+
+            self._csv.writerow({
+                "path": record["path"],
+                "functions": record["functions"],
+                "flagged_functions": record["flagged_functions"],
+                "is_plagiarized": record["is_plagiarized"],
+                "matched_paths": ";".join(matched_paths),
+                "error": record["error"] or ""
+            })
+
+    def flush(self):
+        for f in [self._jsonl, self._csv_file]:
+            if f is not None:
+                f.flush()
+
+    def close(self):
+        for f in [self._jsonl, self._csv_file]:
+            if f is not None and not f.closed:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
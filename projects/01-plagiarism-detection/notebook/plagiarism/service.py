@@ -0,0 +1,419 @@
+import argparse
+import inspect
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from plagiarism.batching import LATENCY_BOUNDS_MS, Histogram, MicroBatcher
+
+# long-lived plagiarism check service. the detectors are the ones of 03_interactive: its code cells run once at
+# startup (as %run does for 04_evaluation), so the FAISS index, BM25, fingerprints and encoder are loaded once.
+# run from the notebook folder after 02_indexing:
+#   python -m plagiarism.service --port 8000 --max-batch 64 --max-wait-ms 5
+#
+# endpoints (JSON):
+# - POST /detect/<method> {"code": "...", "params": {"top_k": 10, "scope": {"repos": ["raft-go"]}}} -> one verdict
+#   requests for the same method and params that arrive within max_wait_ms are detected as one batch
+#   (one encode call, one FAISS search), see plagiarism/batching.py. params are checked against the detector's
+#   keyword arguments and normalized (defaults filled in, numbers of the default's type), scope takes the arguments
+#   of make_scope in 03_interactive. there is one batcher thread per method and params, at most max_batchers: one
+#   idle for batcher_idle_s is closed, and when all of them are busy a request for new params gets a 503.
+#   LLM backed methods are only batched up to their prompts (service_methods in 03_interactive), their LLM verdicts
+#   run on a pool of llm_workers threads, so a batch never waits for the LLM calls of the one before
+# - GET /methods, GET /health (with the index snapshot in use)
+# - GET /metrics: queue depth, batch size, queue / batch / request latency histograms and per stage latency, per method
+# load test it with: python -m plagiarism.load_test
+#
+# index snapshots 02_indexing publishes while the service runs are loaded in the background and swapped in
+# (--reload-poll-s, 0 = off), requests in flight finish on the snapshot they started with, see plagiarism/snapshots.py
+#
+# --llm-stream early answers LLM backed methods as soon as the model wrote is_plagiarized, reason and evidence_oai
+# are then left empty ("details_pending": true), the whole answer still lands in the LLM cache.
+# --llm-stream verdict_only doesn't read the rest of the answer at all, see llm_stream_mode in 03_interactive
+
+
+class BadParams(ValueError):
+    pass
+
+
+class Busy(RuntimeError):
+    pass
+
+
+SCOPE_FIELDS = {"repos": list, "exclude_repos": list, "path_prefix": str}
+
+
+def load_notebook(path):
+    # runs the code cells of a notebook in a fresh namespace, lines with notebook magics are left out
+    with open(path, "r", encoding = "utf-8") as f:
+        notebook = json.load(f)
+
+    namespace = {"__name__": "__notebook__"}
+    for pos, cell in enumerate(notebook["cells"]):
+        if cell["cell_type"] != "code":
+            continue
+
+        source = "".join(cell["source"])
+        source = "\n".join(line for line in source.splitlines() if not line.lstrip().startswith(("%", "!")))
+        exec(compile(source, f"{path}[{pos}]", "exec"), namespace)
+
+    return namespace
+
+
+def verdict(result):
+    # DetectionResult -> JSON, chunk texts are left out of the evidence (chunk id and path point to them)
+    evidence = [
+        {key: value for key, value in e.items() if key != "text"} if isinstance(e, dict) else e
+        for e in (result.evidence_mine or [])
+    ]
+    return {
+        "method": result.method,
+        "is_plagiarized": bool(result.is_plagiarized),
+        "reason": result.reason,
+        "evidence": evidence,
+        "evidence_oai": result.evidence_oai,
+        "escalated": result.escalated,
+        "details_pending": getattr(result, "pending", None) is not None
+    }
+
+
+def parse_scope(scope):
+    # JSON scope -> make_scope keyword arguments with sorted repo lists, None = whole corpus
+    if scope is None:
+        return None
+    if not isinstance(scope, dict):
+        raise BadParams(f"scope must be an object with {sorted(SCOPE_FIELDS)}, got {scope!r}")
+
+    parsed = {}
+    for field, value in scope.items():
+        if field not in SCOPE_FIELDS:
+            raise BadParams(f"unknown scope field {field}, expected one of {sorted(SCOPE_FIELDS)}")
+        if value is None:
+            continue
+        if not isinstance(value, SCOPE_FIELDS[field]):
+            raise BadParams(f"scope {field} must be a {SCOPE_FIELDS[field].__name__}, got {value!r}")
+        if isinstance(value, list):
+            if not all(isinstance(v, str) for v in value):
+                raise BadParams(f"scope {field} must be a list of names, got {value!r}")
+            value = sorted(set(value))
+        parsed[field] = value
+
+    return parsed or None
+
+
+def normalize_params(detect_batch, params):
+    # request params -> every keyword argument of the detector with its defaults filled in, so the same config
+    # always gets the same batcher. only finite numbers of the default's type, booleans, null where the default is
+    # null and a scope object are accepted
+    if not isinstance(params, dict):
+        raise BadParams(f"params must be an object, got {params!r}")
+
+    signature = inspect.signature(detect_batch)
+    try:
+        bound = signature.bind([], **params)
+    except TypeError as e:
+        raise BadParams(f"bad params: {e}") from None
+    bound.apply_defaults()
+
+    normalized = {}
+    for name, value in list(bound.arguments.items())[1:]:
+        default = signature.parameters[name].default
+        if name == "scope":
+            normalized[name] = parse_scope(value)
+        elif value is None or isinstance(default, bool):
+            if value is not default and (value is None or not isinstance(value, bool)):
+                raise BadParams(f"bad params: {name} can't be {json.dumps(value)}")
+            normalized[name] = value
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise BadParams(f"bad params: {name} must be a number, got {json.dumps(value)}")
+        elif isinstance(default, int):
+            if value != int(value):
+                raise BadParams(f"bad params: {name} must be an integer, got {value}")
+            normalized[name] = int(value)
+        else:
+            normalized[name] = float(value) if isinstance(default, float) else value
+
+    return normalized
+
+
+def to_json(value):
+    # numpy scalars in evidence become plain numbers
+    return json.dumps(value, default = lambda o: o.item() if hasattr(o, "item") else str(o)).encode("utf-8")
+
+
+class DetectionService:
+    def __init__(
+        self,
+        detectors,
+        max_batch_size = 64,
+        max_wait_ms = 5.0,
+        timeout_s = 120.0,
+        index_status = None,
+        make_scope = None,
+        pin = None,
+        llm_workers = 16,
+        max_batchers = 32,
+        batcher_idle_s = 60.0
+    ):
+        # detectors: method -> batch detector (list of codes, **params) -> one DetectionResult per code, or a function
+        # without arguments that returns it (an LLM verdict, run on the LLM pool)
+        # index_status: optional () -> dict about the loaded indexes, reported by /health and /metrics
+        # make_scope: scope arguments -> scope for the detectors, None = scopes aren't supported
+        # pin: optional () -> context manager that keeps one index snapshot for a whole batch (scope included)
+        self.detectors = detectors
+        self.index_status = index_status
+        self.make_scope = make_scope
+        self.pin = pin or nullcontext
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.timeout_s = timeout_s
+        self.max_batchers = max_batchers
+        self.batcher_idle_s = batcher_idle_s
+        self.started = time.time()
+
+        self.llm_pool = ThreadPoolExecutor(max_workers = llm_workers, thread_name_prefix = "service-llm")
+        self.llm_in_flight = 0
+
+        self.batchers = {} # (method, params json) -> MicroBatcher, requests are only batched with equal params
+        self.last_used = {} # (method, params json) -> time.monotonic() of the last request
+        self.request_ms = {} # method -> Histogram
+        self.llm_ms = {} # method -> Histogram of the LLM verdicts, queue wait included
+        self.evicted = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def batch_fn(self, detect_batch, params):
+        if params.get("scope") is None:
+            return lambda codes: detect_batch(codes, **params)
+
+        # the scope is made in the batch, for the snapshot the batch runs on
+        def run(codes):
+            with self.pin():
+                return detect_batch(codes, **{**params, "scope": self.make_scope(**params["scope"])})
+        return run
+
+    def submit(self, method, code, params):
+        # the batcher is looked up (or made) and the code queued under one lock, so an idle batcher can't be closed
+        # in between. -> Future of the batch result
+        detect_batch = self.detectors[method]
+        params = normalize_params(detect_batch, params)
+        key = (method, json.dumps(params, sort_keys = True))
+        if params.get("scope") is not None and self.make_scope is None:
+            raise BadParams("scope isn't supported by this service")
+
+        with self._lock:
+            now = time.monotonic()
+            if key not in self.batchers:
+                for batcher in self._evict_idle(now):
+                    batcher.close(wait = False) # its queue is empty, the thread ends after a batch it may be running
+                if len(self.batchers) >= self.max_batchers:
+                    raise Busy(f"all {self.max_batchers} batchers are busy with other params, retry or use the params of one of them")
+
+                self.batchers[key] = MicroBatcher(
+                    self.batch_fn(detect_batch, params),
+                    max_batch_size = self.max_batch_size,
+                    max_wait_ms = self.max_wait_ms,
+                    name = f"batcher-{method}"
+                )
+                self.request_ms.setdefault(method, Histogram(LATENCY_BOUNDS_MS))
+                self.llm_ms.setdefault(method, Histogram(LATENCY_BOUNDS_MS))
+
+            self.last_used[key] = now
+            return self.batchers[key].submit(code)
+
+    def _evict_idle(self, now):
+        # batchers with an empty queue that got no request for batcher_idle_s
+        idle = [
+            key for key, used in self.last_used.items()
+            if now - used >= self.batcher_idle_s and self.batchers[key].depth() == 0
+        ]
+        self.evicted += len(idle)
+        for key in idle:
+            del self.last_used[key]
+        return [self.batchers.pop(key) for key in idle]
+
+    def verdict(self, method, result, deadline):
+        # LLM verdicts left as functions run on the LLM pool, the batcher is free for the next batch meanwhile
+        if not callable(result):
+            return result
+
+        started = time.perf_counter()
+        with self._lock:
+            self.llm_in_flight += 1
+        try:
+            return self.llm_pool.submit(result).result(timeout = max(0.0, deadline - time.perf_counter()))
+        finally:
+            with self._lock:
+                self.llm_in_flight -= 1
+            self.llm_ms[method].observe((time.perf_counter() - started) * 1000)
+
+    def detect(self, method, code, params = None):
+        started = time.perf_counter()
+        deadline = started + self.timeout_s
+        result = self.submit(method, code, params or {}).result(timeout = self.timeout_s)
+        result = self.verdict(method, result, deadline)
+
+        self.request_ms[method].observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            self.requests += 1
+        return verdict(result)
+
+    def metrics(self):
+        with self._lock:
+            batchers = dict(self.batchers)
+            llm_in_flight = self.llm_in_flight
+
+        methods = {
+            method: {"request_ms": self.request_ms[method].snapshot(), "llm_ms": self.llm_ms[method].snapshot(), "configs": {}}
+            for method in self.request_ms
+        }
+        for (method, params), batcher in batchers.items():
+            methods[method]["configs"][params] = {"queue_depth_now": batcher.depth(), **batcher.metrics.snapshot()}
+
+        return {
+            "uptime_s": time.time() - self.started,
+            "index": self.health()["index"],
+            "requests": self.requests,
+            "queue_depth": sum(b.depth() for b in batchers.values()),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batchers": len(batchers),
+            "batchers_evicted": self.evicted,
+            "llm_in_flight": llm_in_flight,
+            "methods": methods
+        }
+
+    def health(self):
+        return {"status": "ok", "index": self.index_status() if self.index_status else None}
+
+    def close(self):
+        with self._lock:
+            batchers = list(self.batchers.values())
+        for batcher in batchers:
+            batcher.close()
+        self.llm_pool.shutdown(wait = False, cancel_futures = True)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, load tests reuse connections
+        disable_nagle_algorithm = True # headers and body are separate writes, don't wait for the ACK in between
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, body):
+            data = to_json(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.reply(200, service.health())
+            elif self.path == "/methods":
+                self.reply(200, {"methods": list(service.detectors)})
+            elif self.path == "/metrics":
+                self.reply(200, service.metrics())
+            else:
+                self.reply(404, {"error": f"no route {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+
+            if not self.path.startswith("/detect/"):
+                self.reply(404, {"error": f"no route {self.path}"})
+                return
+
+            method = self.path[len("/detect/"):]
+            if method not in service.detectors:
+                self.reply(404, {"error": f"unknown method {method}, expected one of {list(service.detectors)}"})
+                return
+
+            try:
+                request = json.loads(body)
+                code = request["code"]
+                params = request.get("params") or {}
+            except (ValueError, KeyError, TypeError):
+                self.reply(400, {"error": 'expected a JSON body {"code": "...", "params": {...}}'})
+                return
+
+            try:
+                self.reply(200, service.detect(method, code, params))
+            except BadParams as e:
+                self.reply(400, {"error": str(e)})
+            except Busy as e:
+                self.reply(503, {"error": str(e)})
+            except Exception as e:
+                self.reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256 # a burst of clients connecting at once isn't refused
+
+
+def make_server(service, host = "127.0.0.1", port = 8000):
+    return Server((host, port), make_handler(service))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "serve the detectors of 03_interactive over HTTP with micro-batching")
+    parser.add_argument("--notebook", default = "03_interactive.ipynb")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8000)
+    parser.add_argument("--max-batch", type = int, default = 64, help = "most requests detected in one batch")
+    parser.add_argument("--max-wait-ms", type = float, default = 5.0, help = "how long the first request of a batch waits for others")
+    parser.add_argument("--methods", nargs = "+", default = None, help = "methods to serve (default: all of service_methods)")
+    parser.add_argument("--llm-workers", type = int, default = 16, help = "LLM verdicts running at once, over all methods")
+    parser.add_argument("--max-batchers", type = int, default = 32, help = "most method and params configs served at once")
+    parser.add_argument("--batcher-idle-s", type = float, default = 60.0, help = "a config unused this long is closed")
+    parser.add_argument("--llm-stream", default = "off", choices = ["off", "early", "verdict_only"], help = "answer LLM methods at the verdict")
+    parser.add_argument("--reload-poll-s", type = float, default = 2.0, help = "how often to look for a new index snapshot, 0 = never")
+    args = parser.parse_args()
+
+    print(f"loading {args.notebook}...")
+    namespace = load_notebook(args.notebook)
+    namespace["llm_stream_mode"] = None if args.llm_stream == "off" else args.llm_stream
+    detectors = namespace["service_methods"]
+    if args.methods:
+        detectors = {name: detectors[name] for name in args.methods}
+
+    watcher = namespace["watch_snapshots"](args.reload_poll_s) if args.reload_poll_s > 0 else None
+
+    service = DetectionService(
+        detectors,
+        max_batch_size = args.max_batch,
+        max_wait_ms = args.max_wait_ms,
+        index_status = watcher.status if watcher else None,
+        make_scope = namespace["make_scope"],
+        pin = namespace["live_indexes"].pin,
+        llm_workers = args.llm_workers,
+        max_batchers = args.max_batchers,
+        batcher_idle_s = args.batcher_idle_s
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"serving {', '.join(detectors)} on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if watcher:
+            watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from plagiarism.bm25_index import BM25Index
+from plagiarism.chunk_store import ChunkStore
+from plagiarism.dense_backends import build_dense_index, filtered_search_params, load_dense_index, master_vectors
+
+# sharded scatter-gather retrieval.
+# the corpus is split into shards (by repo, so repo scoped searches stay on few shards, or by a hash of the chunk id),
+# every shard has its own FAISS index and BM25 postings and is served by its own worker process, so search runs on
+# as many cores (and GILs) as there are shards. a query batch goes to every shard at once and their top k are merged.
+#
+# ids stay global chunk rows in every shard, so merged results point into the chunk store like before.
+# dense distances are comparable across shards as they are. BM25 scores only are if idf and the average chunk length
+# are the same everywhere: shards are sliced from the master BM25 index 02_indexing maintains, and keep its
+# precomputed posting weights (global N, document frequencies and avgdl), so a merged top k scores exactly like a
+# search over the whole corpus. that's also why shards are re-sliced whenever the master changes.
+#
+# on disk: indexes/shards/shards.json + shard_<i>/dense_index.faiss and shard_<i>/bm25
+# config: {"num_shards": 4, "by": "repo" | "hash"}
+
+SHARDS_META_FILE = "shards.json"
+SHARD_BY = ["repo", "hash"]
+
+
+def assign_shards(chunk_ids, repos, num_shards, by = "repo"):
+    # shard of every row. by repo: whole repos, biggest first onto the emptiest shard.
+    # by hash: crc32 of the chunk id, stable when other chunks come and go
+    if by not in SHARD_BY:
+        raise ValueError(f"unknown shard key {by}, expected one of {SHARD_BY}")
+
+    if by == "hash":
+        return np.array([zlib.crc32(chunk_id.encode("utf-8")) % num_shards for chunk_id in chunk_ids], dtype = np.int32)
+
+    repo_sizes = {}
+    for repo in repos:
+        repo_sizes[repo] = repo_sizes.get(repo, 0) + 1
+
+    loads = [0] * num_shards
+    repo_shard = {}
+    for repo, size in sorted(repo_sizes.items(), key = lambda r: (-r[1], r[0])):
+        shard = loads.index(min(loads))
+        repo_shard[repo] = shard
+        loads[shard] += size
+
+    return np.array([repo_shard[repo] for repo in repos], dtype = np.int32)
+
+
+def slice_bm25(bm25, doc_shard, shard):
+    # postings of the shard's chunks with their global weights, terms without postings here are dropped
+    keep = doc_shard[bm25.doc_ids] == shard
+    posting_terms = np.repeat(np.arange(len(bm25.terms)), np.diff(bm25.indptr))[keep]
+    counts = np.bincount(posting_terms, minlength = len(bm25.terms))
+    used = counts > 0
+
+    live = np.zeros(len(bm25.doc_len), dtype = bool)
+    live[np.flatnonzero(doc_shard == shard)] = True
+    live &= np.asarray(bm25.live, dtype = bool)
+
+    return BM25Index(
+        np.asarray(bm25.terms)[used],
+        np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64),
+        np.asarray(bm25.doc_ids)[keep],
+        np.asarray(bm25.tfs)[keep],
+        np.asarray(bm25.weights)[keep],
+        np.asarray(bm25.idf)[used],
+        np.where(live, bm25.doc_len, 0).astype(np.int32),
+        live = live,
+        k1 = bm25.k1,
+        b = bm25.b,
+        epsilon = bm25.epsilon
+    )
+
+
+def build_shards(indexes_dir, config, dense_backend, shards_dir = None, master_file = "dense_index.faiss", bm25_dir = "bm25"):
+    # slices the master dense index and BM25 into shards, skipped when they were built from the same masters
+    # with the same configs. returns the shards directory
+    indexes_dir = Path(indexes_dir)
+    shards_dir = Path(shards_dir) if shards_dir else indexes_dir / "shards"
+    master_path = indexes_dir / master_file
+    bm25_path = indexes_dir / bm25_dir
+
+    build_info = {
+        "config": config,
+        "dense_backend": dense_backend,
+        "master_mtime_ns": master_path.stat().st_mtime_ns,
+        "bm25_mtime_ns": (bm25_path / "weights.npy").stat().st_mtime_ns
+    }
+
+    meta_path = shards_dir / SHARDS_META_FILE
+    if meta_path.exists():
+        with open(meta_path, "r", encoding = "utf-8") as f:
+            if json.load(f)["build"] == build_info:
+                return shards_dir
+
+    with ChunkStore(indexes_dir / "chunk_store") as store:
+        rows = np.fromiter(store.live_rows(), dtype = np.int64)
+        id_pos = store.fields.index("id")
+        repo_pos = store.fields.index("repo")
+        chunk_ids = [store.field(int(row), id_pos) for row in rows]
+        repos = [store.field(int(row), repo_pos) for row in rows]
+        num_rows = store.num_chunks
+
+    num_shards = config["num_shards"]
+    doc_shard = np.full(num_rows, -1, dtype = np.int32)
+    doc_shard[rows] = assign_shards(chunk_ids, repos, num_shards, by = config.get("by", "repo"))
+
+    vecs, ids = master_vectors(faiss.read_index(str(master_path)))
+    bm25 = BM25Index.load(bm25_path)
+
+    shards = []
+    for shard in range(num_shards):
+        shard_dir = shards_dir / f"shard_{shard}"
+        shard_dir.mkdir(parents = True, exist_ok = True)
+
+        in_shard = doc_shard[ids] == shard
+        faiss.write_index(build_dense_index(dense_backend, vecs[in_shard], ids[in_shard]), str(shard_dir / "dense_index.faiss"))
+        slice_bm25(bm25, doc_shard, shard).save(shard_dir / "bm25")
+
+        shard_repos = sorted({repo for repo, s in zip(repos, doc_shard[rows]) if s == shard})
+        shards.append({"dir": shard_dir.name, "chunks": int(in_shard.sum()), "repos": shard_repos if config.get("by", "repo") == "repo" else None})
+
+    with open(meta_path, "w", encoding = "utf-8") as f:
+        json.dump({"build": build_info, "shards": shards}, f, indent = 2)
+
+    return shards_dir
+
+
+def merge_dense(parts, k):
+    # (distances, ids) per shard, each (num queries, k_i) -> the k nearest over all shards, FAISS layout
+    distances = np.concatenate([d for d, _ in parts], axis = 1)
+    ids = np.concatenate([i for _, i in parts], axis = 1)
+    distances = np.where(ids == -1, np.inf, distances)
+
+    order = np.argsort(distances, axis = 1, kind = "stable")[:, :k]
+    distances = np.take_along_axis(distances, order, axis = 1)
+    ids = np.take_along_axis(ids, order, axis = 1)
+
+    return np.where(ids == -1, np.finfo(np.float32).max, distances).astype(np.float32), ids
+
+
+def merge_bm25(parts, k):
+    # [(ids, scores) per query] per shard -> (ids, scores) per query, same order as BM25Index.top_k
+    merged = []
+    for hits in zip(*parts):
+        ids = np.concatenate([h[0] for h in hits]).astype(np.int64)
+        scores = np.concatenate([h[1] for h in hits])
+        order = np.lexsort((ids, -scores))[:k]
+        merged.append((ids[order], scores[order]))
+    return merged
+
+
+class Shard:
+    # one shard's indexes, queried in a worker process (or in this one with processes = False)
+    def __init__(self, shard_dir, dense_backend):
+        shard_dir = Path(shard_dir)
+        self.dense_backend = dense_backend
+        self.dense = load_dense_index(shard_dir / "dense_index.faiss", dense_backend)
+        self.bm25 = BM25Index.load(shard_dir / "bm25")
+        self.ids = faiss.vector_to_array(self.dense.id_map).astype(np.int64)
+        self.scopes = {} # scope key -> (bm25 mask, dense search params)
+
+    def scope(self, scope):
+        # scope: None or (key, global rows), rows are only sent the first time a key is used
+        if scope is None:
+            return None, None
+
+        key, rows = scope
+        if key not in self.scopes:
+            mask = np.zeros(self.bm25.corpus_size, dtype = bool)
+            mask[rows[rows < len(mask)]] = True
+            self.scopes[key] = (mask, filtered_search_params(self.dense_backend, np.intersect1d(rows, self.ids)))
+
+        return self.scopes[key]
+
+    def dense_search(self, query_vecs, k, scope = None):
+        _, params = self.scope(scope)
+        if params is None:
+            return self.dense.search(query_vecs, k)
+        return self.dense.search(query_vecs, k, params = params)
+
+    def bm25_top_k_batch(self, queries_toks, k, scope = None):
+        mask, _ = self.scope(scope)
+        return self.bm25.top_k_batch(queries_toks, k, mask = mask)
+
+    def info(self):
+        return {"chunks": int(self.dense.ntotal), "terms": len(self.bm25.terms)}
+
+
+def serve_shard(conn, shard_dir, dense_backend, threads):
+    # worker process: answers (request id, op, args) until the connection closes
+    faiss.omp_set_num_threads(threads)
+    shard = Shard(shard_dir, dense_backend)
+    conn.send((None, True, shard.info()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        request_id, op, args = message
+        try:
+            conn.send((request_id, True, getattr(shard, op)(*args)))
+        except Exception as e:
+            conn.send((request_id, False, f"{type(e).__name__}: {e}"))
+
+
+class ShardClient:
+    # requests to one worker, answers are matched to futures by a reader thread, so shards work concurrently
+    # and several threads (dense and BM25 retrieval) can use the same worker
+    def __init__(self, conn, process):
+        self.conn = conn
+        self.process = process
+        self.pending = {}
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+
+        _, _, self.info = conn.recv() # ready
+        self.reader = threading.Thread(target = self._read, daemon = True)
+        self.reader.start()
+
+    def submit(self, op, *args):
+        future = Future()
+        with self.lock:
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+            self.conn.send((request_id, op, args))
+        return future
+
+    def _read(self):
+        while True:
+            try:
+                request_id, ok, value = self.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            future = self.pending.pop(request_id)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(f"shard {self.process.name}: {value}"))
+
+        for future in self.pending.values():
+            future.set_exception(RuntimeError(f"shard {self.process.name} stopped"))
+
+    def close(self):
+        with self.lock:
+            self.conn.send(None)
+        self.process.join(timeout = 10)
+        self.conn.close()
+
+
+class ShardedRetriever:
+    # scatter-gather over the shards of build_shards: dense_search returns FAISS style (distances, ids),
+    # bm25_top_k_batch a (ids, scores) pair per query, both as if the whole corpus was one index
+    def __init__(self, shards_dir, dense_backend, processes = True, threads_per_shard = 1):
+        shards_dir = Path(shards_dir)
+        with open(shards_dir / SHARDS_META_FILE, "r", encoding = "utf-8") as f:
+            self.meta = json.load(f)
+
+        shard_dirs = [shards_dir / s["dir"] for s in self.meta["shards"]]
+        self.scopes_sent = set()
+        self.submit_lock = threading.Lock()
+        self.local = None
+        self.clients = None
+
+        if not processes:
+            self.local = [Shard(d, dense_backend) for d in shard_dirs]
+            return
+
+        # spawn, a forked child would inherit FAISS / OpenMP thread state and the parent's loaded indexes
+        ctx = multiprocessing.get_context("spawn")
+        started = []
+        for pos, shard_dir in enumerate(shard_dirs):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target = serve_shard, args = (child_conn, str(shard_dir), dense_backend, threads_per_shard), name = f"shard-{pos}", daemon = True)
+            process.start()
+            child_conn.close()
+            started.append((parent_conn, process))
+
+        self.clients = [ShardClient(conn, process) for conn, process in started]
+
+    @property
+    def num_shards(self):
+        return len(self.local if self.local is not None else self.clients)
+
+    def _scope_arg(self, scope):
+        # scope: None or a ChunkFilter-like object with .rows and .key. the key stands for the same rows for as long
+        # as the retriever lives, unlike id(scope), which a new filter can reuse after the old one is collected
+        if scope is None:
+            return None
+
+        key = scope.key
+        if key in self.scopes_sent:
+            return (key, None)
+        self.scopes_sent.add(key)
+        return (key, np.asarray(scope.rows, dtype = np.int64))
+
+    def _scatter(self, op, args, scope):
+        if self.local is not None:
+            # in process the rows cost nothing to pass, and the shards build a key's scope once
+            scope_arg = None if scope is None else (scope.key, np.asarray(scope.rows, dtype = np.int64))
+            return [getattr(shard, op)(*args, scope_arg) for shard in self.local]
+
+        # every worker gets requests in the same order, so the one carrying a scope's rows is always first
+        with self.submit_lock:
+            scope_arg = self._scope_arg(scope)
+            futures = [client.submit(op, *args, scope_arg) for client in self.clients]
+        return [future.result() for future in futures]
+
+    def dense_search(self, query_vecs, k, scope = None):
+        query_vecs = np.ascontiguousarray(query_vecs, dtype = np.float32)
+        return merge_dense(self._scatter("dense_search", (query_vecs, k), scope), k)
+
+    def bm25_top_k_batch(self, queries_toks, k, scope = None):
+        return merge_bm25(self._scatter("bm25_top_k_batch", (list(queries_toks), k), scope), k)
+
+    def close(self):
+        for client in self.clients or []:
+            client.close()
+        self.clients = None
+
+
+def main():
+    # throughput of the sharded workers against the unsharded indexes in this process, no encoder needed:
+    # dense queries are stored chunk vectors, BM25 queries the tokens of stored chunks
+    from plagiarism.dense_backends import load_backend_config
+    from plagiarism.indexer import tokenize_code
+
+    parser = argparse.ArgumentParser(description = "build index shards and compare their query throughput with one process")
+    parser.add_argument("--indexes", default = "indexes")
+    parser.add_argument("--num-shards", type = int, nargs = "+", default = [2, 4])
+    parser.add_argument("--by", default = "hash", choices = SHARD_BY)
+    parser.add_argument("--queries", type = int, default = 2000)
+    parser.add_argument("--batch", type = int, default = 32)
+    parser.add_argument("--k", type = int, default = 10)
+    args = parser.parse_args()
+
+    indexes_dir = Path(args.indexes)
+    dense_backend = load_backend_config(indexes_dir / "dense_backend.json")
+
+    master = faiss.read_index(str(indexes_dir / "dense_index.faiss"))
+    vecs, ids = master_vectors(master)
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(ids), size = args.queries)
+    query_vecs = vecs[picked]
+
+    with ChunkStore(indexes_dir / "chunk_store") as store:
+        text_pos = store.fields.index("text")
+        queries_toks = [tokenize_code(store.field(int(ids[i]), text_pos)) for i in picked]
+
+    def run(dense_fn, bm25_fn):
+        started = time.perf_counter()
+        for start in range(0, args.queries, args.batch):
+            dense_fn(query_vecs[start:start + args.batch], args.k)
+            bm25_fn(queries_toks[start:start + args.batch], args.k)
+        return args.queries / (time.perf_counter() - started)
+
+    bm25 = BM25Index.load(indexes_dir / "bm25")
+    print(f"1 process: {run(master.search, bm25.top_k_batch):.0f} queries/s")
+
+    for num_shards in args.num_shards:
+        shards_dir = indexes_dir / f"shards_bench_{num_shards}"
+        build_shards(indexes_dir, {"num_shards": num_shards, "by": args.by}, dense_backend, shards_dir = shards_dir)
+        retriever = ShardedRetriever(shards_dir, dense_backend)
+        try:
+            print(f"{num_shards} shards: {run(retriever.dense_search, retriever.bm25_top_k_batch):.0f} queries/s")
+        finally:
+            retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# versioned, immutable index snapshots.
+# 02_indexing updates the indexes in indexes/ in place (appends to the chunk store, rewrites .npy arrays), so a
+# detector reading them meanwhile could see half of an update. readers use snapshots instead:
+# - publish_snapshot copies the finished indexes to indexes/snapshots/v<version>/ with a manifest (snapshot.json:
+#   version, size and sha256 of every file), then points indexes/snapshots/CURRENT at it with an atomic rename.
+#   files that didn't change since the last snapshot are hard links to it, snapshots are never written again.
+# - LiveIndexes holds the loaded snapshot. queries pin the one that's current when they start and use it until
+#   they're done, swap() switches new queries to another one, the old one is closed once its last query finished.
+# - SnapshotWatcher polls CURRENT in a background thread, loads a new snapshot next to the one in use and swaps it in.
+
+SNAPSHOT_FILE = "snapshot.json"
+CURRENT_FILE = "CURRENT"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_files(root, entries):
+    # relative paths of every file under the given files / directories of root
+    root = Path(root)
+    files = []
+    for entry in entries:
+        path = root / entry
+        if path.is_dir():
+            files += sorted(p.relative_to(root).as_posix() for p in path.rglob("*") if p.is_file())
+        elif path.exists():
+            files.append(Path(entry).as_posix())
+        else:
+            raise FileNotFoundError(f"{path} not found, nothing to snapshot")
+    return files
+
+
+def fsync_path(path):
+    # directories can't be opened for fsync everywhere (Windows), then the rename alone has to do
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def current_snapshot(snapshots_dir):
+    # directory of the published snapshot, None if nothing was published yet
+    pointer = Path(snapshots_dir) / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    return Path(snapshots_dir) / pointer.read_text(encoding = "utf-8").strip()
+
+
+def read_snapshot(snapshot_dir):
+    with open(Path(snapshot_dir) / SNAPSHOT_FILE, "r", encoding = "utf-8") as f:
+        return json.load(f)
+
+
+def verify_snapshot(snapshot_dir):
+    # raises ValueError when a file is missing or its size / checksum differs from the manifest
+    snapshot_dir = Path(snapshot_dir)
+    manifest = read_snapshot(snapshot_dir)
+    for name, info in manifest["files"].items():
+        path = snapshot_dir / name
+        if not path.exists():
+            raise ValueError(f"snapshot {snapshot_dir.name}: {name} is missing")
+        if path.stat().st_size != info["bytes"] or file_sha256(path) != info["sha256"]:
+            raise ValueError(f"snapshot {snapshot_dir.name}: {name} doesn't match its checksum")
+    return manifest
+
+
+def publish_snapshot(indexes_dir, entries, snapshots_dir = None, keep = 3):
+    # snapshots the given files / directories of indexes_dir and makes it the current snapshot.
+    # nothing is published when they are the same as the current snapshot. returns the current snapshot's directory
+    indexes_dir = Path(indexes_dir)
+    snapshots_dir = Path(snapshots_dir) if snapshots_dir else indexes_dir / "snapshots"
+    snapshots_dir.mkdir(parents = True, exist_ok = True)
+
+    files = {}
+    for name in snapshot_files(indexes_dir, entries):
+        path = indexes_dir / name
+        files[name] = {"bytes": path.stat().st_size, "sha256": file_sha256(path)}
+
+    previous_dir = current_snapshot(snapshots_dir)
+    previous = read_snapshot(previous_dir) if previous_dir else None
+    if previous and previous["files"] == files:
+        return previous_dir
+
+    versions = [int(p.name[1:]) for p in snapshots_dir.glob("v*") if p.name[1:].isdigit()]
+    version = max(versions, default = 0) + 1
+    target = snapshots_dir / f"v{version:06d}"
+    tmp = snapshots_dir / f".tmp-v{version:06d}"
+    shutil.rmtree(tmp, ignore_errors = True)
+
+    for name, info in files.items():
+        dst = tmp / name
+        dst.parent.mkdir(parents = True, exist_ok = True)
+        if previous and previous["files"].get(name) == info:
+            try:
+                os.link(previous_dir / name, dst)
+                continue
+            except OSError:
+                pass # no hard links on this file system
+        shutil.copyfile(indexes_dir / name, dst)
+        fsync_path(dst)
+
+    with open(tmp / SNAPSHOT_FILE, "w", encoding = "utf-8") as f:
+        json.dump({"version": version, "created_at": time.time(), "files": files}, f, indent = 2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.rename(tmp, target)
+
+    pointer_tmp = snapshots_dir / f".{CURRENT_FILE}.tmp"
+    with open(pointer_tmp, "w", encoding = "utf-8") as f:
+        f.write(target.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, snapshots_dir / CURRENT_FILE)
+    fsync_path(snapshots_dir)
+
+    prune_snapshots(snapshots_dir, keep = keep)
+    return target
+
+
+def prune_snapshots(snapshots_dir, keep = 3):
+    # removes all but the newest keep snapshots. a process still using a removed one keeps its open / mapped files
+    # on POSIX, where they can't be removed yet (Windows) they're left for the next prune
+    current = current_snapshot(snapshots_dir)
+    published = sorted((p for p in Path(snapshots_dir).glob("v*") if p.name[1:].isdigit()), key = lambda p: int(p.name[1:]))
+    for path in published[:-keep] if keep > 0 else published:
+        if current is None or path.name != current.name:
+            shutil.rmtree(path, ignore_errors = True)
+
+
+class LiveIndexes:
+    # the loaded snapshot in use. state: any object with close(), e.g. the CorpusIndexes of 03_interactive
+    def __init__(self, state, version = None):
+        self.version = version
+        self.swaps = 0
+        self._state = state
+        self._pins = {} # id(state) -> queries using it
+        self._retired = {} # id(state) -> state, swapped out but still pinned
+        self._lock = threading.Lock()
+        self._pinned = contextvars.ContextVar(f"pinned_indexes_{id(self)}", default = None)
+
+    def get(self):
+        # the state pinned by the running query (also in threads started with submit_in_context), else the current one
+        pinned = self._pinned.get()
+        return pinned if pinned is not None else self._state
+
+    @contextmanager
+    def pin(self):
+        if self._pinned.get() is not None: # nested call of the same query
+            yield self._pinned.get()
+            return
+
+        with self._lock:
+            state = self._state
+            self._pins[id(state)] = self._pins.get(id(state), 0) + 1
+        token = self._pinned.set(state)
+
+        try:
+            yield state
+        finally:
+            self._pinned.reset(token)
+            with self._lock:
+                self._pins[id(state)] -= 1
+                done = self._pins[id(state)] == 0
+                if done:
+                    del self._pins[id(state)]
+                retired = self._retired.pop(id(state), None) if done else None
+            if retired is not None:
+                retired.close()
+
+    def pinned(self, fn):
+        # decorator: the whole call (and what it submits to other threads in context) sees one snapshot
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.pin():
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def swap(self, state, version = None):
+        # new queries use state from now on, the old state is closed when no query uses it anymore
+        with self._lock:
+            old = self._state
+            self._state = state
+            self.version = version
+            self.swaps += 1
+            in_use = self._pins.get(id(old), 0) > 0
+            if in_use:
+                self._retired[id(old)] = old
+
+        if not in_use:
+            old.close()
+
+
+class SnapshotWatcher:
+    # polls CURRENT every poll_s seconds. a new snapshot is verified and loaded with load_fn(snapshot dir, manifest)
+    # in this thread while queries keep using the old one, then swapped in. a snapshot that fails to load is skipped
+    # (last_error says why) and the old one stays in use.
+    def __init__(self, snapshots_dir, live, load_fn, poll_s = 2.0, verify = True):
+        self.snapshots_dir = Path(snapshots_dir)
+        self.live = live
+        self.load_fn = load_fn
+        self.poll_s = poll_s
+        self.verify = verify
+        self.last_error = None
+        self.last_load_s = None
+
+        current = current_snapshot(self.snapshots_dir)
+        self._seen = current.name if current else None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = "snapshot-watcher", daemon = True)
+        self._thread.start()
+
+    def check(self):
+        # loads and swaps in the current snapshot if it's new, returns True when it did
+        current = current_snapshot(self.snapshots_dir)
+        if current is None or current.name == self._seen:
+            return False
+        self._seen = current.name
+
+        started = time.perf_counter()
+        try:
+            manifest = verify_snapshot(current) if self.verify else read_snapshot(current)
+            state = self.load_fn(current, manifest)
+        except Exception as e:
+            self.last_error = f"{current.name}: {type(e).__name__}: {e}"
+            return False
+
+        self.live.swap(state, version = manifest["version"])
+        self.last_load_s = time.perf_counter() - started
+        self.last_error = None
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_s):
+            self.check()
+
+    def status(self):
+        return {
+            "version": self.live.version,
+            "swaps": self.live.swaps,
+            "last_load_s": self.last_load_s,
+            "last_error": self.last_error
+        }
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout = self.poll_s + 1)
@@ -0,0 +1,72 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# per-stage latency spans.
+# `with trace() as t:` collects every `with span("stage"):` that runs inside it, in this thread and in threads started
+# with a copy of its context (asyncio.to_thread, or submit_in_context for executors). time of repeated stages adds up,
+# stages that ran concurrently (dense and BM25 retrieval) overlap, so their sum can be more than the wall time.
+# outside of a trace spans cost one context variable lookup.
+
+_current_trace = contextvars.ContextVar("plagiarism_trace", default = None)
+
+
+class Trace:
+    def __init__(self):
+        self.stages = {} # stage -> total ms
+        self.usage = {} # e.g. prompt_tokens, completion_tokens
+        self._lock = threading.Lock()
+
+    def add(self, stage, ms):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def add_usage(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self.usage[name] = self.usage.get(name, 0) + (count or 0)
+
+
+@contextmanager
+def trace():
+    t = Trace()
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage):
+    t = _current_trace.get()
+    if t is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(stage, (time.perf_counter() - started) * 1000)
+
+
+def add_usage(**counts):
+    t = _current_trace.get()
+    if t is not None:
+        t.add_usage(**counts)
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    # executor.submit, but fn runs with a copy of the caller's context, so its spans land in the caller's trace
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def percentiles(values, qs = (50, 95, 99)):
+    values = np.asarray([v for v in values if v is not None], dtype = np.float64)
+    if not len(values):
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": float(np.percentile(values, q)) for q in qs}
@@ -0,0 +1,135 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from plagiarism.dense_backends import SEARCH_PARAMS, build_dense_index, master_vectors, set_search_params
+from plagiarism.encoders import load_encoder
+
+# sweeps dense backend parameters against the exact flat index and picks the fastest config that meets a recall target.
+# run from the notebook folder after 02_indexing:
+#   python -m plagiarism.tune_dense --k 10 --target-recall 0.95
+# writes every measured config to indexes/dense_tuning.json and the chosen one to indexes/dense_backend.json,
+# which 02_indexing picks up on its next run.
+
+DEFAULT_GRID = [
+    {"type": "flat"},
+    *[{"type": "hnsw", "M": m, "efConstruction": 80, "efSearch": ef} for m in [16, 32] for ef in [16, 32, 64, 128]],
+    *[{"type": "ivf_flat", "nlist": None, "nprobe": p} for p in [1, 2, 4, 8, 16]],
+    *[{"type": "ivf_pq", "nlist": None, "m": None, "nbits": 8, "nprobe": p} for p in [1, 4, 16]],
+]
+
+
+def build_key(config):
+    # configs that only differ in search params share one built index
+    search_params = SEARCH_PARAMS.get(config["type"], [])
+    return json.dumps({k: v for k, v in config.items() if k not in search_params}, sort_keys = True)
+
+
+def recall_at_k(found_ids, true_ids):
+    hits = 0
+    total = 0
+    for found, truth in zip(found_ids, true_ids):
+        truth = set(int(i) for i in truth if i != -1)
+        hits += len(truth & set(int(i) for i in found if i != -1))
+        total += len(truth)
+    return hits / total if total else 1.0
+
+
+def measure(index, queries, k):
+    # one query at a time, the way the detectors search
+    latencies = []
+    found = []
+    for q in queries:
+        started = time.perf_counter()
+        _, ids = index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found.append(ids[0])
+
+    return found, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def sweep(vecs, ids, queries, k = 10, grid = DEFAULT_GRID):
+    exact = build_dense_index({"type": "flat"}, vecs, ids)
+    _, true_ids = exact.search(queries, k)
+
+    built = {}
+    results = []
+
+    for config in grid:
+        key = build_key(config)
+        if key not in built:
+            started = time.perf_counter()
+            built[key] = (build_dense_index(config, vecs, ids), time.perf_counter() - started)
+
+        index, build_seconds = built[key]
+        set_search_params(index, config)
+
+        found, p50, p95 = measure(index, queries, k)
+        results.append({
+            "config": config,
+            "recall": recall_at_k(found, true_ids),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "build_s": build_seconds
+        })
+
+    return results
+
+
+def choose_best(results, target_recall):
+    # fastest p50 (then p95) among configs that reach the target, flat always reaches it
+    passing = [r for r in results if r["recall"] >= target_recall]
+    if not passing:
+        return None
+    return min(passing, key = lambda r: (r["p50_ms"], r["p95_ms"]))
+
+
+def load_queries(dataset_path, encode_fn):
+    with open(dataset_path, "r", encoding = "utf-8") as f:
+        dataset = json.load(f)
+
+    return np.asarray(encode_fn([item["query_code"] for item in dataset]), dtype = np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "tune the dense backend of the plagiarism index")
+    parser.add_argument("--indexes", default = "indexes")
+    parser.add_argument("--dataset", default = "data/test_dataset.json")
+    parser.add_argument("--k", type = int, default = 10)
+    parser.add_argument("--target-recall", type = float, default = 0.95)
+    args = parser.parse_args()
+
+    indexes_dir = Path(args.indexes)
+    with open(indexes_dir / "meta.json", "r", encoding = "utf-8") as f:
+        meta = json.load(f)
+
+    # queries encoded the way the corpus was
+    encode_fn = load_encoder(meta.get("encoder"), meta["embedding_model"])
+    queries = load_queries(args.dataset, encode_fn)
+    vecs, ids = master_vectors(faiss.read_index(str(indexes_dir / "dense_index.faiss")))
+
+    results = sweep(vecs, ids, queries, k = args.k)
+    best = choose_best(results, args.target_recall)
+
+    for r in sorted(results, key = lambda r: r["p50_ms"]):
+        print(f"{json.dumps(r['config']):90s} recall@{args.k} {r['recall']:.3f}  p50 {r['p50_ms']:.3f} ms  p95 {r['p95_ms']:.3f} ms")
+
+    with open(indexes_dir / "dense_tuning.json", "w", encoding = "utf-8") as f:
+        json.dump({"k": args.k, "target_recall": args.target_recall, "results": results, "best": best}, f, indent = 2)
+
+    if best is None:
+        print(f"no config reached recall {args.target_recall}")
+        return
+
+    with open(indexes_dir / "dense_backend.json", "w", encoding = "utf-8") as f:
+        json.dump(best["config"], f, indent = 2)
+
+    print(f"best: {best['config']} (recall {best['recall']:.3f}, p50 {best['p50_ms']:.3f} ms), saved to {indexes_dir / 'dense_backend.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# early verdicts from streamed structured LLM answers.
+# PlagiarismResult's first field is is_plagiarized, so a streamed answer contains the decision after a handful of
+# tokens, long before the reason and evidence list are written. VerdictScanner reads the JSON text as it arrives and
+# reports a top level boolean field as soon as its literal is complete, without parsing (or waiting for) the rest.
+# the scanner only tracks strings, escapes and nesting depth, the complete answer is still parsed and validated by
+# the OpenAI SDK when it's read to the end.
+
+
+class VerdictScanner:
+    def __init__(self, field):
+        self.field = field
+        self.value = None # True / False once the field's literal is complete
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = [] # characters of the string being read
+        self._last_string = None # last complete string, a key when ":" follows
+        self._literal = None # characters of the top level literal being read after the field's ":"
+        self._expect_value = False
+
+    def feed(self, text):
+        # text: the next piece of the answer, returns the field's value once known (None before)
+        if self.value is not None:
+            return self.value
+
+        for ch in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                else:
+                    self._string.append(ch)
+                continue
+
+            if self._literal is not None:
+                if ch.isalpha():
+                    self._literal.append(ch)
+                    literal = "".join(self._literal)
+                    if literal in ("true", "false"):
+                        self.value = literal == "true"
+                        return self.value
+                    continue
+                self._literal = None # e.g. null, not a boolean
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+                self._expect_value = False
+            elif ch in "{[":
+                self._depth += 1
+                self._expect_value = False
+            elif ch in "}]":
+                self._depth -= 1
+            elif ch == ":" and self._depth == 1:
+                self._expect_value = self._last_string == self.field
+            elif ch == ",":
+                self._last_string = None
+                self._expect_value = False
+            elif self._expect_value and not ch.isspace():
+                self._literal = [ch] if ch in "tf" else None
+                self._expect_value = False
+
+        return self.value
+
+
+class EarlyVerdict:
+    # stands in for the parsed answer while the rest of it is streamed: is_plagiarized is known, reason and evidence
+    # stay empty. rest: Future of the parsed answer (None when it isn't read, verdict only mode)
+    def __init__(self, is_plagiarized, rest = None):
+        self.is_plagiarized = is_plagiarized
+        self.reason = ""
+        self.evidence = None
+        self.rest = rest
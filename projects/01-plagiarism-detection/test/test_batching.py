@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from plagiarism.batching import Histogram, MicroBatcher
+from plagiarism.spans import span
+
+# ---------
+# helpers
+# ---------
+
+class RecordingFn:
+    # doubles every item, records the batches it gets, can be held until released
+    def __init__(self, hold = False):
+        self.batches = []
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self, items):
+        self.release.wait()
+        self.batches.append(list(items))
+        with span("work"):
+            return [item * 2 for item in items]
+
+def submit_together(batcher, items):
+    futures = [batcher.submit(item) for item in items]
+    return [f.result(timeout = 5) for f in futures]
+
+# ---------
+# tests
+# ---------
+
+def test_histogram_counts_and_percentiles():
+    # arrange
+    histogram = Histogram([1, 10, 100])
+
+    # act
+    for value in [0.5, 5, 5, 50, 500]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+
+    # assert
+    assert snapshot["buckets"] == {"<=1": 1, "<=10": 2, "<=100": 1, "+inf": 1}
+    assert snapshot["p50"] == 10
+    assert snapshot["p99"] == 500 # overflow bucket reports the max
+    assert snapshot["count"] == 5 and snapshot["mean"] == pytest.approx(112.1)
+
+
+def test_requests_within_wait_window_form_one_batch():
+    # arrange
+    fn = RecordingFn()
+    batcher = MicroBatcher(fn, max_batch_size = 64, max_wait_ms = 200)
+
+    # act
+    results = submit_together(batcher, [1, 2, 3])
+    batcher.close()
+
+    # assert
+    assert results == [2, 4, 6]
+    assert fn.batches == [[1, 2, 3]]
+    snapshot = batcher.metrics.snapshot()
+    assert snapshot["batch_size"]["count"] == 1 and snapshot["batch_size"]["mean"] == 3
+    assert snapshot["stages_ms"]["work"]["count"] == 1
+
+
+def test_batches_are_capped_and_backlog_is_taken_right_away():
+    # arrange - the first batch blocks while 5 more items queue up
+    fn = RecordingFn(hold = True)
+    batcher = MicroBatcher(fn, max_batch_size = 2, max_wait_ms = 0)
+    futures = [batcher.submit(0)]
+    time.sleep(0.05)
+    futures += [batcher.submit(i) for i in range(1, 6)]
+
+    # act
+    fn.release.set()
+    results = [f.result(timeout = 5) for f in futures]
+    batcher.close()
+
+    # assert
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert fn.batches == [[0], [1, 2], [3, 4], [5]]
+    assert max(batcher.metrics.snapshot()["queue_depth"]["buckets"].values()) >= 1
+
+
+def test_batch_errors_reach_every_request():
+    # arrange
+    def failing(items):
+        raise RuntimeError("index not loaded")
+
+    batcher = MicroBatcher(failing, max_wait_ms = 50)
+
+    # act
+    futures = [batcher.submit(i) for i in range(3)]
+
+    # assert
+    for future in futures:
+        with pytest.raises(RuntimeError, match = "index not loaded"):
+            future.result(timeout = 5)
+    assert batcher.metrics.snapshot()["errors"] == 1
+    batcher.close()
+
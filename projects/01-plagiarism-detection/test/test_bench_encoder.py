@@ -0,0 +1,32 @@
+import json
+
+from plagiarism.bench_encoder import load_texts
+from plagiarism.chunk_store import write_chunk_store
+
+# ---------
+# tests
+# ---------
+
+def test_sample_always_keeps_the_positives_source_chunks(tmp_path):
+    # arrange
+    chunks = [
+        {"id": f"chunk_{i:05d}", "repo": "got", "source_path": f"got\\file_{i}.go", "text": f"func f{i}() {{}}"}
+        for i in range(50)
+    ]
+    write_chunk_store(tmp_path / "chunk_store", chunks)
+    dataset = [
+        {"id": "pos_chunk_00007", "query_code": "a", "is_positive": True, "source_hint": "got\\file_7.go"},
+        {"id": "pos_chunk_00042", "query_code": "b", "is_positive": True, "source_hint": "got\\file_42.go"},
+        {"id": "neg_00001", "query_code": "c", "is_positive": False, "source_hint": None}
+    ]
+    with open(tmp_path / "dataset.json", "w", encoding = "utf-8") as f:
+        json.dump(dataset, f)
+
+    # act
+    queries, labels, sample = load_texts(tmp_path / "dataset.json", tmp_path, num_chunks = 5)
+
+    # assert
+    assert queries == ["a", "b", "c"]
+    assert labels == [True, True, False]
+    assert len(sample) == 5
+    assert "func f7() {}" in sample and "func f42() {}" in sample
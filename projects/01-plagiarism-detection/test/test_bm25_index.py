@@ -0,0 +1,128 @@
+import re
+
+import numpy as np
+import pytest
+
+from plagiarism.bm25_index import BM25Index, PostingsBuffer
+
+# ---------
+# helpers
+# ---------
+
+CORPUS = [
+    "func Sum(nums []int) int { s := 0; for _, x := range nums { s += x }; return s }",
+    "func Reverse(s string) string { r := []rune(s); return string(r) }",
+    "func (r *Raft) AppendEntries(args *AppendEntriesArgs, reply *AppendEntriesReply) { r.mu.Lock() }",
+    "func Max(nums []int) int { max := nums[0]; for _, v := range nums { if v > max { max = v } }; return max }",
+    "func main() { fmt.Println(Sum([]int{1, 2, 3})) }",
+]
+
+def tokenize_code(text):
+    return re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text)
+
+def corpus_tokens():
+    return [tokenize_code(text) for text in CORPUS]
+
+# ---------
+# tests
+# ---------
+
+def test_scores_match_bm25okapi():
+    rank_bm25 = pytest.importorskip("rank_bm25")
+
+    # arrange
+    reference = rank_bm25.BM25Okapi(corpus_tokens())
+    index = BM25Index.build(corpus_tokens())
+
+    # act / assert
+    for query in ["func Sum nums nums", "Raft reply Lock", "unknown_term", "int return"]:
+        toks = tokenize_code(query)
+        assert np.allclose(index.get_scores(toks), reference.get_scores(toks), atol = 1e-5)
+
+
+def test_top_k_is_sorted_and_only_returns_matches():
+    # arrange
+    index = BM25Index.build(corpus_tokens())
+    toks = tokenize_code("nums range max")
+
+    # act
+    idxs, scores = index.top_k(toks, 10)
+
+    # assert
+    full = index.get_scores(toks)
+    assert set(idxs) == set(np.flatnonzero(full > 0))
+    assert list(scores) == sorted(scores, reverse = True)
+    assert idxs[0] == 3
+
+
+def test_top_k_without_known_terms():
+    # arrange
+    index = BM25Index.build(corpus_tokens())
+
+    # act
+    idxs, scores = index.top_k(["does_not_exist"], 5)
+
+    # assert
+    assert len(idxs) == 0 and len(scores) == 0
+
+
+def test_top_k_ties_at_the_cut_go_to_lowest_chunk():
+    # arrange - identical chunks score the same
+    index = BM25Index.build([["term"]] * 30 + [["leader", "vote"]] * 1000)
+
+    # act
+    idxs, _ = index.top_k(["leader", "vote"], 3)
+
+    # assert
+    assert list(idxs) == [30, 31, 32]
+
+
+def test_top_k_with_mask_only_scores_allowed_chunks():
+    # arrange
+    index = BM25Index.build(corpus_tokens())
+    toks = tokenize_code("nums range max")
+    mask = np.array([True, True, True, False, True])
+
+    # act
+    idxs, scores = index.top_k(toks, 1, mask = mask)
+
+    # assert
+    assert list(idxs) == [0]
+    assert scores[0] == index.get_scores(toks)[0]
+
+
+def test_save_and_load(tmp_path):
+    # arrange
+    index = BM25Index.build(corpus_tokens())
+    toks = tokenize_code("func Reverse string")
+
+    # act
+    index.save(tmp_path / "bm25")
+    loaded = BM25Index.load(tmp_path / "bm25")
+
+    # assert
+    assert loaded.corpus_size == len(CORPUS)
+    assert np.array_equal(loaded.top_k(toks, 3)[0], index.top_k(toks, 3)[0])
+    assert not any(p.suffix == ".pkl" for p in (tmp_path / "bm25").iterdir())
+
+
+def test_merging_several_buffers_at_once_matches_one_at_a_time():
+    # arrange
+    toks = corpus_tokens()
+    buffers = [PostingsBuffer(), PostingsBuffer()]
+    for doc_id in range(2, len(toks)):
+        buffers[doc_id % 2].add(doc_id, toks[doc_id])
+    one_pass = BM25Index.build(toks[:2])
+    stepwise = BM25Index.build(toks[:2])
+    query = tokenize_code("func Max nums Reverse Println")
+
+    # act
+    one_pass.merge(*buffers, removed_docs = [1])
+    stepwise.merge(buffers[0], removed_docs = [1])
+    stepwise.merge(buffers[1])
+
+    # assert
+    assert list(one_pass.terms) == list(stepwise.terms)
+    assert np.array_equal(one_pass.indptr, stepwise.indptr)
+    assert np.array_equal(one_pass.doc_ids, stepwise.doc_ids)
+    assert np.allclose(one_pass.get_scores(query), stepwise.get_scores(query))
@@ -0,0 +1,79 @@
+import numpy as np
+
+from plagiarism.candidate_memo import CandidateMemo
+
+# ---------
+# helpers
+# ---------
+
+class CountingSearch:
+    # fake search: ids 0..k-1 shifted by the query length, scores descending
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, queries, k):
+        self.calls.append((list(queries), k))
+        return [(np.arange(k) + len(q), np.linspace(1.0, 0.0, k)) for q in queries]
+
+# ---------
+# tests
+# ---------
+
+def test_smaller_k_is_a_prefix_of_stored_candidates():
+    # arrange
+    memo = CandidateMemo()
+    search = CountingSearch()
+
+    # act
+    full = memo.lookup("dense", ["func a", "func bb"], 10, search)
+    small = memo.lookup("dense", ["func bb", "func a"], 3, search)
+
+    # assert
+    assert search.calls == [(["func a", "func bb"], 10)]
+    assert np.array_equal(small[0][0], full[1][0][:3])
+    assert np.array_equal(small[1][1], full[0][1][:3])
+    assert memo.stats()["hits"] == 2
+
+
+def test_larger_k_is_searched_again():
+    # arrange
+    memo = CandidateMemo()
+    search = CountingSearch()
+
+    # act
+    memo.lookup("bm25", ["q"], 5, search)
+    memo.lookup("bm25", ["q"], 20, search)
+    memo.lookup("bm25", ["q"], 10, search)
+
+    # assert
+    assert search.calls == [(["q"], 5), (["q"], 20)]
+
+
+def test_kind_and_scope_are_separate():
+    # arrange
+    memo = CandidateMemo()
+    search = CountingSearch()
+
+    # act
+    memo.lookup("dense", ["q"], 5, search)
+    memo.lookup("bm25", ["q"], 5, search)
+    memo.lookup("dense", ["q"], 5, search, scope_key = "raft-go")
+
+    # assert
+    assert len(search.calls) == 3
+
+
+def test_least_recently_used_queries_are_dropped():
+    # arrange
+    memo = CandidateMemo(max_entries = 2)
+    search = CountingSearch()
+
+    # act
+    memo.lookup("dense", ["a", "b"], 5, search)
+    memo.lookup("dense", ["a"], 5, search) # "a" is used again, "b" is the oldest
+    memo.lookup("dense", ["c"], 5, search)
+    memo.lookup("dense", ["a", "b"], 5, search)
+
+    # assert
+    assert search.calls == [(["a", "b"], 5), (["c"], 5), (["b"], 5)]
+    assert memo.stats()["size"] == 2
@@ -0,0 +1,76 @@
+from plagiarism.cascade import (
+    DEFAULT_THRESHOLDS,
+    cascade_decision,
+    cascade_score,
+    escalated_fraction,
+    fit_thresholds,
+    load_thresholds,
+    save_thresholds,
+    token_overlap,
+)
+
+# ---------
+# tests
+# ---------
+
+def test_thresholds_leave_mixed_band_to_llm():
+    # arrange
+    scores = [0.95, 0.9, 0.8, 0.7, 0.6, 0.5, 0.3, 0.2]
+    labels = [True, True, True, False, True, False, False, False]
+
+    # act
+    thresholds = fit_thresholds(scores, labels)
+    decisions = [cascade_decision(s, thresholds) for s in scores]
+
+    # assert
+    assert thresholds["accept_min"] == 0.8
+    assert thresholds["reject_max"] == 0.5
+    assert decisions == ["accept"] * 3 + ["escalate"] * 2 + ["reject"] * 3
+    assert escalated_fraction(decisions) == 0.25
+
+
+def test_tied_scores_are_not_split():
+    # arrange
+    scores = [0.9, 0.8, 0.8, 0.1]
+    labels = [True, True, False, False]
+
+    # act
+    thresholds = fit_thresholds(scores, labels)
+
+    # assert
+    assert thresholds["accept_min"] == 0.9
+    assert cascade_decision(0.8, thresholds) == "escalate"
+
+
+def test_margin_widens_llm_band():
+    # arrange
+    scores = [0.9, 0.2]
+    labels = [True, False]
+
+    # act
+    thresholds = fit_thresholds(scores, labels, margin = 0.05)
+
+    # assert
+    assert cascade_decision(0.9, thresholds) == "escalate"
+    assert cascade_decision(0.96, thresholds) == "accept"
+    assert cascade_decision(0.1, thresholds) == "reject"
+
+
+def test_default_thresholds_escalate_everything(tmp_path):
+    # act
+    missing = load_thresholds(tmp_path / "missing.json")
+    save_thresholds(tmp_path / "t.json", fit_thresholds([0.9], [True]))
+
+    # assert
+    assert missing == DEFAULT_THRESHOLDS
+    assert cascade_decision(1.0, missing) == "escalate"
+    assert cascade_decision(None, {"accept_min": 0.9, "reject_max": 0.1}) == "escalate"
+    assert load_thresholds(tmp_path / "t.json")["accept_min"] == 0.9
+
+
+def test_score_parts():
+    # assert
+    assert token_overlap(["a", "b", "b", "c"], ["b", "c", "d"]) == 2 / 3
+    assert token_overlap([], ["a"]) == 0.0
+    assert abs(cascade_score(0.8, 0.4, 0.5) - 0.6) < 1e-9
+    assert cascade_score(None, 0.4, 0.5) == 0.4
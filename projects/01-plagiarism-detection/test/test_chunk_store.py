@@ -0,0 +1,81 @@
+import pytest
+
+from plagiarism.chunk_store import BLOB_FILE, ChunkStore, ChunkStoreWriter, write_chunk_store
+
+# ---------
+# helpers
+# ---------
+
+def make_chunks(n):
+    return [
+        {
+            "id": f"chunk_{i:05d}",
+            "repo": f"repo-{i % 2}",
+            "source_path": f"repo-{i % 2}/file_{i}.go",
+            "text": f"func F{i}() {{\n    return \"ünïcode {i}\"\n}}",
+        }
+        for i in range(1, n + 1)
+    ]
+
+# ---------
+# tests
+# ---------
+
+def test_round_trip(tmp_path):
+    # arrange
+    chunks = make_chunks(5)
+
+    # act
+    written = write_chunk_store(tmp_path / "store", chunks)
+    store = ChunkStore(tmp_path / "store")
+
+    # assert
+    assert written == 5
+    assert len(store) == 5
+    assert [store.get(i) for i in range(5)] == chunks
+    store.close()
+
+
+def test_columns_behave_like_lists(tmp_path):
+    # arrange
+    chunks = make_chunks(4)
+    write_chunk_store(tmp_path / "store", chunks)
+
+    # act
+    with ChunkStore(tmp_path / "store") as store:
+        texts = store.column("text")
+        paths = store.column("source_path")
+
+        # assert
+        assert texts[-1] == chunks[-1]["text"]
+        assert texts[:2] == [c["text"] for c in chunks[:2]]
+        assert list(paths) == [c["source_path"] for c in chunks]
+
+        with pytest.raises(IndexError):
+            texts[4]
+
+
+def test_empty_store(tmp_path):
+    # act
+    write_chunk_store(tmp_path / "store", [])
+
+    # assert
+    with ChunkStore(tmp_path / "store") as store:
+        assert len(store) == 0
+        assert list(store.column("text")) == []
+
+
+def test_append_drops_bytes_left_by_a_crashed_run(tmp_path):
+    # arrange
+    chunks = make_chunks(3)
+    write_chunk_store(tmp_path / "store", chunks[:2])
+    with open(tmp_path / "store" / BLOB_FILE, "ab") as blob:
+        blob.write("half a row, offsets never saved".encode("utf-8"))
+
+    # act
+    with ChunkStoreWriter(tmp_path / "store", append = True) as writer:
+        writer.add(chunks[2])
+
+    # assert
+    with ChunkStore(tmp_path / "store") as store:
+        assert [store.get(i) for i in range(3)] == chunks
@@ -0,0 +1,163 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from plagiarism.corpus_fetcher import CorpusFetcher, FetchCache, GitHubSource, MirrorSource, git_blob_sha, parse_github_url
+
+# ---------
+# helpers
+# ---------
+
+class FakeGitHub:
+    # local stand-in for the GitHub API and raw.githubusercontent.com, serves `files` of one repo on branch main
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake.requests.append(self.path)
+                path = self.path.split("?")[0]
+
+                if path == "/api/repos/me/code":
+                    self.reply(json.dumps({"default_branch": "main"}).encode())
+                elif path == "/api/repos/me/code/git/trees/main":
+                    tree = [{"path": p, "type": "blob", "sha": git_blob_sha(d)} for p, d in fake.files.items()]
+                    body = json.dumps({"tree": tree}).encode()
+                    etag = '"' + git_blob_sha(body) + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                    else:
+                        self.reply(body, etag)
+                elif path.startswith("/raw/me/code/main/") and path[len("/raw/me/code/main/"):] in fake.files:
+                    self.reply(fake.files[path[len("/raw/me/code/main/"):]])
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+
+            def reply(self, body, etag = None):
+                self.send_response(200)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+
+    def raw_requests(self):
+        return [r for r in self.requests if r.startswith("/raw/")]
+
+@pytest.fixture
+def github():
+    fake = FakeGitHub({
+        "a.go": b"package a\nfunc A() {}\n",
+        "b/b.go": b"package b\nfunc B() {}\n",
+        "README.md": b"# code\n"
+    })
+    yield fake
+    fake.server.shutdown()
+
+def make_fetcher(github, cache_dir):
+    cache = FetchCache(cache_dir)
+    source = GitHubSource(cache, api_base = github.base + "/api", raw_base = github.base + "/raw")
+    return CorpusFetcher(source, cache, max_workers = 4)
+
+# ---------
+# tests
+# ---------
+
+def test_parse_github_url():
+    # assert
+    assert parse_github_url("https://github.com/travisjeffery/proglog") == ("travisjeffery", "proglog")
+
+def test_git_blob_sha_matches_git():
+    # assert - `git hash-object` of an empty file
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+def test_rerun_only_downloads_changed_files(github, tmp_path):
+    # arrange
+    out_dir = tmp_path / "corpus"
+
+    # act
+    first = make_fetcher(github, tmp_path / "cache").fetch([("me", "code")], out_dir)["code"]
+    first_raw = len(github.raw_requests())
+
+    github.files["a.go"] = b"package a\nfunc A() { return }\n"
+    second = make_fetcher(github, tmp_path / "cache").fetch([("me", "code")], out_dir)["code"]
+    third = make_fetcher(github, tmp_path / "cache").fetch([("me", "code")], out_dir)["code"]
+
+    # assert
+    assert first == {"files": 2, "cached": 0, "downloaded": 2, "skipped": 0, "written": 2}
+    assert (out_dir / "code" / "b" / "b.go").read_bytes() == b"package b\nfunc B() {}\n"
+    assert not (out_dir / "code" / "README.md").exists()
+
+    assert second == {"files": 2, "cached": 1, "downloaded": 1, "skipped": 0, "written": 1}
+    assert github.raw_requests()[first_raw:] == ["/raw/me/code/main/a.go"]
+    assert (out_dir / "code" / "a.go").read_bytes() == b"package a\nfunc A() { return }\n"
+
+    assert third == {"files": 2, "cached": 2, "downloaded": 0, "skipped": 0, "written": 0}
+
+def test_max_files_tries_next_file_when_one_fails(github, tmp_path):
+    # arrange
+    cache = FetchCache(tmp_path / "cache")
+    source = GitHubSource(cache, api_base = github.base + "/api", raw_base = github.base + "/raw")
+    fetcher = CorpusFetcher(source, cache)
+    github.files["a.go"] = b""
+
+    # act
+    stats = fetcher.fetch([("me", "code")], tmp_path / "corpus", max_files_per_repo = 1)["code"]
+
+    # assert
+    assert stats["files"] == 1
+    assert stats["skipped"] == 1
+    assert (tmp_path / "corpus" / "code" / "b" / "b.go").exists()
+
+def test_mirror_source_reads_local_checkouts(tmp_path):
+    # arrange
+    mirror = tmp_path / "mirror"
+    (mirror / "me" / "code" / ".git").mkdir(parents = True)
+    (mirror / "me" / "code" / ".git" / "x.go").write_text("not code")
+    (mirror / "me" / "code" / "main.go").write_text("package main\n")
+    (mirror / "other").mkdir()
+    (mirror / "other" / "lib.go").write_text("package lib\n")
+
+    cache = FetchCache(tmp_path / "cache")
+    fetcher = CorpusFetcher(MirrorSource(mirror), cache)
+
+    # act
+    stats = fetcher.fetch([("me", "code"), ("someone", "other")], tmp_path / "corpus")
+
+    # assert
+    assert stats["code"]["files"] == 1
+    assert stats["other"]["files"] == 1
+    assert (tmp_path / "corpus" / "code" / "main.go").read_text() == "package main\n"
+    assert (tmp_path / "corpus" / "other" / "lib.go").exists()
+
+
+def test_mirror_source_only_hashes_files_with_the_suffix(tmp_path, monkeypatch):
+    # arrange
+    repo_dir = tmp_path / "mirror" / "code"
+    repo_dir.mkdir(parents = True)
+    (repo_dir / "main.go").write_text("package main\n")
+    (repo_dir / "data.bin").write_bytes(b"\0" * 1024)
+    read = []
+    read_bytes = type(repo_dir).read_bytes
+    monkeypatch.setattr(type(repo_dir), "read_bytes", lambda path: read.append(path.name) or read_bytes(path))
+
+    # act
+    _, files = MirrorSource(tmp_path / "mirror").list_files("me", "code", suffix = ".go")
+
+    # assert
+    assert [path for path, _ in files] == ["main.go"]
+    assert read == ["main.go"]
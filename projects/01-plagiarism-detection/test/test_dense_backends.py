@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from plagiarism.dense_backends import DENSE_BACKENDS, build_dense_index, build_search_index, filtered_search_params, master_vectors
+from plagiarism.tune_dense import choose_best, sweep
+
+# ---------
+# helpers
+# ---------
+
+def random_vectors(n = 600, dim = 32, seed = 0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = np.arange(100, 100 + n, dtype = np.int64) # ids are chunk rows, not positions
+    return vecs, ids
+
+# ---------
+# tests
+# ---------
+
+@pytest.mark.parametrize("backend", DENSE_BACKENDS)
+def test_every_backend_returns_chunk_rows(backend):
+    # arrange
+    vecs, ids = random_vectors()
+
+    # act
+    index = build_dense_index({"type": backend, "nprobe": 64, "efSearch": 64}, vecs, ids)
+    _, found = index.search(vecs[:5], 1)
+
+    # assert
+    assert set(found[:, 0]) <= set(ids)
+    if backend != "ivf_pq": # pq distances are approximate
+        assert list(found[:, 0]) == list(ids[:5])
+
+
+@pytest.mark.parametrize("backend", ["flat", "hnsw", "ivf_flat"])
+def test_filtered_search_only_returns_selected_rows(backend):
+    # arrange
+    vecs, ids = random_vectors()
+    config = {"type": backend, "nprobe": 64, "efSearch": 256}
+    index = build_dense_index(config, vecs, ids)
+    allowed = ids[::3]
+
+    # act
+    _, found = index.search(vecs[:5], 5, params = filtered_search_params(config, allowed))
+
+    # assert
+    found = found[found != -1]
+    assert len(found) > 0 and set(found) <= set(allowed)
+
+
+def test_search_index_is_built_from_master(tmp_path):
+    # arrange
+    vecs, ids = random_vectors()
+    master = build_dense_index({"type": "flat"}, vecs, ids)
+    faiss.write_index(master, str(tmp_path / "dense_index.faiss"))
+
+    # act
+    file_name = build_search_index(tmp_path, {"type": "hnsw", "M": 16, "efSearch": 32})
+    rebuilt_vecs, rebuilt_ids = master_vectors(faiss.read_index(str(tmp_path / "dense_index.faiss")))
+
+    # assert
+    assert file_name == "dense_index_hnsw.faiss"
+    assert faiss.read_index(str(tmp_path / file_name)).ntotal == len(ids)
+    assert np.array_equal(rebuilt_ids, ids) and np.allclose(rebuilt_vecs, vecs)
+    assert build_search_index(tmp_path, {"type": "flat"}) == "dense_index.faiss"
+
+
+def test_tuning_picks_fastest_config_meeting_target():
+    # arrange
+    vecs, ids = random_vectors()
+    grid = [{"type": "flat"}, {"type": "hnsw", "M": 16, "efSearch": 128}, {"type": "ivf_flat", "nprobe": 1}]
+
+    # act
+    results = sweep(vecs, ids, vecs[:20], k = 5, grid = grid)
+    best = choose_best(results, target_recall = 0.99)
+
+    # assert
+    assert results[0]["recall"] == 1.0
+    assert best["recall"] >= 0.99
+    assert all(r["p50_ms"] >= best["p50_ms"] for r in results if r["recall"] >= 0.99)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+import plagiarism.encoders
+from plagiarism.dense_backends import DEFAULT_BACKEND, build_search_index
+from plagiarism.indexer import IncrementalIndexer
+from plagiarism.metadata_index import ChunkFilter
+from plagiarism.service import DetectionService, load_notebook, verdict
+from plagiarism.snapshots import publish_snapshot
+
+NOTEBOOK_DIR = Path(__file__).resolve().parent.parent / "notebook"
+
+# ---------
+# helpers
+# ---------
+
+CORPUS = {
+    "raft-go/raft.go": (
+        "package raft\n\n"
+        "func (rf *Raft) RequestVote(args *RequestVoteArgs, reply *RequestVoteReply) {\n"
+        "    if args.Term < rf.currentTerm {\n        reply.VoteGranted = false\n        return\n    }\n"
+        "    rf.votedFor = args.CandidateId\n    reply.VoteGranted = true\n}\n\n"
+        "func (rf *Raft) AppendEntries(args *AppendEntriesArgs, reply *AppendEntriesReply) {\n"
+        "    rf.lastHeartbeat = time.Now()\n    reply.Success = args.PrevLogIndex < len(rf.log)\n}\n"
+    ),
+    "interpreter-go/lexer.go": (
+        "package lexer\n\n"
+        "func (l *Lexer) NextToken() token.Token {\n    l.skipWhitespace()\n    tok := newToken(l.ch)\n    l.readChar()\n    return tok\n}\n\n"
+        "func (l *Lexer) readIdentifier() string {\n    position := l.position\n    for isLetter(l.ch) {\n        l.readChar()\n    }\n"
+        "    return l.input[position:l.position]\n}\n"
+    ),
+    "proglog/log.go": (
+        "package log\n\n"
+        "func (l *Log) Append(record *api.Record) (uint64, error) {\n    l.mu.Lock()\n    defer l.mu.Unlock()\n"
+        "    off, err := l.activeSegment.Append(record)\n    return off, err\n}\n\n"
+        "func (l *Log) Read(off uint64) (*api.Record, error) {\n    l.mu.RLock()\n    defer l.mu.RUnlock()\n"
+        "    return l.segments[0].Read(off)\n}\n"
+    ),
+}
+
+QUERIES = [
+    "func (r *Node) RequestVote(args *VoteArgs, reply *VoteReply) {\n    if args.Term < r.term {\n        reply.VoteGranted = false\n        return\n    }\n}",
+    "func (l *Lexer) readIdentifier() string {\n    position := l.position\n    for isLetter(l.ch) {\n        l.readChar()\n    }\n    return l.input[position:l.position]\n}",
+    "func (s *Store) Append(record *Record) (uint64, error) {\n    s.mu.Lock()\n    defer s.mu.Unlock()\n    return s.segment.Append(record)\n}",
+    "func Sum(xs []int) int {\n    total := 0\n    for _, x := range xs {\n        total += x\n    }\n    return total\n}",
+]
+
+
+class FakeEncoder:
+    # hashed bag of identifiers, code sharing names gets close vectors
+    def __call__(self, texts):
+        vecs = np.zeros((len(texts), 64), dtype = np.float32)
+        for row, text in enumerate(texts):
+            for tok in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text):
+                vecs[row, zlib.crc32(tok.encode("utf-8")) % 64] += 1.0
+        return vecs / np.maximum(np.linalg.norm(vecs, axis = 1, keepdims = True), 1e-9)
+
+
+class FakeLLM:
+    # verdict and reason depend only on the prompt, so equal prompts give equal results
+    def __init__(self, result_type):
+        self.result_type = result_type
+
+    def __call__(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return self.result_type(is_plagiarized = "VoteGranted" in prompt, reason = digest, evidence = [digest])
+
+
+class FakeReranker:
+    def __call__(self, pairs):
+        return np.array([len(set(q.split()) & set(c.split())) / max(len(set(q.split())), 1) for q, c in pairs], dtype = np.float32)
+
+
+def build_snapshot(base_dir):
+    # what 02_indexing does: index the corpus, build the search index, write meta.json and publish a snapshot
+    ref_dir = base_dir / "data" / "reference_corpus"
+    indexes_dir = base_dir / "indexes"
+    for path, text in CORPUS.items():
+        (ref_dir / path).parent.mkdir(parents = True, exist_ok = True)
+        (ref_dir / path).write_text(text, encoding = "utf-8")
+
+    indexer = IncrementalIndexer(indexes_dir, encode_fn = FakeEncoder(), embedding_model = "fake")
+    indexer.sync(ref_dir)
+    dense_index_file = build_search_index(indexes_dir, DEFAULT_BACKEND)
+
+    meta = {
+        "num_chunks": indexer.load_manifest()["num_live_chunks"],
+        "dense_index_path": dense_index_file,
+        "dense_backend": DEFAULT_BACKEND,
+        "chunk_store_path": "chunk_store",
+        "bm25_index_path": "bm25",
+        "fingerprint_index_path": "fingerprint",
+        "embedding_model": "fake",
+        "encoder": None,
+        "shards": None,
+    }
+    (indexes_dir / "meta.json").write_text(json.dumps(meta), encoding = "utf-8")
+    publish_snapshot(indexes_dir, ["meta.json", "chunk_store", "fingerprint", dense_index_file, "bm25"])
+
+
+@pytest.fixture(scope = "module")
+def notebook(tmp_path_factory):
+    # the detectors of 03_interactive on a small corpus, with a fake encoder, LLM and reranker
+    base_dir = tmp_path_factory.mktemp("notebook")
+    build_snapshot(base_dir)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(base_dir)
+        patch.delenv("OPENAI_API_KEY", raising = False)
+        patch.setattr(plagiarism.encoders, "load_encoder", lambda *args, **kwargs: FakeEncoder())
+        namespace = load_notebook(NOTEBOOK_DIR / "03_interactive.ipynb")
+
+    namespace["llm_call"] = FakeLLM(namespace["PlagiarismResult"])
+    namespace["reranker"] = FakeReranker()
+    namespace["reranker_config"] = {**namespace["reranker_config"], "threshold": 0.5}
+    namespace["cascade_thresholds"] = {"w_dense": 0.5, "accept_min": 0.9, "reject_max": 0.4}
+
+    yield namespace
+
+    namespace["live_indexes"].get().close()
+    namespace["retrievers"].close()
+
+def as_dict(result):
+    return {key: value for key, value in vars(result).items() if key != "pending"}
+
+# ---------
+# tests
+# ---------
+
+@pytest.mark.parametrize("method", ["embedding", "fingerprint", "rag", "hybrid_rag", "cascade", "rerank"])
+@pytest.mark.parametrize("scoped", [False, True])
+def test_batch_results_match_single_queries(notebook, method, scoped):
+    # arrange
+    detect_batch = notebook[f"detect_{method}_batch"]
+    detect = notebook[f"detect_{method}"]
+    scope = notebook["make_scope"](exclude_repos = ["proglog"]) if scoped else None
+
+    # act
+    batch = detect_batch(QUERIES, scope = scope)
+    single = [detect(query, scope = scope) for query in QUERIES]
+
+    # assert
+    assert [as_dict(r) for r in batch] == [as_dict(r) for r in single]
+    assert any(r.is_plagiarized for r in batch)
+
+
+def test_cascade_batch_mixes_decisions(notebook):
+    # act
+    results = notebook["detect_cascade_batch"](QUERIES)
+
+    # assert
+    assert {r.escalated for r in results} == {True, False}
+    assert notebook["detect_cascade_batch"]([]) == []
+
+
+def test_a_scope_of_another_snapshot_is_refused(notebook):
+    # arrange
+    scope = notebook["make_scope"](exclude_repos = ["proglog"])
+    stale = ChunkFilter(scope.rows, len(scope.mask), key = scope.key, version = "older")
+
+    # act / assert
+    with pytest.raises(ValueError, match = "make_scope"):
+        notebook["retrieve_bm25"](QUERIES[0], scope = stale)
+    with pytest.raises(ValueError, match = "make_scope"):
+        notebook["detect_fingerprint_batch"](QUERIES, scope = stale)
+    assert notebook["retrieve_bm25"](QUERIES[0], scope = scope)
+
+
+def test_service_verdicts_match_the_notebook_detectors(notebook):
+    # arrange
+    service = DetectionService(
+        notebook["service_methods"],
+        max_wait_ms = 1,
+        make_scope = notebook["make_scope"],
+        pin = notebook["live_indexes"].pin
+    )
+    scope = notebook["make_scope"](exclude_repos = ["proglog"])
+
+    # act
+    served = {
+        method: [service.detect(method, query, {"scope": {"exclude_repos": ["proglog"]}}) for query in QUERIES]
+        for method in notebook["scan_methods"]
+    }
+    service.close()
+
+    # assert
+    for method, detect_batch in notebook["scan_methods"].items():
+        assert served[method] == [verdict(r) for r in detect_batch(QUERIES, scope = scope)], method
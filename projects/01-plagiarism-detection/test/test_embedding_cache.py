@@ -0,0 +1,77 @@
+import numpy as np
+
+from plagiarism.embedding_cache import EmbeddingCache
+
+# ---------
+# helpers
+# ---------
+
+class CountingEncoder:
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[len(t), t.count("x")] for t in texts], dtype = np.float32)
+
+# ---------
+# tests
+# ---------
+
+def test_repeated_code_is_encoded_once():
+    # arrange
+    cache = EmbeddingCache("model-a")
+    encoder = CountingEncoder()
+
+    # act
+    first = cache.encode(["func a() {}", "func xx() {}"], encoder)
+    second = cache.encode(["func xx() {}\r\n", "func a() {}", "func a() {}"], encoder)
+
+    # assert
+    assert encoder.seen == ["func a() {}", "func xx() {}"]
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[1], first[0])
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 3
+
+
+def test_model_name_is_part_of_key():
+    # arrange
+    cache_a = EmbeddingCache("model-a")
+    cache_b = EmbeddingCache("model-b")
+
+    # assert
+    assert cache_a.key("func a() {}") != cache_b.key("func a() {}")
+
+
+def test_lru_eviction():
+    # arrange
+    cache = EmbeddingCache("model-a", max_entries = 2)
+    encoder = CountingEncoder()
+
+    # act
+    cache.encode(["a", "b"], encoder)
+    cache.encode(["a"], encoder) # a becomes most recently used
+    cache.encode(["c"], encoder) # evicts b
+    cache.encode(["a", "b"], encoder)
+
+    # assert
+    assert encoder.seen == ["a", "b", "c", "b"]
+
+
+def test_persisted_cache_is_reloaded(tmp_path):
+    # arrange
+    path = tmp_path / "cache.npz"
+    cache = EmbeddingCache("model-a", cache_path = path)
+    cache.encode(["func a() {}"], CountingEncoder())
+    cache.save()
+
+    # act
+    reloaded = EmbeddingCache("model-a", cache_path = path)
+    other_model = EmbeddingCache("model-b", cache_path = path)
+    encoder = CountingEncoder()
+    reloaded.encode(["func a() {}"], encoder)
+
+    # assert
+    assert encoder.seen == []
+    assert other_model.stats()["size"] == 0
@@ -0,0 +1,142 @@
+import numpy as np
+
+from plagiarism.encoders import DEFAULT_ENCODER, OnnxEncoder, WindowedEncoder, encoder_key, load_encoder_config, mean_pool
+
+# ---------
+# helpers
+# ---------
+
+class FakeEncoding:
+    def __init__(self, ids):
+        self.ids = ids
+
+
+class FakeTokenizer:
+    # one token per character
+    def encode_batch(self, texts, add_special_tokens = True):
+        return [FakeEncoding([ord(c) for c in t]) for t in texts]
+
+
+class FakeInput:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSession:
+    # token embedding = [token id, 1], records the padded shapes it gets
+    def __init__(self):
+        self.shapes = []
+
+    def get_inputs(self):
+        return [FakeInput("input_ids"), FakeInput("attention_mask")]
+
+    def run(self, output_names, inputs):
+        ids = inputs["input_ids"].astype(np.float32)
+        self.shapes.append(ids.shape)
+        return [np.stack([ids, np.ones_like(ids)], axis = 2)]
+
+
+class WordEncoder:
+    # one token per word, vector = [number of words, 1] normalized, records the batches it gets
+    max_length = 6
+
+    def __init__(self):
+        self.batches = []
+
+    def token_counts(self, texts):
+        return [len(t.split()) for t in texts]
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        vecs = np.array([[len(t.split()), 1.0] for t in texts], dtype = np.float32)
+        return vecs / np.linalg.norm(vecs, axis = 1, keepdims = True)
+
+# ---------
+# tests
+# ---------
+
+def test_mean_pool_ignores_padding_and_normalizes():
+    # arrange
+    tokens = np.array([[[3.0, 0.0], [1.0, 0.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    # act
+    pooled = mean_pool(tokens, mask)
+
+    # assert
+    assert np.allclose(pooled, [[1.0, 0.0]])
+
+
+def test_onnx_encoder_batches_by_length_and_keeps_order():
+    # arrange
+    session = FakeSession()
+    encoder = OnnxEncoder(session, FakeTokenizer(), batch_size = 2)
+    texts = ["aaaaaaaa", "b", "cc", "ddddddd"]
+
+    # act
+    vecs = encoder(texts)
+
+    # assert
+    assert session.shapes == [(2, 2), (2, 8)] # short texts aren't padded to the longest one
+    expected = mean_pool(np.array([[[ord("b"), 1.0]]]), np.array([[1]]))[0]
+    assert np.allclose(vecs[1], expected)
+    assert vecs.shape == (4, 2) and vecs.dtype == np.float32
+
+
+def test_encoder_config_and_key(tmp_path):
+    # act
+    config = load_encoder_config(tmp_path / "encoder.json")
+
+    # assert
+    assert config == DEFAULT_ENCODER
+    assert encoder_key("all-MiniLM-L6-v2", config) == "all-MiniLM-L6-v2+windows2"
+    assert encoder_key("all-MiniLM-L6-v2", {"type": "onnx_int8", "path": "x"}) == "all-MiniLM-L6-v2@onnx_int8+windows2"
+    assert encoder_key("all-MiniLM-L6-v2", {"split_long": False}) == "all-MiniLM-L6-v2" # vectors of the truncating encoder
+
+
+def test_windowed_encoder_splits_long_texts_on_lines_and_pools():
+    # arrange - 4 tokens fit next to [CLS] and [SEP]
+    base = WordEncoder()
+    encoder = WindowedEncoder(base, overlap_lines = 1, batch_size = 8)
+    long_text = "a b\nc d\ne f\ng"
+
+    # act
+    vecs = encoder(["x", long_text])
+
+    # assert
+    windows = sorted(w for batch in base.batches for w in batch)
+    assert windows == ["a b\nc d", "c d\ne f", "e f\ng", "x"]
+    expected = base(["a b c d", "c d e f", "e f g"]).mean(axis = 0)
+    assert np.allclose(vecs[1], expected / np.linalg.norm(expected))
+    assert np.allclose(vecs[0], base(["x"])[0])
+    assert encoder.stats["split"] == 1 and encoder.stats["windows"] == 4
+
+
+def test_windowed_encoder_buckets_by_length():
+    # arrange
+    texts = ["a b c d", "a", "a b c", "b"]
+    bucketed = WindowedEncoder(WordEncoder(), batch_size = 2)
+    unsorted = WindowedEncoder(WordEncoder(), batch_size = 2, bucket_by_length = False)
+
+    # act
+    a = bucketed(texts)
+    b = unsorted(texts)
+
+    # assert
+    assert bucketed.encoder.batches == [["a", "b"], ["a b c", "a b c d"]]
+    assert np.allclose(a, b) # same vectors, in input order
+    assert bucketed.stats["tokens"] == unsorted.stats["tokens"] == 17
+    assert bucketed.stats["padded_tokens"] == 18 < unsorted.stats["padded_tokens"] == 22
+
+
+def test_windowed_encoder_keeps_long_texts_whole_without_split_long():
+    # arrange
+    base = WordEncoder()
+    encoder = WindowedEncoder(base, split_long = False)
+
+    # act
+    encoder(["a b c d e f g"])
+
+    # assert
+    assert base.batches == [["a b c d e f g"]]
+    assert encoder.stats["tokens"] == 6 # the model only sees max_length tokens
@@ -0,0 +1,132 @@
+from plagiarism.eval_runner import CsvCheckpoint, Job, RateLimiter, TokenBucket, run_jobs, run_sync, with_retries
+
+# ---------
+# helpers
+# ---------
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Flaky:
+    def __init__(self, failures, result = "ok"):
+        self.failures = failures
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TimeoutError("rate limited")
+        return self.result
+
+# ---------
+# tests
+# ---------
+
+def test_token_bucket_refills_over_time():
+    # arrange
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock = clock) # 1 per second
+
+    # act
+    bucket.take(60)
+    empty_wait = bucket.wait_time(2)
+    clock.now = 2.0
+    refilled_wait = bucket.wait_time(2)
+
+    # assert
+    assert empty_wait == 2.0
+    assert refilled_wait == 0.0
+    assert bucket.wait_time(1000) == 58.0 # never more than a full bucket
+
+
+def test_rate_limiter_without_limits_never_waits():
+    # act
+    run_sync(RateLimiter().acquire(requests = 1000, tokens = 10 ** 9))
+
+
+def test_transient_errors_are_retried():
+    # arrange
+    flaky = Flaky(failures = 2)
+
+    # act
+    result = run_sync(with_retries(flaky, retries = 3, retry_on = (TimeoutError,), base_delay = 0.0))
+
+    # assert
+    assert result == "ok"
+    assert flaky.calls == 3
+
+
+def test_checkpoint_appends_and_reports_completed(tmp_path):
+    # arrange
+    checkpoint = CsvCheckpoint(tmp_path / "rag" / "top_k-5.csv", ["id", "is_plagiarized"])
+
+    # act
+    checkpoint.append([{"id": "s1", "is_plagiarized": True}])
+    checkpoint.append([{"id": "s2", "is_plagiarized": False}])
+
+    # assert
+    assert checkpoint.completed() == {"s1", "s2"}
+    assert checkpoint.path.read_text().splitlines() == ["id,is_plagiarized", "s1,True", "s2,False"]
+
+
+def test_checkpoint_with_other_columns_is_moved_aside(tmp_path):
+    # arrange
+    path = tmp_path / "config.csv"
+    path.write_text("id,is_plagiarized\ns1,True\n")
+    checkpoint = CsvCheckpoint(path, ["id", "is_plagiarized", "stages"])
+
+    # act
+    before = checkpoint.completed()
+    checkpoint.append([{"id": "s2", "is_plagiarized": False, "stages": "{}"}])
+
+    # assert
+    assert before == set()
+    assert checkpoint.completed() == {"s2"}
+    assert path.read_text().splitlines() == ["id,is_plagiarized,stages", "s2,False,{}"]
+    stale, = tmp_path.glob("config.csv.*.stale")
+    assert stale.read_text() == "id,is_plagiarized\ns1,True\n"
+
+
+def test_failed_jobs_are_not_checkpointed(tmp_path):
+    # arrange
+    checkpoint = CsvCheckpoint(tmp_path / "config.csv", ["id"])
+    jobs = [
+        Job("s1", lambda: [{"id": "s1"}], checkpoint),
+        Job("s2", Flaky(failures = 10), checkpoint),
+        Job("s3", lambda: [{"id": "s3"}], checkpoint, requests = 0),
+    ]
+
+    # act
+    report = run_sync(run_jobs(jobs, limiter = RateLimiter(6000, 10 ** 6), retries = 1, retry_on = (TimeoutError,), base_delay = 0.0, progress = None))
+
+    # assert
+    assert report["done"] == 2
+    assert [name for name, _ in report["failed"]] == ["s2"]
+    assert checkpoint.completed() == {"s1", "s3"}
+
+
+def test_every_retry_waits_for_the_rate_limiter(tmp_path):
+    # arrange
+    class CountingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__()
+            self.acquired = []
+
+        async def acquire(self, requests = 1, tokens = 0):
+            self.acquired.append((requests, tokens))
+
+    limiter = CountingLimiter()
+    job = Job("s1", Flaky(failures = 2, result = [{"id": "s1"}]), CsvCheckpoint(tmp_path / "config.csv", ["id"]), tokens = 500)
+
+    # act
+    report = run_sync(run_jobs([job], limiter = limiter, retries = 3, retry_on = (TimeoutError,), base_delay = 0.0, progress = None))
+
+    # assert
+    assert report["done"] == 1
+    assert limiter.acquired == [(1, 500)] * 3
@@ -0,0 +1,91 @@
+import numpy as np
+
+from plagiarism.fingerprint import FingerprintIndex, code_fingerprints, code_signature, jaccard_estimates, kgram_hashes, winnow
+from plagiarism.indexer import tokenize_code
+
+# ---------
+# helpers
+# ---------
+
+SUM = """func Sum(nums []int) int {
+    total := 0
+    for _, n := range nums {
+        total += n
+    }
+    return total
+}"""
+
+RENAMED = SUM.replace("Sum", "Add").replace("nums", "values").replace("total", "acc")
+
+OTHER = """func (s *Server) ServeHTTP(w http.ResponseWriter, r *http.Request) {
+    if r.Method != http.MethodGet {
+        http.Error(w, "method not allowed", http.StatusMethodNotAllowed)
+        return
+    }
+    s.mux.ServeHTTP(w, r)
+}"""
+
+# ---------
+# tests
+# ---------
+
+def test_winnowing_keeps_a_fingerprint_of_every_window():
+    # arrange
+    hashes = kgram_hashes(tokenize_code(SUM), 3)
+
+    # act
+    fingerprints = winnow(hashes, 4)
+
+    # assert
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, 4)
+    assert all(np.isin(window, fingerprints).any() for window in windows)
+    assert len(fingerprints) < len(hashes)
+    assert len(winnow(kgram_hashes(["a", "b"], 5), 4)) == 1 # shorter than a k-gram is still one fingerprint
+
+
+def test_normalized_identifiers_match_renamed_copies():
+    # arrange
+    plain = {"normalize_identifiers": False}
+    normalized = {"normalize_identifiers": True}
+
+    # act
+    plain_sim = jaccard_estimates(code_signature(tokenize_code(SUM), plain), code_signature(tokenize_code(RENAMED), plain)[None, :])[0]
+    normalized_sim = jaccard_estimates(code_signature(tokenize_code(SUM), normalized), code_signature(tokenize_code(RENAMED), normalized)[None, :])[0]
+
+    # assert
+    assert normalized_sim == 1.0
+    assert plain_sim < 0.5
+    assert code_signature([]) is None and len(code_fingerprints([])) == 0
+
+
+def test_query_finds_copies_and_respects_mask_and_removals():
+    # arrange
+    corpus = [tokenize_code(OTHER), tokenize_code(SUM), [], tokenize_code(SUM + "\n// tweak")]
+    index = FingerprintIndex.build(corpus)
+
+    # act
+    rows, scores = index.query(tokenize_code(SUM), top_k = 5, threshold = 0.5)
+    masked_rows, _ = index.query(tokenize_code(SUM), top_k = 5, mask = np.array([True, False, True, True]))
+    index.update(removed_rows = [1])
+    removed_rows, _ = index.query(tokenize_code(SUM), top_k = 5)
+
+    # assert
+    assert list(rows[:2]) == [1, 3] and scores[0] == 1.0
+    assert 0 not in rows # unrelated code doesn't collide
+    assert list(masked_rows) == [3]
+    assert list(removed_rows) == [3]
+    assert not index.live[2] # chunks without tokens aren't indexed
+
+
+def test_save_and_load_round_trip(tmp_path):
+    # arrange
+    index = FingerprintIndex.build([tokenize_code(SUM), tokenize_code(OTHER)], {"num_perm": 32, "bands": 8})
+
+    # act
+    index.save(tmp_path / "fingerprint")
+    loaded = FingerprintIndex.load(tmp_path / "fingerprint")
+
+    # assert
+    assert loaded.config == index.config
+    assert FingerprintIndex.load_config(tmp_path / "missing") is None
+    assert list(loaded.query(tokenize_code(OTHER))[0]) == [1]
@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from plagiarism.bm25_index import BM25Index
+from plagiarism.chunk_store import ChunkStore
+from plagiarism.fingerprint import FingerprintIndex
+from plagiarism.indexer import IncrementalIndexer, chunk_go_file, tokenize_code
+
+# ---------
+# helpers
+# ---------
+
+class FakeEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(t), t.count("func"), t.count("return"), 1.0] for t in texts], dtype = np.float32)
+
+def write_go(ref_dir, path, body):
+    target = ref_dir / path
+    target.parent.mkdir(parents = True, exist_ok = True)
+    target.write_text(body, encoding = "utf-8")
+
+def live_chunks(indexes_dir):
+    with ChunkStore(indexes_dir / "chunk_store") as store:
+        return {row: store.get(row) for row in store.live_rows()}
+
+# ---------
+# tests
+# ---------
+
+def test_chunk_go_file_splits_on_funcs():
+    # act
+    chunks = chunk_go_file("package a\n\nfunc A() {}\n\nfunc B() int {\n    return 1\n}\n")
+
+    # assert
+    assert chunks == ["func A() {}", "func B() int {\n    return 1\n}"]
+    assert chunk_go_file("package a\n\ntype T struct{}\n") == ["package a\n\ntype T struct{}"]
+
+
+def test_resync_only_embeds_changed_files(tmp_path):
+    # arrange
+    ref_dir = tmp_path / "corpus"
+    indexes_dir = tmp_path / "indexes"
+    write_go(ref_dir, "repo-a/a.go", "package a\n\nfunc A() {}\n\nfunc B() int {\n    return 1\n}\n")
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc C() string {\n    return \"c\"\n}\n")
+    write_go(ref_dir, "repo-b/c.go", "package b\n\nfunc D() {}\n")
+
+    encoder = FakeEncoder()
+    indexer = IncrementalIndexer(indexes_dir, encode_fn = encoder, embedding_model = "fake")
+    first = indexer.sync(ref_dir)
+
+    # act
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc C() string {\n    return \"changed\"\n}\n")
+    (ref_dir / "repo-b" / "c.go").unlink()
+    write_go(ref_dir, "repo-c/d.go", "package c\n\nfunc E() {}\n")
+    encoder.encoded.clear()
+    second = indexer.sync(ref_dir)
+
+    # assert
+    assert first["added"] == 3 and first["chunks_added"] == 4
+    assert second.pop("stats")["chunks_encoded"] == 2
+    assert second == {"added": 1, "changed": 1, "removed": 1, "unchanged": 1, "chunks_added": 2, "chunks_removed": 2}
+    assert sorted(encoder.encoded) == sorted(["func C() string {\n    return \"changed\"\n}", "func E() {}"])
+
+    chunks = live_chunks(indexes_dir)
+    assert sorted(c["source_path"] for c in chunks.values()) == sorted(["repo-a/a.go", "repo-a/a.go", "repo-a/b.go", "repo-c/d.go"])
+
+    dense_index = faiss.read_index(str(indexes_dir / "dense_index.faiss"))
+    assert dense_index.ntotal == len(chunks)
+    assert set(faiss.vector_to_array(dense_index.id_map)) == set(chunks)
+
+
+def test_bm25_after_resync_matches_fresh_build(tmp_path):
+    # arrange
+    ref_dir = tmp_path / "corpus"
+    indexes_dir = tmp_path / "indexes"
+    write_go(ref_dir, "repo-a/a.go", "package a\n\nfunc Sum(nums []int) int {\n    return 0\n}\n")
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc Max(nums []int) int {\n    return nums[0]\n}\n")
+    indexer = IncrementalIndexer(indexes_dir, encode_fn = FakeEncoder(), embedding_model = "fake", encode_batch_size = 1, workers = 0)
+    indexer.sync(ref_dir)
+
+    # act
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc Min(values []int) int {\n    return values[0]\n}\n")
+    indexer.sync(ref_dir)
+
+    # assert
+    chunks = live_chunks(indexes_dir)
+    rows = sorted(chunks)
+    fresh = BM25Index.build([tokenize_code(chunks[row]["text"]) for row in rows])
+    updated = BM25Index.load(indexes_dir / "bm25")
+
+    toks = tokenize_code("func Min values nums int")
+    assert np.allclose(updated.get_scores(toks)[rows], fresh.get_scores(toks))
+
+
+def test_unchanged_corpus_is_a_no_op(tmp_path):
+    # arrange
+    ref_dir = tmp_path / "corpus"
+    write_go(ref_dir, "repo-a/a.go", "package a\n\nfunc A() {}\n")
+    encoder = FakeEncoder()
+    indexer = IncrementalIndexer(tmp_path / "indexes", encode_fn = encoder, embedding_model = "fake", workers = 0)
+    indexer.sync(ref_dir)
+    encoder.encoded.clear()
+
+    # act
+    report = indexer.sync(ref_dir)
+
+    # assert
+    assert report["unchanged"] == 1 and report["chunks_added"] == 0
+    assert encoder.encoded == []
+
+
+def test_fingerprint_index_follows_resync_and_is_backfilled(tmp_path):
+    # arrange
+    ref_dir = tmp_path / "corpus"
+    indexes_dir = tmp_path / "indexes"
+    body = "func Sum(nums []int) int {\n    total := 0\n    for _, n := range nums {\n        total += n\n    }\n    return total\n}\n"
+    write_go(ref_dir, "repo-a/a.go", "package a\n\n" + body)
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc Max(nums []int) int {\n    return nums[0]\n}\n")
+    indexer = IncrementalIndexer(indexes_dir, encode_fn = FakeEncoder(), embedding_model = "fake", workers = 0)
+    indexer.sync(ref_dir)
+
+    # act
+    (ref_dir / "repo-a" / "a.go").unlink()
+    write_go(ref_dir, "repo-c/c.go", "package c\n\n" + body)
+    indexer.sync(ref_dir)
+    resynced = FingerprintIndex.load(indexes_dir / "fingerprint", mmap = False)
+
+    encoder = FakeEncoder()
+    IncrementalIndexer(indexes_dir, encode_fn = encoder, embedding_model = "fake", workers = 0, fingerprint = {"kgram": 3}).sync(ref_dir)
+    backfilled = FingerprintIndex.load(indexes_dir / "fingerprint")
+
+    # assert
+    chunks = live_chunks(indexes_dir)
+    copy_row = next(row for row, c in chunks.items() if c["source_path"] == "repo-c/c.go")
+
+    rows, scores = resynced.query(tokenize_code(body))
+    assert rows[0] == copy_row and scores[0] == 1.0
+    assert set(np.flatnonzero(resynced.live)) == set(chunks)
+
+    assert backfilled.config["kgram"] == 3 and encoder.encoded == []
+    assert backfilled.query(tokenize_code(body))[0][0] == copy_row
+
+
+def test_spilled_segments_give_the_same_indexes(tmp_path):
+    # arrange
+    ref_dir = tmp_path / "corpus"
+    write_go(ref_dir, "repo-a/a.go", "package a\n\nfunc Sum(nums []int) int {\n    total := 0\n    for _, n := range nums {\n        total += n\n    }\n    return total\n}\n")
+    write_go(ref_dir, "repo-a/b.go", "package a\n\nfunc Max(nums []int) int {\n    return nums[0]\n}\n\nfunc Min(values []int) int {\n    return values[0]\n}\n")
+    write_go(ref_dir, "repo-b/c.go", "package b\n\nfunc Empty() {}\n")
+
+    # act
+    IncrementalIndexer(tmp_path / "whole", encode_fn = FakeEncoder(), embedding_model = "fake", workers = 0).sync(ref_dir)
+    spilled = IncrementalIndexer(tmp_path / "spilled", encode_fn = FakeEncoder(), embedding_model = "fake", workers = 0, segment_chunks = 1)
+    spilled.sync(ref_dir)
+    (ref_dir / "repo-a" / "a.go").unlink()
+    write_go(ref_dir, "repo-b/c.go", "package b\n\nfunc Sum(values []int) int {\n    return len(values)\n}\n")
+    spilled.sync(ref_dir)
+    IncrementalIndexer(tmp_path / "whole", encode_fn = FakeEncoder(), embedding_model = "fake", workers = 0).sync(ref_dir)
+
+    # assert
+    assert not (tmp_path / "spilled" / "segments").exists()
+    for name in ["terms", "indptr", "doc_ids", "tfs", "weights", "live"]:
+        assert np.array_equal(getattr(BM25Index.load(tmp_path / "whole" / "bm25"), name), getattr(BM25Index.load(tmp_path / "spilled" / "bm25"), name))
+    whole = FingerprintIndex.load(tmp_path / "whole" / "fingerprint")
+    segmented = FingerprintIndex.load(tmp_path / "spilled" / "fingerprint")
+    assert np.array_equal(whole.live, segmented.live) and np.array_equal(whole.band_keys, segmented.band_keys)
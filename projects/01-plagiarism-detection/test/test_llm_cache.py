@@ -0,0 +1,91 @@
+import time
+
+from plagiarism.llm_cache import LLMCache
+
+# ---------
+# helpers
+# ---------
+
+SCHEMA = {"properties": {"is_plagiarized": {"type": "boolean"}, "reason": {"type": "string"}}}
+
+
+def messages(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def verdict(reason):
+    return {"is_plagiarized": True, "reason": reason, "evidence": []}
+
+# ---------
+# tests
+# ---------
+
+def test_identical_request_is_a_hit(tmp_path):
+    # arrange
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    key = LLMCache.key("gpt-4o-mini", SCHEMA, messages("p1"), temperature = 0.0)
+
+    # act
+    first = cache.get(key)
+    cache.put(key, "gpt-4o-mini", verdict("same func"))
+    second = cache.get(LLMCache.key("gpt-4o-mini", SCHEMA, messages("p1"), temperature = 0.0))
+
+    # assert
+    assert first is None
+    assert second == verdict("same func")
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": 1}
+
+
+def test_model_schema_and_prompt_are_part_of_key():
+    # arrange
+    base = LLMCache.key("gpt-4o-mini", SCHEMA, messages("p1"))
+
+    # assert
+    assert LLMCache.key("gpt-4o", SCHEMA, messages("p1")) != base
+    assert LLMCache.key("gpt-4o-mini", {**SCHEMA, "required": ["reason"]}, messages("p1")) != base
+    assert LLMCache.key("gpt-4o-mini", SCHEMA, messages("p2")) != base
+
+
+def test_verdicts_persist_between_runs(tmp_path):
+    # arrange
+    path = tmp_path / "llm.sqlite"
+    key = LLMCache.key("gpt-4o-mini", SCHEMA, messages("p1"))
+    with LLMCache(path) as cache:
+        cache.put(key, "gpt-4o-mini", verdict("same func"))
+
+    # act
+    with LLMCache(path) as reopened:
+        found = reopened.get(key)
+
+    # assert
+    assert found == verdict("same func")
+
+
+def test_expired_entries_are_misses(tmp_path):
+    # arrange
+    cache = LLMCache(tmp_path / "llm.sqlite", ttl_s = 0.05)
+    cache.put("k", "gpt-4o-mini", verdict("old"))
+
+    # act
+    time.sleep(0.1)
+    found = cache.get("k")
+
+    # assert
+    assert found is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    # arrange
+    cache = LLMCache(tmp_path / "llm.sqlite", max_entries = 2)
+
+    # act
+    cache.put("a", "m", verdict("a"))
+    cache.put("b", "m", verdict("b"))
+    cache.get("a") # a becomes most recently used
+    cache.put("c", "m", verdict("c")) # evicts b
+
+    # assert
+    assert cache.get("b") is None
+    assert cache.get("a") == verdict("a")
+    assert cache.get("c") == verdict("c")
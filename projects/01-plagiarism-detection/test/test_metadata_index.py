@@ -0,0 +1,61 @@
+import numpy as np
+
+from plagiarism.metadata_index import MetadataIndex
+
+# ---------
+# helpers
+# ---------
+
+REPOS = ["raft-go", "raft-go", "proglog", "got", "proglog", "raft-go"]
+PATHS = [
+    "raft-go\\raft\\raft.go",
+    "raft-go\\raft\\log.go",
+    "proglog\\internal\\log\\store.go",
+    "got\\main.go",
+    "proglog\\internal\\server\\server.go",
+    "raft-go\\raft\\raft.go",
+]
+
+def build_index(live_rows = range(6)):
+    return MetadataIndex.build(REPOS, PATHS, live_rows)
+
+# ---------
+# tests
+# ---------
+
+def test_rows_for_path_ignores_separator_style():
+    # arrange
+    index = build_index()
+
+    # act
+    rows = index.rows_for_path("raft-go/raft/raft.go")
+
+    # assert
+    assert list(rows) == [0, 5]
+    assert len(index.rows_for_path("raft-go/raft/missing.go")) == 0
+
+
+def test_select_by_repo_prefix_and_exclusion():
+    # arrange
+    index = build_index()
+
+    # assert
+    assert index.select() is None
+    assert list(index.select(repos = ["raft-go", "got"])) == [0, 1, 3, 5]
+    assert list(index.select(exclude_repos = ["raft-go"])) == [2, 3, 4]
+    assert list(index.select(path_prefix = "proglog/internal/log")) == [2]
+    assert list(index.select(repos = ["raft-go"], path_prefix = "raft-go/raft/r")) == [0, 5]
+    assert len(index.select(repos = ["unknown"])) == 0
+
+
+def test_dead_rows_are_never_selected():
+    # arrange
+    index = build_index(live_rows = [0, 1, 2, 3, 4])
+
+    # act
+    chunk_filter = index.make_filter(repos = ["raft-go"])
+
+    # assert
+    assert list(chunk_filter.rows) == [0, 1]
+    assert list(np.flatnonzero(chunk_filter.mask)) == [0, 1]
+    assert list(index.rows_for_path("raft-go/raft/raft.go")) == [0]
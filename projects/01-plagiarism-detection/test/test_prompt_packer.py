@@ -0,0 +1,85 @@
+import plagiarism.prompt_packer as prompt_packer
+from plagiarism.prompt_packer import TRIM_MARKER, count_tokens, estimate_tokens, pack_snippets, strip_go_comments, trim_to_query
+
+# ---------
+# helpers
+# ---------
+
+def go_func(name, body_lines):
+    return f"func {name}() {{\n" + "\n".join(f"    {line}" for line in body_lines) + "\n}"
+
+# ---------
+# tests
+# ---------
+
+def test_comments_and_blank_lines_are_stripped_outside_strings():
+    # arrange
+    code = 'func A() string {\n    // note\n\n    s := "http://x" /* inline */ + `/* raw */`   \n    return s // done\n}'
+
+    # act
+    stripped = strip_go_comments(code)
+
+    # assert
+    assert stripped == 'func A() string {\n    s := "http://x"  + `/* raw */`\n    return s\n}'
+
+
+def test_duplicates_are_dropped_and_budget_is_kept():
+    # arrange
+    a = go_func("Sum", [f"total += nums[{i}] // add" for i in range(10)])
+    a_again = a.replace("// add", "")
+    b = go_func("Max", [f"if nums[{i}] > best {{ best = nums[{i}] }}" for i in range(10)])
+    c = go_func("Min", [f"if nums[{i}] < low {{ low = nums[{i}] }}" for i in range(10)])
+    budget = count_tokens(strip_go_comments(a)) + count_tokens(c) + 2 * 12 + 4 # two snippet overheads, no room for a third
+
+    # act
+    packed, stats = pack_snippets([a, a_again, b, c], "func Min()", budget, scores = [0.9, 0.8, 0.1, 0.5])
+
+    # assert
+    assert packed[0] == strip_go_comments(a)
+    assert packed[1] == c
+    assert stats["duplicates"] == 1
+    assert stats["tokens"] <= budget
+    assert all("Max" not in p for p in packed)
+
+
+def test_long_snippets_are_trimmed_around_the_query():
+    # arrange
+    lines = [f"filler{i} := compute{i}(input)" for i in range(40)]
+    lines[30] = "match := parseHeader(request, headerName)"
+    text = go_func("Long", lines)
+
+    # act
+    trimmed = trim_to_query(text, {"parseHeader", "headerName"}, 60)
+    packed, stats = pack_snippets([text], "parseHeader(request, headerName)", 1000, max_snippet_tokens = 60)
+
+    # assert
+    assert "parseHeader" in trimmed
+    assert trimmed.startswith(TRIM_MARKER) and trimmed.endswith(TRIM_MARKER)
+    assert count_tokens(trimmed) <= 60
+    assert packed == [trimmed] and stats["trimmed"] == 1
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special = ()):
+        return text.split()
+
+def test_count_tokens_uses_tiktoken_when_available(monkeypatch):
+    # arrange
+    monkeypatch.setattr(prompt_packer, "tiktoken_encoding", lambda: FakeEncoding())
+
+    # act
+    count = count_tokens("func main() {}")
+
+    # assert
+    assert count == 3
+
+
+def test_count_tokens_falls_back_to_the_estimate(monkeypatch):
+    # arrange
+    monkeypatch.setattr(prompt_packer, "tiktoken_encoding", lambda: None)
+
+    # act
+    count = count_tokens("func main() {}")
+
+    # assert
+    assert count == estimate_tokens("func main() {}") == 6
@@ -0,0 +1,94 @@
+import numpy as np
+
+import pytest
+
+from plagiarism.reranker import DEFAULT_RERANKER, check_calibrated, fit_threshold, load_reranker_config, rerank_candidates, save_reranker_config
+
+# ---------
+# helpers
+# ---------
+
+class FakeScorer:
+    # score = share of the candidate's characters that are in the query, records its calls
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, pairs):
+        self.calls.append(list(pairs))
+        return np.array([len(set(b) & set(a)) / len(set(b)) for a, b in pairs], dtype = np.float32)
+
+# ---------
+# tests
+# ---------
+
+def test_rerank_candidates_scores_all_queries_in_one_call():
+    # arrange
+    scorer = FakeScorer()
+
+    # act
+    scores = rerank_candidates(scorer, ["abc", "xyz"], [["ab", "aq"], ["xy"]])
+
+    # assert
+    assert len(scorer.calls) == 1
+    assert scorer.calls[0] == [("abc", "ab"), ("abc", "aq"), ("xyz", "xy")]
+    assert np.allclose(scores[0], [1.0, 0.5])
+    assert np.allclose(scores[1], [1.0])
+
+
+def test_rerank_candidates_handles_queries_without_candidates():
+    # act
+    scores = rerank_candidates(FakeScorer(), ["abc", "xyz"], [[], ["xy"]])
+
+    # assert
+    assert len(scores[0]) == 0
+    assert np.allclose(scores[1], [1.0])
+
+
+def test_fit_threshold_picks_best_f1_between_scores():
+    # arrange
+    scores = [0.9, 0.8, 0.6, 0.3, 0.2]
+    labels = [True, True, False, True, False]
+
+    # act
+    fit = fit_threshold(scores, labels)
+
+    # assert - 0.25 catches all 3 positives with one false positive (F1 0.857), 0.7 only 2 of them (F1 0.8)
+    assert np.isclose(fit["threshold"], 0.25)
+    assert np.isclose(fit["f1"], 6 / 7)
+    assert fit["n"] == 5
+
+
+def test_fit_threshold_separates_clean_split():
+    # act
+    fit = fit_threshold([0.1, 0.2, 0.7, 0.9], [False, False, True, True])
+
+    # assert
+    assert np.isclose(fit["threshold"], 0.45)
+    assert fit["precision"] == fit["recall"] == 1.0
+
+
+def test_reranker_config_round_trip(tmp_path):
+    # arrange
+    path = tmp_path / "reranker.json"
+
+    # act
+    default = load_reranker_config(path)
+    save_reranker_config(path, {"threshold": 0.42})
+    loaded = load_reranker_config(path)
+
+    # assert
+    assert default == DEFAULT_RERANKER
+    assert loaded["threshold"] == 0.42
+    assert loaded["model"] == DEFAULT_RERANKER["model"]
+
+
+def test_uncalibrated_or_refit_model_is_refused():
+    # arrange
+    fitted = {**DEFAULT_RERANKER, "threshold": 0.42, "fit_model": DEFAULT_RERANKER["model"]}
+
+    # act / assert
+    check_calibrated(fitted)
+    with pytest.raises(ValueError, match = "isn't calibrated"):
+        check_calibrated(DEFAULT_RERANKER)
+    with pytest.raises(ValueError, match = "run fit_reranker again"):
+        check_calibrated({**fitted, "model": "some/code-cross-encoder"})
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from plagiarism.retrievers import ParallelRetrievers
+from plagiarism.spans import span, trace
+
+# ---------
+# helpers
+# ---------
+
+class Blocking:
+    # a retriever that hangs until released
+    def __init__(self, value):
+        self.value = value
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.release.wait(5)
+        return self.value
+
+@pytest.fixture
+def retrievers():
+    retrievers = ParallelRetrievers(["dense", "bm25"], max_workers = 2, max_abandoned = 1)
+    yield retrievers
+    retrievers.close()
+
+# ---------
+# tests
+# ---------
+
+def test_calls_run_concurrently_in_the_callers_trace(retrievers):
+    # arrange
+    barrier = threading.Barrier(2, timeout = 5) # only passes when both calls run at the same time
+
+    def call(name):
+        def run():
+            barrier.wait()
+            with span(name):
+                return [name]
+        return run
+
+    # act
+    with trace() as t:
+        hits = retrievers.run({"dense": call("dense"), "bm25": call("bm25")})
+
+    # assert
+    assert hits == {"dense": ["dense"], "bm25": ["bm25"]}
+    assert set(t.stages) == {"dense", "bm25"}
+    assert retrievers.timeouts == {"dense": 0, "bm25": 0}
+
+
+def test_timed_out_call_is_left_out(retrievers):
+    # arrange
+    slow = Blocking(["late"])
+
+    # act
+    hits = retrievers.run({"dense": slow, "bm25": lambda: ["bm25"]}, timeouts = {"dense": 0.05})
+    slow.release.set()
+
+    # assert
+    assert hits == {"dense": None, "bm25": ["bm25"]}
+    assert retrievers.timeouts == {"dense": 1, "bm25": 0}
+
+
+def test_both_timed_out_return_without_waiting(retrievers):
+    # arrange
+    dense, bm25 = Blocking(["dense"]), Blocking(["bm25"])
+
+    # act
+    started = time.perf_counter()
+    hits = retrievers.run({"dense": dense, "bm25": bm25}, timeouts = {"dense": 0.05, "bm25": 0.05})
+    elapsed = time.perf_counter() - started
+    dense.release.set()
+    bm25.release.set()
+
+    # assert
+    assert hits == {"dense": None, "bm25": None}
+    assert elapsed < 1.0
+    assert retrievers.timeouts == {"dense": 1, "bm25": 1}
+
+
+def test_hanging_retriever_doesnt_take_the_other_ones_workers(retrievers):
+    # arrange
+    hanging = [Blocking(["late"]) for _ in range(3)]
+
+    # act - the first call is left running, the next ones are skipped instead of taking more workers
+    outs = [retrievers.run({"dense": h, "bm25": lambda: ["bm25"]}, timeouts = {"dense": 0.05}) for h in hanging]
+    abandoned = dict(retrievers.abandoned)
+    hanging[0].release.set()
+    time.sleep(0.1)
+
+    # assert
+    assert [out["bm25"] for out in outs] == [["bm25"]] * 3
+    assert [h.started.is_set() for h in hanging] == [True, False, False]
+    assert abandoned == {"dense": 1, "bm25": 0}
+    assert retrievers.abandoned == {"dense": 0, "bm25": 0}
+    assert retrievers.timeouts["dense"] == 3
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from plagiarism.scanner import SubmissionScanner, discover_submissions, function_name
+
+# ---------
+# helpers
+# ---------
+
+class FakeResult:
+    def __init__(self, is_plagiarized, evidence):
+        self.is_plagiarized = is_plagiarized
+        self.reason = ""
+        self.evidence_mine = evidence
+
+
+class FakeDetector:
+    # flags every function containing "Copied", records the batches it gets
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [
+            FakeResult("Copied" in t, [{"path": "ref/a.go", "jaccard": 1.0}] if "Copied" in t else [])
+            for t in texts
+        ]
+
+def write_go(path, body):
+    path.parent.mkdir(parents = True, exist_ok = True)
+    path.write_text(body, encoding = "utf-8")
+
+# ---------
+# tests
+# ---------
+
+def test_function_name_handles_methods():
+    # assert
+    assert function_name("func Sum(nums []int) int {}") == "Sum"
+    assert function_name("func (s *Server) ServeHTTP(w http.ResponseWriter) {}") == "ServeHTTP"
+    assert function_name("package a") is None
+
+
+def test_identical_functions_are_detected_once(tmp_path):
+    # arrange
+    shared = "func Helper() int {\n    return 1\n}\n"
+    write_go(tmp_path / "subs" / "alice" / "main.go", "package main\n\n" + shared + "\nfunc Copied() {}\n")
+    write_go(tmp_path / "subs" / "bob" / "main.go", "package main\n\n" + shared + "\nfunc Own() {}\n")
+    write_go(tmp_path / "single.go", "package main\n\n" + shared)
+    detector = FakeDetector()
+    scanner = SubmissionScanner(detector, batch_size = 2, progress = None)
+
+    # act
+    stats = scanner.scan([tmp_path / "subs", tmp_path / "single.go"], jsonl_path = tmp_path / "out" / "scan.jsonl", csv_path = tmp_path / "out" / "scan.csv")
+
+    # assert
+    assert sorted(t for batch in detector.batches for t in batch) == sorted([shared.strip(), "func Copied() {}", "func Own() {}"])
+    assert all(len(batch) <= 2 for batch in detector.batches)
+    assert stats["functions"] == 5 and stats["detected"] == 3 and stats["reused"] == 2
+
+    records = [json.loads(line) for line in (tmp_path / "out" / "scan.jsonl").read_text().splitlines()]
+    assert [r["path"] for r in records] == ["subs/alice/main.go", "subs/bob/main.go", "single.go"]
+    assert [r["is_plagiarized"] for r in records] == [True, False, False]
+    assert [f["name"] for f in records[0]["flagged"]] == ["Copied"]
+
+    with open(tmp_path / "out" / "scan.csv", "r", encoding = "utf-8", newline = "") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["matched_paths"] == "ref/a.go" and rows[0]["flagged_functions"] == "1"
+
+
+def test_verdict_cache_is_bounded(tmp_path):
+    # arrange
+    for i in range(5):
+        write_go(tmp_path / f"s{i}.go", f"package main\n\nfunc F{i}() {{}}\n")
+    scanner = SubmissionScanner(FakeDetector(), batch_size = 2, max_cached = 3, progress = None)
+
+    # act
+    stats = scanner.scan(tmp_path)
+
+    # assert
+    assert stats["files"] == 5 and stats["detected"] == 5
+    assert len(scanner.verdicts) <= 3
+    assert [path for _, path in discover_submissions(tmp_path)][:2] == [f"{tmp_path.name}/s0.go", f"{tmp_path.name}/s1.go"]
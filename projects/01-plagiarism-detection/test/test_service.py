@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from plagiarism.load_test import Client, run_level
+from plagiarism.service import BadParams, Busy, DetectionService, load_notebook, make_server, normalize_params
+
+# ---------
+# helpers
+# ---------
+
+class FakeResult:
+    def __init__(self, code, top_k):
+        self.method = "fake"
+        self.is_plagiarized = "Copied" in code
+        self.reason = f"top_k {top_k}"
+        self.evidence_mine = [{"chunk_id": "chunk_00001", "text": "func Copied() {}", "score": 0.9}] if self.is_plagiarized else []
+        self.evidence_oai = None
+        self.escalated = None
+
+
+class FakeDetector:
+    def __init__(self):
+        self.batches = []
+        self.scopes = []
+
+    def __call__(self, code_queries, top_k = 10, scope = None):
+        self.batches.append(list(code_queries))
+        self.scopes.append(scope)
+        return [FakeResult(code, top_k) for code in code_queries]
+
+
+class FakeLLMDetector:
+    # leaves every verdict as a function that waits for release, like the prepare_*_batch detectors
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def __call__(self, code_queries, top_k = 5, w_dense = 0.5, threshold = None, stream = False, scope = None):
+        self.batches.append(list(code_queries))
+        return [lambda code = code: self.verdict(code, top_k) for code in code_queries]
+
+    def verdict(self, code, top_k):
+        self.release.wait(5)
+        return FakeResult(code, top_k)
+
+@pytest.fixture
+def served():
+    detector = FakeDetector()
+    service = DetectionService({"fake": detector}, max_batch_size = 64, max_wait_ms = 50)
+    server = make_server(service, port = 0)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}", detector, service
+
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+# ---------
+# tests
+# ---------
+
+def test_detect_returns_verdict_without_chunk_text(served):
+    # arrange
+    url, _, _ = served
+    client = Client(url)
+
+    # act
+    out = client.request("POST", "/detect/fake", {"code": "func Copied() {}", "params": {"top_k": 3}})
+    client.close()
+
+    # assert
+    assert out["is_plagiarized"] is True
+    assert out["reason"] == "top_k 3"
+    assert out["evidence"] == [{"chunk_id": "chunk_00001", "score": 0.9}]
+    assert out["details_pending"] is False
+
+
+def test_concurrent_requests_share_batches(served):
+    # arrange
+    url, detector, service = served
+    codes = [f"func F{i}() {{}}" for i in range(8)]
+
+    def check(code):
+        client = Client(url)
+        try:
+            return client.request("POST", "/detect/fake", {"code": code})
+        finally:
+            client.close()
+
+    # act
+    with ThreadPoolExecutor(max_workers = 8) as pool:
+        outs = list(pool.map(check, codes))
+
+    # assert
+    assert all(out["is_plagiarized"] is False for out in outs)
+    assert len(detector.batches) < len(codes)
+    assert sorted(code for batch in detector.batches for code in batch) == sorted(codes)
+
+    client = Client(url)
+    metrics = client.request("GET", "/metrics")
+    client.close()
+    config = metrics["methods"]["fake"]["configs"][json.dumps({"scope": None, "top_k": 10})]
+    assert config["batch_size"]["count"] == len(detector.batches)
+    assert metrics["methods"]["fake"]["request_ms"]["count"] == len(codes)
+
+
+def test_bad_requests_are_rejected(served):
+    # arrange
+    url, _, _ = served
+    client = Client(url)
+
+    # act / assert
+    with pytest.raises(RuntimeError, match = "404"):
+        client.request("POST", "/detect/unknown", {"code": "x"})
+    with pytest.raises(RuntimeError, match = "400"):
+        client.request("POST", "/detect/fake", {"params": {}})
+    with pytest.raises(RuntimeError, match = "bad params"):
+        client.request("POST", "/detect/fake", {"code": "x", "params": {"k": 1}})
+    with pytest.raises(RuntimeError, match = "400.*scope"):
+        client.request("POST", "/detect/fake", {"code": "x", "params": {"scope": "raft-go"}})
+    client.close()
+
+
+def test_params_are_normalized_and_checked():
+    # arrange
+    detector = FakeLLMDetector()
+
+    # act
+    normalized = normalize_params(detector, {"top_k": 5.0, "w_dense": 1, "scope": {"repos": ["b", "a", "b"]}})
+    defaults = normalize_params(detector, {})
+
+    # assert
+    assert normalized == {"top_k": 5, "w_dense": 1.0, "threshold": None, "stream": False, "scope": {"repos": ["a", "b"]}}
+    assert type(normalized["top_k"]) is int and type(normalized["w_dense"]) is float
+    assert defaults == {"top_k": 5, "w_dense": 0.5, "threshold": None, "stream": False, "scope": None}
+    for bad in [{"top_k": 2.5}, {"top_k": None}, {"top_k": "5"}, {"top_k": True}, {"w_dense": float("nan")}, {"stream": 1}]:
+        with pytest.raises(BadParams):
+            normalize_params(detector, bad)
+
+
+def test_scope_is_made_in_the_batch_and_bad_scopes_are_rejected():
+    # arrange
+    detector = FakeDetector()
+    made = []
+    service = DetectionService(
+        {"fake": detector},
+        max_wait_ms = 1,
+        make_scope = lambda **scope: made.append(scope) or ("scope", tuple(scope["repos"]))
+    )
+
+    # act
+    service.detect("fake", "func A() {}", {"scope": {"repos": ["raft-go", "proglog"]}})
+    service.detect("fake", "func A() {}", {"scope": {"repos": ["proglog", "raft-go"]}})
+
+    # assert
+    assert made == [{"repos": ["proglog", "raft-go"]}] * 2
+    assert detector.scopes == [("scope", ("proglog", "raft-go"))] * 2
+    assert len(service.batchers) == 1
+    for bad in ["raft-go", {"repo": ["raft-go"]}, {"repos": "raft-go"}, {"repos": [1]}, {"path_prefix": 3}]:
+        with pytest.raises(BadParams):
+            service.detect("fake", "func A() {}", {"scope": bad})
+    service.close()
+
+
+def test_llm_verdicts_dont_hold_up_the_next_batch():
+    # arrange
+    detector = FakeLLMDetector()
+    service = DetectionService({"llm": detector}, max_wait_ms = 1, llm_workers = 4)
+
+    # act - the first request's LLM verdict hangs until released, the second still gets its batch
+    with ThreadPoolExecutor(max_workers = 2) as pool:
+        first = pool.submit(service.detect, "llm", "func A() {}")
+        deadline = time.monotonic() + 5
+        while not detector.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        second = pool.submit(service.detect, "llm", "func Copied() {}")
+        while service.metrics()["llm_in_flight"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        batches = list(detector.batches)
+        in_flight = service.metrics()["llm_in_flight"]
+        detector.release.set()
+        outs = [first.result(5), second.result(5)]
+
+    # assert
+    assert batches == [["func A() {}"], ["func Copied() {}"]]
+    assert in_flight == 2
+    assert [out["is_plagiarized"] for out in outs] == [False, True]
+    assert service.metrics()["methods"]["llm"]["llm_ms"]["count"] == 2
+    service.close()
+
+
+def test_batchers_are_capped_and_idle_ones_closed():
+    # arrange
+    service = DetectionService({"fake": FakeDetector()}, max_wait_ms = 1, max_batchers = 2, batcher_idle_s = 0.2)
+
+    # act
+    service.detect("fake", "func A() {}", {"top_k": 1})
+    service.detect("fake", "func A() {}", {"top_k": 2})
+    with pytest.raises(Busy):
+        service.detect("fake", "func A() {}", {"top_k": 3})
+    service.detect("fake", "func A() {}", {"top_k": 2}) # a config in use still works
+    time.sleep(0.3)
+    out = service.detect("fake", "func A() {}", {"top_k": 3})
+
+    # assert
+    assert out["reason"] == "top_k 3"
+    assert service.metrics()["batchers"] == 1
+    assert service.metrics()["batchers_evicted"] == 2
+    service.close()
+
+
+def test_load_test_level_reports_throughput(served):
+    # arrange
+    url, _, _ = served
+
+    # act
+    level = run_level(url, "fake", {}, ["func A() {}", "func Copied() {}"], concurrency = 4, num_requests = 20)
+
+    # assert
+    assert level["requests"] == 20 and level["errors"] == 0
+    assert level["requests_per_s"] > 0 and level["p50_ms"] is not None
+
+
+def test_load_notebook_skips_magics(tmp_path):
+    # arrange
+    path = tmp_path / "nb.ipynb"
+    path.write_text(json.dumps({"cells": [
+        {"cell_type": "markdown", "source": ["# title"]},
+        {"cell_type": "code", "source": ["%run ./other.ipynb\n", "x = 1\n"]},
+        {"cell_type": "code", "source": ["y = x + 1"]}
+    ]}))
+
+    # act
+    namespace = load_notebook(path)
+
+    # assert
+    assert namespace["y"] == 2
+
+
+def test_health_reports_index_status():
+    # arrange
+    service = DetectionService({"fake": FakeDetector()}, index_status = lambda: {"version": 3, "swaps": 2})
+
+    # act
+    health = service.health()
+
+    # assert
+    assert health == {"status": "ok", "index": {"version": 3, "swaps": 2}}
+    assert service.metrics()["index"]["version"] == 3
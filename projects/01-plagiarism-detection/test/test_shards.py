@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from plagiarism.bm25_index import BM25Index
+from plagiarism.chunk_store import write_chunk_store
+from plagiarism.dense_backends import build_dense_index
+from plagiarism.metadata_index import ChunkFilter
+from plagiarism.shards import ShardedRetriever, assign_shards, build_shards, merge_bm25, merge_dense
+
+# ---------
+# helpers
+# ---------
+
+WORDS = ["server", "raft", "leader", "term", "vote", "log", "append", "index", "peer", "commit", "token", "lexer"]
+
+def make_indexes(indexes_dir, n = 120, dim = 16, seed = 0):
+    # master chunk store, flat dense index and BM25 like 02_indexing writes them, every 10th chunk removed
+    rng = np.random.default_rng(seed)
+    repos = ["raft-go", "interpreter-go", "proglog", "got"]
+    toks = [list(rng.choice(WORDS, size = rng.integers(3, 15))) for _ in range(n)]
+    chunks = [
+        {"id": f"chunk_{i:05d}", "repo": repos[i % len(repos)], "source_path": f"{repos[i % len(repos)]}/f{i}.go", "text": " ".join(t)}
+        for i, t in enumerate(toks)
+    ]
+    write_chunk_store(indexes_dir / "chunk_store", chunks)
+
+    removed = list(range(0, n, 10))
+    live = np.setdiff1d(np.arange(n), removed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.write_index(build_dense_index({"type": "flat"}, vecs[live], live.astype(np.int64)), str(indexes_dir / "dense_index.faiss"))
+
+    bm25 = BM25Index.build(toks)
+    bm25.update(removed_docs = removed)
+    bm25.save(indexes_dir / "bm25")
+
+    from plagiarism.chunk_store import ChunkStoreWriter
+    with ChunkStoreWriter(indexes_dir / "chunk_store", append = True) as writer:
+        writer.delete(removed)
+
+    return vecs, toks, bm25
+
+# ---------
+# tests
+# ---------
+
+def test_assign_shards_by_repo_keeps_repos_together_and_balances():
+    # arrange
+    repos = ["a"] * 6 + ["b"] * 3 + ["c"] * 3
+
+    # act
+    shards = assign_shards([f"chunk_{i}" for i in range(len(repos))], repos, 2, by = "repo")
+
+    # assert
+    assert len(set(shards[:6])) == 1 and len(set(shards[6:9])) == 1
+    assert sorted(np.bincount(shards)) == [6, 6]
+
+
+def test_merge_keeps_global_order():
+    # arrange
+    dense_parts = [
+        (np.array([[0.1, 0.5]], dtype = np.float32), np.array([[3, 7]])),
+        (np.array([[0.2, 3.4e38]], dtype = np.float32), np.array([[4, -1]]))
+    ]
+    bm25_parts = [[(np.array([3, 7]), np.array([2.0, 1.0]))], [(np.array([1]), np.array([2.0]))]]
+
+    # act
+    distances, ids = merge_dense(dense_parts, 3)
+    (bm25_ids, bm25_scores), = merge_bm25(bm25_parts, 2)
+
+    # assert
+    assert ids.tolist() == [[3, 4, 7]]
+    assert np.allclose(distances, [[0.1, 0.2, 0.5]])
+    assert bm25_ids.tolist() == [1, 3] # equal scores, lower row first like BM25Index.top_k
+    assert bm25_scores.tolist() == [2.0, 2.0]
+
+
+@pytest.mark.parametrize("by", ["repo", "hash"])
+def test_sharded_results_match_unsharded_indexes(tmp_path, by):
+    # arrange
+    vecs, toks, bm25 = make_indexes(tmp_path)
+    master = faiss.read_index(str(tmp_path / "dense_index.faiss"))
+    build_shards(tmp_path, {"num_shards": 3, "by": by}, {"type": "flat"})
+    retriever = ShardedRetriever(tmp_path / "shards", {"type": "flat"}, processes = False)
+
+    # act
+    distances, ids = retriever.dense_search(vecs[:8], 5)
+    bm25_hits = retriever.bm25_top_k_batch(toks[:8], 5)
+
+    # assert
+    expected_distances, expected_ids = master.search(vecs[:8], 5)
+    assert ids.tolist() == expected_ids.tolist()
+    assert np.allclose(distances, expected_distances, atol = 1e-5)
+    for (found_ids, found_scores), (want_ids, want_scores) in zip(bm25_hits, bm25.top_k_batch(toks[:8], 5)):
+        assert found_ids.tolist() == want_ids.tolist()
+        assert np.allclose(found_scores, want_scores) # global idf and avgdl, not per shard
+
+
+def test_scoped_search_only_returns_scope_rows(tmp_path):
+    # arrange
+    vecs, toks, _ = make_indexes(tmp_path)
+    build_shards(tmp_path, {"num_shards": 2, "by": "hash"}, {"type": "flat"})
+    retriever = ShardedRetriever(tmp_path / "shards", {"type": "flat"}, processes = False)
+    scope = ChunkFilter(np.arange(1, 40, 2), 120)
+
+    # act - twice, the second call only sends the scope key
+    for _ in range(2):
+        _, ids = retriever.dense_search(vecs[:4], 5, scope = scope)
+        bm25_hits = retriever.bm25_top_k_batch(toks[:4], 5, scope = scope)
+
+    # assert
+    assert set(ids.ravel()) - {-1} <= set(scope.rows)
+    assert all(set(found.tolist()) <= set(scope.rows) for found, _ in bm25_hits)
+
+
+def test_a_new_scope_is_sent_to_workers_even_if_it_reuses_an_old_ones_id(tmp_path):
+    # arrange
+    vecs, _, _ = make_indexes(tmp_path)
+    build_shards(tmp_path, {"num_shards": 2, "by": "hash"}, {"type": "flat"})
+    workers = ShardedRetriever(tmp_path / "shards", {"type": "flat"})
+
+    # act - the first scope is collected, so the second one usually gets its id
+    try:
+        workers.dense_search(vecs[:4], 5, scope = ChunkFilter(np.arange(1, 40, 2), 120))
+        scope = ChunkFilter(np.arange(61, 120, 2), 120)
+        _, ids = workers.dense_search(vecs[:4], 5, scope = scope)
+    finally:
+        workers.close()
+
+    # assert
+    assert set(ids.ravel()) - {-1} <= set(scope.rows)
+
+
+def test_worker_processes_answer_like_in_process_shards(tmp_path):
+    # arrange
+    vecs, toks, _ = make_indexes(tmp_path)
+    build_shards(tmp_path, {"num_shards": 2, "by": "repo"}, {"type": "flat"})
+    local = ShardedRetriever(tmp_path / "shards", {"type": "flat"}, processes = False)
+    workers = ShardedRetriever(tmp_path / "shards", {"type": "flat"})
+
+    # act
+    try:
+        _, ids = workers.dense_search(vecs[:4], 5)
+        bm25_hits = workers.bm25_top_k_batch(toks[:4], 5)
+    finally:
+        workers.close()
+
+    # assert
+    assert ids.tolist() == local.dense_search(vecs[:4], 5)[1].tolist()
+    assert [h[0].tolist() for h in bm25_hits] == [h[0].tolist() for h in local.bm25_top_k_batch(toks[:4], 5)]
+
+
+def test_build_shards_is_skipped_when_masters_are_unchanged(tmp_path):
+    # arrange
+    make_indexes(tmp_path)
+    shards_dir = build_shards(tmp_path, {"num_shards": 2, "by": "hash"}, {"type": "flat"})
+    mtime = (shards_dir / "shard_0" / "dense_index.faiss").stat().st_mtime_ns
+
+    # act
+    build_shards(tmp_path, {"num_shards": 2, "by": "hash"}, {"type": "flat"})
+
+    # assert
+    assert (shards_dir / "shard_0" / "dense_index.faiss").stat().st_mtime_ns == mtime
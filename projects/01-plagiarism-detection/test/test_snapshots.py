@@ -0,0 +1,147 @@
+import json
+import threading
+
+import pytest
+
+from plagiarism.snapshots import LiveIndexes, SnapshotWatcher, current_snapshot, publish_snapshot, read_snapshot, verify_snapshot
+
+# ---------
+# helpers
+# ---------
+
+def write_indexes(indexes_dir, num_chunks = 3, bm25 = b"postings v1"):
+    (indexes_dir / "bm25").mkdir(parents = True, exist_ok = True)
+    (indexes_dir / "bm25" / "weights.npy").write_bytes(bm25)
+    (indexes_dir / "meta.json").write_text(json.dumps({"num_chunks": num_chunks}))
+    (indexes_dir / "manifest.json").write_text("{}") # indexer state, not snapshotted
+
+
+class FakeCorpus:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+# ---------
+# tests
+# ---------
+
+def test_publish_writes_manifest_and_switches_current(tmp_path):
+    # arrange
+    write_indexes(tmp_path)
+
+    # act
+    snapshot_dir = publish_snapshot(tmp_path, ["meta.json", "bm25"])
+
+    # assert
+    assert snapshot_dir == current_snapshot(tmp_path / "snapshots") == tmp_path / "snapshots" / "v000001"
+    manifest = verify_snapshot(snapshot_dir)
+    assert manifest["version"] == 1
+    assert sorted(manifest["files"]) == ["bm25/weights.npy", "meta.json"]
+    assert not (snapshot_dir / "manifest.json").exists()
+
+
+def test_unchanged_indexes_are_not_published_again(tmp_path):
+    # arrange
+    write_indexes(tmp_path)
+    first = publish_snapshot(tmp_path, ["meta.json", "bm25"])
+
+    # act
+    again = publish_snapshot(tmp_path, ["meta.json", "bm25"])
+
+    # assert
+    assert again == first
+    assert [p.name for p in (tmp_path / "snapshots").glob("v*")] == ["v000001"]
+
+
+def test_new_version_links_unchanged_files_and_old_ones_are_pruned(tmp_path):
+    # arrange
+    write_indexes(tmp_path)
+    first = publish_snapshot(tmp_path, ["meta.json", "bm25"], keep = 2)
+
+    # act - only the chunk count changes, three times
+    for n in range(4, 7):
+        write_indexes(tmp_path, num_chunks = n)
+        latest = publish_snapshot(tmp_path, ["meta.json", "bm25"], keep = 2)
+
+    # assert
+    assert latest.name == "v000004" and read_snapshot(latest)["version"] == 4
+    assert sorted(p.name for p in (tmp_path / "snapshots").glob("v*")) == ["v000003", "v000004"]
+    assert not first.exists()
+    assert (latest / "bm25" / "weights.npy").stat().st_ino == (tmp_path / "snapshots" / "v000003" / "bm25" / "weights.npy").stat().st_ino
+    assert json.loads((latest / "meta.json").read_text())["num_chunks"] == 6
+
+
+def test_verify_rejects_a_changed_file(tmp_path):
+    # arrange
+    write_indexes(tmp_path)
+    snapshot_dir = publish_snapshot(tmp_path, ["meta.json", "bm25"])
+    (snapshot_dir / "bm25" / "weights.npy").write_bytes(b"postings v2")
+
+    # act / assert
+    with pytest.raises(ValueError, match = "checksum"):
+        verify_snapshot(snapshot_dir)
+
+
+def test_swap_waits_for_pinned_queries_before_closing():
+    # arrange
+    old, new = FakeCorpus("old"), FakeCorpus("new")
+    live = LiveIndexes(old, version = 1)
+    in_query = threading.Event()
+    release = threading.Event()
+    seen = []
+
+    @live.pinned
+    def query():
+        seen.append(live.get().name)
+        in_query.set()
+        release.wait(5)
+        seen.append(live.get().name) # still the snapshot it started with
+
+    thread = threading.Thread(target = query)
+    thread.start()
+    in_query.wait(5)
+
+    # act
+    live.swap(new, version = 2)
+    swapped_while_running = (live.get().name, old.closed)
+    release.set()
+    thread.join(5)
+
+    # assert
+    assert swapped_while_running == ("new", False)
+    assert seen == ["old", "old"]
+    assert old.closed and not new.closed
+    assert live.version == 2 and live.swaps == 1
+
+
+def test_watcher_swaps_in_new_snapshots_and_skips_broken_ones(tmp_path):
+    # arrange
+    write_indexes(tmp_path)
+    first = publish_snapshot(tmp_path, ["meta.json", "bm25"])
+    live = LiveIndexes(FakeCorpus(first.name), version = 1)
+
+    def load(snapshot_dir, manifest):
+        if json.loads((snapshot_dir / "meta.json").read_text())["num_chunks"] < 0:
+            raise ValueError("bad snapshot")
+        return FakeCorpus(snapshot_dir.name)
+
+    watcher = SnapshotWatcher(tmp_path / "snapshots", live, load, poll_s = 60)
+
+    # act
+    unchanged = watcher.check()
+    write_indexes(tmp_path, num_chunks = 4)
+    publish_snapshot(tmp_path, ["meta.json", "bm25"])
+    swapped = watcher.check()
+    write_indexes(tmp_path, num_chunks = -1)
+    publish_snapshot(tmp_path, ["meta.json", "bm25"])
+    broken = watcher.check()
+    watcher.stop()
+
+    # assert
+    assert (unchanged, swapped, broken) == (False, True, False)
+    assert live.get().name == "v000002"
+    assert watcher.status()["version"] == 2
+    assert "bad snapshot" in watcher.status()["last_error"]
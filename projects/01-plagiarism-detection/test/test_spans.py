@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from plagiarism.spans import add_usage, percentiles, span, submit_in_context, trace
+
+# ---------
+# tests
+# ---------
+
+def test_spans_add_up_per_stage():
+    # act
+    with trace() as t:
+        with span("embed"):
+            time.sleep(0.01)
+        with span("embed"):
+            time.sleep(0.01)
+        with span("llm"):
+            add_usage(prompt_tokens = 120, completion_tokens = 30)
+        add_usage(prompt_tokens = 80, completion_tokens = None)
+
+    # assert
+    assert set(t.stages) == {"embed", "llm"}
+    assert t.stages["embed"] >= 20
+    assert t.usage == {"prompt_tokens": 200, "completion_tokens": 30}
+
+
+def test_spans_outside_a_trace_are_ignored():
+    # act
+    with span("embed"):
+        add_usage(prompt_tokens = 1)
+
+    with trace() as t:
+        pass
+
+    # assert
+    assert t.stages == {} and t.usage == {}
+
+
+def test_spans_in_executor_threads_reach_the_trace():
+    # arrange
+    def work():
+        with span("bm25"):
+            return 1
+
+    # act
+    with ThreadPoolExecutor(max_workers = 2) as executor:
+        with trace() as t:
+            futures = [submit_in_context(executor, work) for _ in range(2)]
+            results = [f.result() for f in futures]
+        with trace() as other:
+            executor.submit(work).result() # plain submit doesn't carry the trace
+
+    # assert
+    assert results == [1, 1]
+    assert "bm25" in t.stages
+    assert other.stages == {}
+
+
+def test_percentiles():
+    # act
+    p = percentiles([1.0, 2.0, 3.0, None, 4.0])
+
+    # assert
+    assert p["p50"] == 2.5
+    assert percentiles([])["p99"] is None
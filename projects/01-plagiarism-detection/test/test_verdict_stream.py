@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from plagiarism.verdict_stream import VerdictScanner
+
+# ---------
+# helpers
+# ---------
+
+def answer(is_plagiarized, reason = "same control flow as raft-go/raft.go", evidence = ("[1] AppendEntries",)):
+    return json.dumps({"is_plagiarized": is_plagiarized, "reason": reason, "evidence": list(evidence)})
+
+def feed_in_pieces(scanner, text, size):
+    # returns (value, characters fed until it was known)
+    for start in range(0, len(text), size):
+        value = scanner.feed(text[start:start + size])
+        if value is not None:
+            return value, start + size
+    return None, len(text)
+
+# ---------
+# tests
+# ---------
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize("is_plagiarized", [True, False])
+def test_verdict_is_known_before_the_rest_of_the_answer(size, is_plagiarized):
+    # arrange
+    text = answer(is_plagiarized, reason = "x" * 500)
+    scanner = VerdictScanner("is_plagiarized")
+
+    # act
+    value, fed = feed_in_pieces(scanner, text, size)
+
+    # assert
+    assert value is is_plagiarized
+    assert fed < 30 or size == 1000
+
+
+def test_field_names_in_strings_and_nested_objects_are_ignored():
+    # arrange
+    text = (
+        '{ "reason" : "the \\"is_plagiarized\\": true key", "nested": {"is_plagiarized": true},'
+        ' "evidence": ["is_plagiarized", "x"], "is_plagiarized" :\n false }'
+    )
+    scanner = VerdictScanner("is_plagiarized")
+
+    # act
+    value, _ = feed_in_pieces(scanner, text, 4)
+
+    # assert
+    assert value is False
+
+
+def test_no_verdict_for_missing_or_non_boolean_field():
+    # arrange
+    missing = VerdictScanner("is_plagiarized")
+    null = VerdictScanner("is_plagiarized")
+
+    # act
+    missing.feed('{"reason": "refused"}')
+    null.feed('{"is_plagiarized": null, "reason": "true"}')
+
+    # assert
+    assert missing.value is None
+    assert null.value is None